@@ -1,9 +1,10 @@
-import mysql.connector
-import serial
-import I2C_LCD_driver
-import RPi.GPIO as GPIO
+import time
 from time import sleep
-from pyfingerprint.pyfingerprint import PyFingerprint
+import buzzer_engine
+import access_journal
+import member_db
+import hal
+from hal import GPIO  # RPi.GPIO, or the simulator under LOCKUP_HAL=sim
 
 # MySQL connection details
 db_config = {
@@ -13,19 +14,20 @@ db_config = {
     'database': 'testdb'
 }
 
-# Initialize MySQL connection
-conn = mysql.connector.connect(**db_config)
-cursor = conn.cursor()
+# Pooled MySQL access behind an in-memory PIN -> member index, refreshed in the background
+members = member_db.MemberDB(member_db.mysql_connect(db_config))
+members.refresh()
+members.start()
 
 # Initialize fingerprint sensor
 try:
-    fingerprint_sensor = PyFingerprint('/dev/ttyUSB0', 57600)  # Adjust port and baud rate if needed
+    fingerprint_sensor = hal.open_pyfingerprint('/dev/ttyUSB0', 57600)  # Adjust port and baud rate if needed
 except Exception as e:
     print('Failed to initialize fingerprint sensor:', e)
     exit(1)
 
 # Initialize LCD
-lcd = I2C_LCD_driver.lcd()
+lcd = hal.open_lcd()
 
 # Setup GPIO pins
 C1 = 5
@@ -57,11 +59,25 @@ GPIO.setup(R2, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
 GPIO.setup(R3, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
 GPIO.setup(R4, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
 
+# Buzzer patterns play in the background so alarms never stall the keypad
+buzzer_player = buzzer_engine.BuzzerEngine(
+    lambda on: GPIO.output(buzzer, GPIO.HIGH if on else GPIO.LOW))
+buzzer_player.start()
+
+# Access events go to an on-device journal that is shipped in the background
+journal = access_journal.AccessJournal()
+journal.start()
+shipper = access_journal.JournalShipper(journal)
+shipper.start()
+
+# After an alarm, PIN attempts are refused until the 30 s alarm and a 10 s pause are over
+LOCKOUT_SECONDS = 40
+
 # Initialize variables
 keypadPressed = -1
 input_pin = ""
 failed_attempts = 0
-alarm_triggered = False
+lockout_until = 0
 
 def verify_fingerprint_and_pin(pin_input):
     try:
@@ -84,11 +100,8 @@ def verify_fingerprint_and_pin(pin_input):
         position_number = fingerprint_sensor.searchTemplate()  # Search in the database
 
         if position_number[0] >= 0:
-            # Query database to match PIN
-            cursor.execute("SELECT ID FROM members WHERE PIN = %s", (pin_input,))
-            pin_exists = cursor.fetchone()
-
-            return pin_exists is not None
+            # Match the PIN against the member index (no database round trip)
+            return members.member_for_pin(pin_input) is not None
 
         return False
 
@@ -96,15 +109,14 @@ def verify_fingerprint_and_pin(pin_input):
         print('Error:', e)
         return False
 def trigger_alarm():
-    """Trigger the buzzer alarm for 10 seconds with 3-second intervals."""
-    for _ in range(10):
-        GPIO.output(buzzer, GPIO.HIGH)
-        sleep(1)  # Buzzer on for 1 second
-        GPIO.output(buzzer, GPIO.LOW)
-        sleep(2)  # Buzzer off for 2 seconds
+    """Queue the alarm: 10 cycles of 1 s on / 2 s off, returning immediately."""
+    global lockout_until
+    journal.append(access_journal.ALARM, pattern=buzzer_engine.LONG_ALARM.name)
+    buzzer_player.play(buzzer_engine.LONG_ALARM)
+    lockout_until = time.monotonic() + LOCKOUT_SECONDS
 
 def commands():
-    global input_pin, failed_attempts, alarm_triggered
+    global input_pin, failed_attempts
     pressed = False
 
     GPIO.output(C1, GPIO.HIGH)
@@ -119,17 +131,21 @@ def commands():
     GPIO.output(C1, GPIO.HIGH)
 
     if not pressed and GPIO.input(R2) == 1:
-        if len(input_pin) == 0:
+        if time.monotonic() < lockout_until:
+            # Still locked out after the last alarm
+            lcd.lcd_clear()
+            lcd.lcd_display_string("Please Wait", 1, 0)
+            sleep(1)
+        elif len(input_pin) == 0:
             # Show a message prompting for PIN input
             lcd.lcd_clear()
             lcd.lcd_display_string("Please Input PIN", 1, 0)
             sleep(1)
         else:
-            # Check if the PIN exists in the database
-            cursor.execute("SELECT ID FROM members WHERE PIN = %s", (input_pin,))
-            pin_exists = cursor.fetchone()
+            # Check if the PIN exists (in-memory member index)
+            member_id = members.member_for_pin(input_pin)
 
-            if pin_exists:
+            if member_id is not None:
                 # Show a message asking for fingerprint
                 lcd.lcd_clear()
                 lcd.lcd_display_string("Scanning Finger", 1, 0)
@@ -139,11 +155,10 @@ def commands():
                     print("Fingerprint and PIN verified!")
                     lcd.lcd_clear()
                     lcd.lcd_display_string("Access Granted", 1, 0)
+                    journal.append(access_journal.GRANTED, member_id=member_id)
 
                     # Activate buzzer and relay
-                    GPIO.output(buzzer, GPIO.HIGH)
-                    sleep(0.3)  # Buzzer on for 0.3 seconds
-                    GPIO.output(buzzer, GPIO.LOW)
+                    buzzer_player.play(buzzer_engine.CHIRP)
 
                     GPIO.output(Relay, GPIO.LOW)
                     sleep(10)  # Keep door open for 3 seconds
@@ -155,38 +170,30 @@ def commands():
                     print("Fingerprint or PIN not recognized!")
                     lcd.lcd_clear()
                     lcd.lcd_display_string("Access Denied", 1, 0)
-                    GPIO.output(buzzer, GPIO.HIGH)
-                    sleep(0.3)
-                    GPIO.output(buzzer, GPIO.LOW)
+                    journal.append(access_journal.DENIED, reason='fingerprint', member_id=member_id)
+                    buzzer_player.play(buzzer_engine.CHIRP)
                     
                     # Increment failed attempts counter
                     failed_attempts += 1
 
                     # Check if failed attempts threshold is reached
-                    if failed_attempts >= 3 and not alarm_triggered:
-                        alarm_triggered = True
+                    if failed_attempts >= 3:
                         print("Triggering alarm!")
                         trigger_alarm()
-                        sleep(10)  # Wait for 10 seconds before allowing further input
-                        alarm_triggered = False
             else:
                 print("PIN not found in database!")
                 lcd.lcd_clear()
                 lcd.lcd_display_string("PIN Not Found", 1, 0)
-                GPIO.output(buzzer, GPIO.HIGH)
-                sleep(0.3)
-                GPIO.output(buzzer, GPIO.LOW)
+                journal.append(access_journal.DENIED, reason='unknown_pin')
+                buzzer_player.play(buzzer_engine.CHIRP)
                 
                 # Increment failed attempts counter
                 failed_attempts += 1
 
                 # Check if failed attempts threshold is reached
-                if failed_attempts >= 3 and not alarm_triggered:
-                    alarm_triggered = True
+                if failed_attempts >= 3:
                     print("Triggering alarm!")
                     trigger_alarm()
-                    sleep(10)  # Wait for 10 seconds before allowing further input
-                    alarm_triggered = False
 
             pressed = True
 
@@ -242,7 +249,10 @@ try:
 except KeyboardInterrupt:
     print("Stopped!")
 finally:
-    # Ensure the connection and serial port are closed
-    if conn.is_connected():
-        conn.close()
+    # Ensure the database connections are closed
+    members.stop()
+    print("Member index stats:", members.stats())
+    buzzer_player.stop()
+    shipper.stop()
+    journal.stop()
     GPIO.cleanup()
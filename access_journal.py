@@ -0,0 +1,304 @@
+import asyncio
+import gzip
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+import http_client
+import tracing
+
+JOURNAL_DIR = 'journal'
+SEGMENT_BYTES = 1 << 20   # Rotate to a new segment file after 1 MiB
+MAX_SEGMENTS = 64         # Oldest segments are dropped, shipped or not, beyond this
+FSYNC_INTERVAL = 0.2      # Seconds between group commits (flush + fsync)
+
+# Shipping: POST <SHIP_URL> with a gzip'd body of JSON lines. Delivery is
+# at-least-once; the server should dedupe on (X-Device-Id, seq).
+SHIP_URL = '/api/access-events'
+SHIP_INTERVAL = 10        # Seconds between shipping passes
+BATCH_RECORDS = 500       # Records per POST
+BACKOFF_MAX = 300         # Upper bound on the retry delay after failed passes
+DEVICE_ID = socket.gethostname()
+
+HEADER = struct.Struct('<II')  # payload length, crc32(payload)
+CURSOR_FILE = 'cursor.json'
+
+# Event kinds written by the door scripts
+GRANTED = 'granted'
+DENIED = 'denied'
+ALARM = 'alarm'
+ADMIN_LOCK = 'admin_lock'
+AUTO_LOCK = 'auto_lock'
+EARLY_LOCK = 'early_lock'
+REMOTE = 'remote'
+
+
+def _segment_name(first_seq):
+    return f'{first_seq:012d}.seg'
+
+
+def _scan(path, offset=0, limit=None):
+    """Read records from a segment; returns (records, end_offset, clean).
+
+    Stops at the first torn or corrupt record; `clean` is False when
+    that happened before the end of the file.
+    """
+    records = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    pos = 0
+    while pos < len(data) and (limit is None or len(records) < limit):
+        if pos + HEADER.size > len(data):
+            return records, offset + pos, False
+        length, crc = HEADER.unpack_from(data, pos)
+        payload = data[pos + HEADER.size:pos + HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return records, offset + pos, False
+        records.append(json.loads(payload))
+        pos += HEADER.size + length
+    return records, offset + pos, True
+
+
+class AccessJournal:
+    """Append-only, CRC-checked journal of access events in rotating segment files.
+
+    append() only encodes the record and writes it to a buffered file
+    under a lock; a flusher thread makes everything appended durable
+    every FSYNC_INTERVAL with one flush + fsync. A torn tail left by a
+    power cut is truncated on open. The shipping cursor lives next to
+    the segments, and fully shipped segments are deleted.
+    """
+
+    def __init__(self, directory=JOURNAL_DIR, segment_bytes=SEGMENT_BYTES,
+                 max_segments=MAX_SEGMENTS, fsync_interval=FSYNC_INTERVAL):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.dirty = False
+        self.syncs = 0
+        os.makedirs(directory, exist_ok=True)
+        self.seq = self._recover()
+        self.cursor = self._load_cursor()
+
+    # Segments
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith('.seg'))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _recover(self):
+        """Open the newest segment for appending, truncating a torn tail; returns the next seq."""
+        seq = 0
+        for name in reversed(self.segments()):
+            records, end, clean = _scan(self._path(name))
+            if not clean:
+                print(f'Journal: truncating torn tail of {name} at {end}')
+                with open(self._path(name), 'r+b') as f:
+                    f.truncate(end)
+            if records:
+                seq = records[-1]['seq'] + 1
+                break
+        segments = self.segments()
+        self.active = segments[-1] if segments else _segment_name(seq)
+        self.file = open(self._path(self.active), 'ab')
+        return seq
+
+    def _rotate(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.active = _segment_name(self.seq)
+        self.file = open(self._path(self.active), 'ab')
+        self._compact()
+
+    def _compact(self):
+        """Delete segments the cursor has moved past, then the oldest beyond max_segments."""
+        segments = self.segments()
+        for name in segments:
+            if name >= self.cursor[0] or name == self.active:
+                break
+            os.remove(self._path(name))
+        segments = self.segments()
+        for name in segments[:max(len(segments) - self.max_segments, 0)]:
+            if name != self.active:
+                print(f'Journal: dropping unshipped segment {name} (over {self.max_segments} segments)')
+                os.remove(self._path(name))
+
+    # Hot path
+
+    def append(self, event, **fields):
+        """Journal one event; returns its sequence number. Durable within fsync_interval."""
+        with self.lock:
+            seq = self.seq
+            self.seq += 1
+            record = {'seq': seq, 'ts': time.time(), 'event': event}
+            record.update(fields)
+            payload = json.dumps(record, separators=(',', ':')).encode()
+            self.file.write(HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self.dirty = True
+            if self.file.tell() >= self.segment_bytes:
+                self._rotate()
+        return seq
+
+    def sync(self):
+        """Group commit: flush everything appended so far and fsync it."""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.file.flush()
+            self.dirty = False
+            fd = os.dup(self.file.fileno())
+        # fsync outside the lock so appends never wait on the SD card
+        try:
+            with tracing.span('journal_fsync'):
+                os.fsync(fd)
+            self.syncs += 1
+        finally:
+            os.close(fd)
+
+    def _run(self):
+        while not self.stop_event.wait(self.fsync_interval):
+            self.sync()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='journal-fsync', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.sync()
+        with self.lock:
+            self.file.close()
+
+    # Reading and the shipping cursor
+
+    def _load_cursor(self):
+        try:
+            with open(self._path(CURSOR_FILE)) as f:
+                cursor = json.load(f)
+            return cursor['segment'], cursor['offset']
+        except (OSError, ValueError, KeyError):
+            segments = self.segments()
+            return (segments[0] if segments else self.active), 0
+
+    def read(self, cursor, limit):
+        """Return (records, next_cursor) with up to `limit` records after `cursor`."""
+        name, offset = cursor
+        records = []
+        with self.lock:
+            self.file.flush()
+            active = self.active
+        for segment in self.segments():
+            if segment < name:
+                continue
+            if segment > name:
+                name, offset = segment, 0
+            batch, end, clean = _scan(self._path(name), offset, limit - len(records))
+            records.extend(batch)
+            offset = end
+            if len(records) >= limit or name == active:
+                break
+            if not clean:
+                print(f'Journal: skipping corrupt records in {name} after offset {end}')
+        return records, (name, offset)
+
+    def commit(self, cursor):
+        """Persist the shipping cursor and drop fully shipped segments."""
+        path = self._path(CURSOR_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'segment': cursor[0], 'offset': cursor[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        with self.lock:
+            self.cursor = cursor
+            self._compact()
+
+    def stats(self):
+        with self.lock:
+            return {'next_seq': self.seq, 'segments': len(self.segments()),
+                    'cursor': list(self.cursor), 'fsyncs': self.syncs}
+
+
+class JournalShipper:
+    """Uploads an AccessJournal from its cursor in gzip'd batches, on a thread or as a task."""
+
+    def __init__(self, journal, interval=SHIP_INTERVAL, batch_records=BATCH_RECORDS,
+                 url=SHIP_URL):
+        self.journal = journal
+        self.interval = interval
+        self.batch_records = batch_records
+        self.url = url
+        self.failures = 0
+        self.shipped = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def ship_once(self):
+        """Ship every complete batch after the cursor; returns the number of records sent.
+
+        The cursor is committed only after the server acknowledges a batch,
+        so a crash or failure resends it (at-least-once).
+        """
+        sent = 0
+        while True:
+            records, cursor = self.journal.read(self.journal.cursor, self.batch_records)
+            if not records:
+                if cursor != self.journal.cursor:
+                    self.journal.commit(cursor)  # Skipped past an empty or corrupt segment
+                return sent
+            body = gzip.compress(b'\n'.join(json.dumps(r, separators=(',', ':')).encode()
+                                            for r in records))
+            response = http_client.post(self.url, data=body, headers={
+                'Content-Type': 'application/x-ndjson',
+                'Content-Encoding': 'gzip',
+                'X-Device-Id': DEVICE_ID,
+            })
+            response.raise_for_status()
+            self.journal.commit(cursor)
+            sent += len(records)
+            self.shipped += len(records)
+
+    def _pass(self):
+        """One shipping pass; returns the seconds to wait before the next."""
+        try:
+            with tracing.span('journal_ship'):
+                sent = self.ship_once()
+            if sent:
+                print(f'Journal: shipped {sent} event(s)')
+            self.failures = 0
+            return self.interval
+        except Exception as e:
+            self.failures += 1
+            delay = min(BACKOFF_MAX, self.interval * 2 ** (self.failures - 1))
+            print(f'Journal: shipping failed ({e}); retrying in {delay}s')
+            return delay
+
+    def _run(self):
+        while not self.stop_event.wait(self._pass()):
+            pass
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='journal-ship', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    async def run(self):
+        """Asyncio variant of start(): ship now and every interval after."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(await loop.run_in_executor(None, self._pass))
@@ -1,467 +1,748 @@
-import I2C_LCD_driver
-import RPi.GPIO as GPIO
-from time import sleep
-import adafruit_fingerprint
-import serial
-import requests
-import datetime
-import threading
-
-# Initialize serial connection for Adafruit Fingerprint Sensor
-try:
-    uart = serial.Serial('/dev/ttyUSB0', baudrate=57600, timeout=1)
-    fingerprint_sensor = adafruit_fingerprint.Adafruit_Fingerprint(uart)
-    if fingerprint_sensor is None:
-        raise ValueError('Failed to initialize fingerprint sensor!')
-    print('Fingerprint sensor initialized successfully.')
-except Exception as e:
-    print('Failed to initialize fingerprint sensor:', e)
-    exit(1)
-
-# Initialize LCD
-lcd = I2C_LCD_driver.lcd()
+import asyncio
+import concurrent.futures
+import json
+import signal
+import sys
+import time
+import http_client
+import local_store
+import server_clock
+import keypad_driver
+import telemetry
+import lock_channel
+import lcd_renderer
+import buzzer_engine
+import fingerprint_capture
+import pin_resolver
+import schedule_index
+import session_scheduler
+import access_journal
+import template_slots
+import tracing
+import hal
+from hal import GPIO  # RPi.GPIO, or the simulator under LOCKUP_HAL=sim
 
 # Setup GPIO pins
 C1, C2, C3, C4 = 5, 6, 13, 19
 R1, R2, R3, R4 = 12, 16, 20, 21
 buzzer, Relay = 17, 27
 
-GPIO.setwarnings(False)
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(buzzer, GPIO.OUT)
-GPIO.setup(Relay, GPIO.OUT)
-GPIO.output(Relay, GPIO.HIGH)
-
-GPIO.setup(C1, GPIO.OUT)
-GPIO.setup(C2, GPIO.OUT)
-GPIO.setup(C3, GPIO.OUT)
-GPIO.setup(C4, GPIO.OUT)
-
-GPIO.setup(R1, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(R2, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(R3, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(R4, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-
-keypadPressed = -1
-input_pin = ""
-failed_attempts = 0
-consecutive_wrong_attempts = 0  # Initialize counter for wrong attempts
-alarm_triggered = False
-manual_control = False  # New flag to track manual control state
-
-def fetch_temperature():
-    """Fetch the latest temperature data from the API and trigger alarm if temperature is >= 40°C."""
-    api_url_temp = 'https://lockup.pro/api/temperatures'
-    try:
-        response = requests.get(api_url_temp)
-        response.raise_for_status()
-        data = response.json()
-        
-        if not data:
-            print("No temperature data received.")
-            return None, None
-        
-        latest_record = data[-1]  # Get the last record in the list (most recent)
-        temperature = float(latest_record.get('temperature'))
-        humidity = float(latest_record.get('humidity'))
-        print(f"Fetched temperature: {temperature}°C, Humidity: {humidity}%")
-        
-        if temperature >= 40:
-            print("Temperature is >= 40°C. Triggering buzzer alarm!")
-            trigger_alarm()
-        
-        return temperature, humidity
-    except Exception as e:
-        print('Failed to fetch temperature data:', e)
-        return None, None
+# One lock unit. Run `python api.py doors.json` with a JSON list of these
+# (missing keys default to the values below) to drive several doors from
+# one process sharing the HTTP pool, local store, clock and journal.
+DEFAULT_DOOR = {
+    'name': 'door',
+    'uart': '/dev/ttyUSB0',
+    'relay': Relay,
+    'buzzer': buzzer,
+    'columns': [C1, C2, C3, C4],
+    'rows': [R1, R2, R3, R4],
+    'lcd_address': None,  # I2C_LCD_driver's default address
+    'slot_map': template_slots.MAP_PATH,
+}
+
+# Seconds to type the PIN that confirms an early lock ('*' on an empty PIN)
+EARLY_LOCK_TIMEOUT = 10
+
 
-    
 def fetch_api_data(pin_input):
-    """Fetch instructor data from API using the provided PIN."""
-    api_url_instructor = f'https://lockup.pro/api/instructors/{pin_input}'
+    """Fetch instructor data from API using the provided PIN.
+
+    Returns [] for an unknown PIN and None when the API couldn't answer.
+    """
+    api_url_instructor = f'/api/instructors/{pin_input}'
     try:
-        response = requests.get(api_url_instructor)
-        response.raise_for_status()
-        data = response.json()
+        with tracing.span('fetch_api_data'):
+            response = http_client.get(api_url_instructor)
+            if response.status_code == 404:
+                return []
+            response.raise_for_status()
+            data = response.json()
         print('Fetched data from API:', data)  # Print the API response data
         return data  # Return the entire response data
     except Exception as e:
         print('Failed to fetch API data:', e)
-        return []
-
-def get_fingerprint():
-    """Get a fingerprint image, template it, and see if it matches!
-    Returns the matched ID if successful, otherwise None."""
-    print("Waiting for image...")
-    while fingerprint_sensor.get_image() != adafruit_fingerprint.OK:
-        sleep(0.1)
-    print("Image detected. Waiting for stable scan...")
-    sleep(2)  # Give some time for the user to adjust their finger if needed
-    print("Templating...")
-    if fingerprint_sensor.image_2_tz(1) != adafruit_fingerprint.OK:
         return None
-    print("Searching...")
-    result = fingerprint_sensor.finger_fast_search()
-    if result == adafruit_fingerprint.OK:
-        matched_id = fingerprint_sensor.finger_id
-        print(f"Found fingerprint with ID {matched_id}!")
-        return matched_id
-    else:
-        print("No match found or other error")
-        return None
-def verify_fingerprint_and_pin(pin_input):
-    global manual_control, failed_attempts, alarm_triggered, consecutive_wrong_attempts
 
-    try:
-        # Fetch instructor data from the API
-        instructors = fetch_api_data(pin_input)
-        if not instructors:
-            lcd.lcd_clear()
-            lcd.lcd_display_string("PIN not found", 1, 0)
-            sleep(2)
-            print('PIN not found')
-
-            consecutive_wrong_attempts += 1
-            if consecutive_wrong_attempts >= 3:
-                print("3 consecutive wrong PIN attempts. Triggering alarm!")
-                lcd.lcd_clear()
-                lcd.lcd_display_string("3 Incorrect PINs", 1, 0)
-                lcd.lcd_display_string("Alarm Triggered", 2, 0)
-                trigger_alarm()
-                consecutive_wrong_attempts = 0
+def fetch_admin_data(pin_input):
+    """Fetch admin data from API using the provided PIN.
 
-            return False
+    Returns [] for a PIN that isn't an admin's and None when the API couldn't answer.
+    """
+    api_url_admin = f'/api/admin/pin/{pin_input}'
+    try:
+        with tracing.span('fetch_admin_data'):
+            response = http_client.get(api_url_admin)
+            if response.status_code == 404:
+                return []
+            response.raise_for_status()
+            data = response.json()
+        print('Fetched admin data from API:', data)  # Print the API response data
+        return data  # Return the entire response data
+    except Exception as e:
+        print('Failed to fetch admin API data:', e)
+        return None
 
-        consecutive_wrong_attempts = 0
-        server_time = fetch_server_time()  # Fetch server time
-        if server_time is None:
-            lcd.lcd_clear()
-            lcd.lcd_display_string("Server Time Error", 1, 0)
-            sleep(2)
-            return False
 
-        current_day = datetime.datetime.now().strftime('%A')
-        current_time = datetime.datetime.now().strftime('%H:%M:%S')
-
-        access_granted = False
-        for instructor in instructors:
-            subject_day = instructor.get('day')
-            subject_start_time = instructor.get('start_time')
-            subject_end_time = instructor.get('end_time')
-
-            if (subject_day == current_day and
-                    subject_start_time <= server_time <= subject_end_time):
-                access_granted = True
-                username = instructor.get('username', 'Unknown User')
-                name = instructor.get('name', 'Unknown Name')
-
-                # Calculate the time 10 minutes before end time
-                end_time_dt = datetime.datetime.strptime(subject_end_time, '%H:%M:%S')
-                pre_end_time_dt = end_time_dt - datetime.timedelta(minutes=10)
-                pre_end_time = pre_end_time_dt.strftime('%H:%M:%S')
-
-                break
-
-        if not access_granted:
-            lcd.lcd_clear()
-            lcd.lcd_display_string("No Schedule", 1, 0)
-            sleep(2)
-            print("No valid schedule for this PIN")
+class DoorController:
+    """One door driven from the asyncio event loop.
+
+    The keypad session, lock-status channel and telemetry each run as a
+    task; buzzer patterns play on a buzzer_engine.BuzzerEngine. Blocking
+    driver calls go to executors: a dedicated thread for the fingerprint
+    UART so it stays serialised, one for keypad reads, and the default pool
+    for HTTP. The LCD is a lcd_renderer.FramebufferLCD whose own worker
+    owns the I2C bus, so display updates never block.
+
+    Several controllers can share one loop: pass a shared lock_status
+    channel and telemetry sampler (which the caller then runs) instead of
+    letting each door open its own.
+    """
+
+    def __init__(self, fingerprint_sensor, lcd, keypad, store, clock, journal,
+                 relay_pin=Relay, buzzer_pin=buzzer, name=None,
+                 slot_map=template_slots.MAP_PATH, lock_status=None, sampler=None):
+        self.name = name
+        self.fingerprint_sensor = fingerprint_sensor
+        self.lcd = lcd
+        self.keypad = keypad
+        self.store = store
+        self.clock = clock
+        self.journal = journal
+        self.relay_pin = relay_pin
+        self.buzzer_pin = buzzer_pin
+        self.uart = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix=f'uart-{name}')
+        self.keypad_io = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix=f'keypad-{name}')
+        self.owns_channels = lock_status is None
+        self.lock_status = lock_status or lock_channel.open_channel(
+            self._on_lock_status, is_enabled=lambda: not self.manual_control)
+        self.sampler = sampler or telemetry.TelemetrySampler(on_alarm=self._on_heat_alarm)
+        self.resolver = pin_resolver.PinResolver(store, fetch_admin_data, fetch_api_data)
+        self.slots = template_slots.SlotManager(fingerprint_sensor, path=slot_map,
+                                                is_pinned=self._pinned_fingers,
+                                                is_referenced=store.referenced_finger_ids)
+        self.buzzer = buzzer_engine.BuzzerEngine(
+            lambda on: GPIO.output(buzzer_pin, GPIO.HIGH if on else GPIO.LOW))
+        self.sessions = session_scheduler.SessionScheduler(
+            clock.now, self._on_session_warning, self._on_session_end)
+        self.loop = None
+        self.input_pin = ""
+        self.pin_entered = None  # perf_counter_ns() at the 4th digit, for the unlock span
+        self.consecutive_wrong_attempts = 0
+        self.manual_control = False
+        self.held_status = None  # Remote command that arrived under manual control
+        self.locked = None  # Last relay state written, None until the first write
+
+    # Executors
+
+    async def run_blocking(self, fn, *args):
+        """Run a blocking call (HTTP, sqlite) on the default pool."""
+        return await self.loop.run_in_executor(None, fn, *args)
+
+    async def sensor(self, fn, *args):
+        """Run a fingerprint sensor command on the UART thread."""
+        return await self.loop.run_in_executor(self.uart, fn, *args)
+
+    # LCD (framebuffer updates only; the renderer's worker writes the diff)
+
+    def lcd_display(self, text, line, pos=0):
+        self.lcd.lcd_display_string(text, line, pos)
+
+    def lcd_clear(self):
+        self.lcd.lcd_clear()
+
+    # Access journal
+
+    def record(self, event, **fields):
+        """Append an access event to the journal; never lets a journal error block the door."""
+        if self.name is not None:
+            fields['door'] = self.name
+        try:
+            self.journal.append(event, **fields)
+        except Exception as e:
+            print('Failed to journal access event:', e)
+
+    # Relay and buzzer
+
+    def set_relay(self, locked):
+        """Drive the lock relay; returns True if that changed its state."""
+        GPIO.output(self.relay_pin, GPIO.HIGH if locked else GPIO.LOW)
+        changed, self.locked = self.locked != locked, locked
+        return changed
+
+    def beep(self):
+        self.buzzer.play(buzzer_engine.CHIRP)
+
+    def trigger_alarm(self, pattern=buzzer_engine.ALARM):
+        """Sound an alarm pattern (10 s by default) without blocking the caller."""
+        self.record(access_journal.ALARM, pattern=pattern.name)
+        return self.buzzer.play(pattern)
+
+    # Background channels (their callbacks arrive on executor threads)
+
+    def _on_lock_status(self, status):
+        self.loop.call_soon_threadsafe(self.apply_lock_status, status)
+
+    def _on_heat_alarm(self):
+        self.loop.call_soon_threadsafe(self.trigger_alarm)
+
+    def apply_lock_status(self, status):
+        """Drive the relay from a remote lock/unlock command.
+
+        Under manual control the latest command is held and applied by
+        release_control(), so a command sent during a session isn't lost.
+        """
+        if self.manual_control:
+            self.held_status = status
+            return
+        self.held_status = None
+        if status not in ('unlock', 'lock'):
+            return
+        # Only a command that moves the relay is journaled; a repeat is a no-op
+        if self.set_relay(locked=status == 'lock'):
+            print('Unlocking system via API' if status == 'unlock' else 'Locking system via API')
+            self.record(access_journal.REMOTE, status=status)
+
+    # Sessions (timed events fire on the loop from SessionScheduler.run)
+
+    def _on_session_warning(self, session):
+        print(f"10 minutes to end time for {session.key}. Triggering alarm!")
+        self.lcd_display("10 min Warning  ", 1, 0)
+        self.trigger_alarm(buzzer_engine.WARNING)
+
+    def _on_session_end(self, session):
+        print(f"End time reached for {session.key}.")
+        self.record(access_journal.AUTO_LOCK, username=session.key)
+        if not self.sessions.active():
+            print("No sessions left. Locking system.")
+            self.lock_now()
+
+    def lock_now(self):
+        """Lock the door and hand the relay back to the remote lock channel."""
+        self.set_relay(locked=True)  # Lock the system
+        self.lcd_clear()
+        self.lcd_display("System Locked", 1, 0)
+        self.release_control()
+
+    def release_control(self):
+        """End manual control and apply any remote command held meanwhile."""
+        self.manual_control = False
+        status, self.held_status = self.held_status, None
+        if status is not None:
+            self.apply_lock_status(status)
+
+    def early_lock(self, username):
+        """End `username`'s open session now; lock once no session is left."""
+        session = self.sessions.close(username)
+        if session is None:
             return False
+        print(f"Session for {session.key} ended early.")
+        self.record(access_journal.EARLY_LOCK, username=session.key)
+        if not self.sessions.active():
+            self.lock_now()
+        return True
 
-        lcd.lcd_clear()
-        lcd.lcd_display_string("Place Finger", 1, 0)
-        sleep(1)
-
-        while fingerprint_sensor.get_image() != adafruit_fingerprint.OK:
-            sleep(0.1)
-
-        sleep(2)
-        
-        matched_finger_id = get_fingerprint()
-        if matched_finger_id is None:
-            print("Fingerprint verification failed")
-            lcd.lcd_clear()
-            lcd.lcd_display_string("Scan Failed", 1, 0)
-            sleep(2)
-            return False
+    # Keypad
 
-        for instructor in instructors:
-            stored_finger_id = instructor.get('finger_id')
-            print("Stored Finger ID:", stored_finger_id)
-            if stored_finger_id is None:
-                continue
+    async def next_key(self, timeout=None):
+        """Wait for the next debounced key press without blocking the loop.
 
-            if matched_finger_id == stored_finger_id:
-                lcd.lcd_clear()
-                lcd.lcd_display_string(f"Welcome {name}", 1, 0)
-                lcd.lcd_display_string(f"User: {username}", 2, 0)
-                GPIO.output(buzzer, GPIO.HIGH)
-                sleep(0.3)
-                GPIO.output(buzzer, GPIO.LOW)
-                GPIO.output(Relay, GPIO.LOW)  # Unlock the system
-                unlock_start_time = datetime.datetime.now()
-                manual_control = True
-
-                while True:
-                    current_time = datetime.datetime.now().strftime('%H:%M:%S')
-                    if current_time > subject_end_time:
-                        print("End time reached. Locking system.")
-                        lcd.lcd_clear()
-                        lcd.lcd_display_string("System Locked", 1, 0)
-                        GPIO.output(Relay, GPIO.HIGH)  # Lock the system
-                        manual_control = False
-                        return False
-
-                    if server_time >= pre_end_time and not alarm_triggered:
-                        print("10 minutes to end time. Triggering alarm!")
-                        lcd.lcd_clear()
-                        lcd.lcd_display_string("10 min Warning", 1, 0)
-                        trigger_alarm()
-                        alarm_triggered = True
-                        sleep(5)
-
-                    sleep(1)
-
-        lcd.lcd_clear()
-        lcd.lcd_display_string("Access Denied", 1, 0)
-        sleep(2)
-        return False
+        With a timeout the wait is read_key()'s own, so no key is read on
+        the keypad thread after the caller has stopped listening; returns
+        None once `timeout` seconds pass without a press.
+        """
+        if timeout is not None:
+            return await self.loop.run_in_executor(self.keypad_io, self.keypad.read_key, timeout)
+        while True:
+            key = await self.loop.run_in_executor(self.keypad_io, self.keypad.read_key, 0.5)
+            if key is not None:
+                return key
 
-    except Exception as e:
-        print('Error:', e)
-        return False
-def fetch_admin_data(pin_input):
-    
-    """Fetch admin data from API using the provided PIN."""
-    api_url_admin = f'https://lockup.pro/api/admin/pin/{pin_input}'
-    try:
-        response = requests.get(api_url_admin)
-        response.raise_for_status()
-        data = response.json()
-        print('Fetched admin data from API:', data)  # Print the API response data
-        return data  # Return the entire response data
-    except Exception as e:
-        print('Failed to fetch admin API data:', e)
-        return []
-def verify_admin_fingerprint_and_pin(pin_input):
-    global manual_control, input_pin, consecutive_wrong_attempts
-    """Verify admin PIN and fingerprint."""
-    try:
-        # Fetch admin data from the API
-        admin = fetch_admin_data(pin_input)
-        if not admin:
-            lcd.lcd_clear()
-            lcd.lcd_display_string("Admin PIN ", 1, 0)
-            lcd.lcd_display_string(" Not found", 2, 0)
-            sleep(2)
-            consecutive_wrong_attempts += 1
-            if consecutive_wrong_attempts >= 3:
-                trigger_alarm()  # Trigger the alarm for 10 seconds
-                consecutive_wrong_attempts = 0  # Reset the counter after alarming
+    async def handle_key(self, keypadPressed):
+        """Apply one debounced key press to the PIN being entered."""
+        print(keypadPressed)
+        if keypadPressed == "D":
+            self.input_pin = ""  # Clear the input PIN
+            self.lcd_display("PIN Cleared   ", 2, 0)  # Update LCD
+            await asyncio.sleep(1)  # Briefly show the cleared message
+            self.lcd_display("PIN:          ", 2, 0)  # Reset LCD to show empty PIN
+        else:
+            self.input_pin += keypadPressed
+
+    # Fingerprint
+
+    def _pinned_fingers(self, finger_ids):
+        """Fingers the slot manager must not evict: admins and today's remaining schedules."""
+        now = self.clock.now()
+        if now is None:
+            return set()
+        return self.store.pinned_finger_ids(now.strftime('%A'), now.strftime('%H:%M:%S'))
+
+    def _resident_slots(self, records):
+        """Make each record's finger resident on the sensor; returns {slot: finger_id}.
+
+        A finger whose template can't be made resident is left out: slots are
+        reused for any finger, so no other slot can stand in for it.
+        """
+        slots = {}
+        for record in records:
+            finger_id = record.get('finger_id')
+            if finger_id is None or finger_id in slots.values():
+                continue
+            try:
+                slot = self.slots.ensure_resident(finger_id, record.get('fingerprint_template'))
+            except Exception as e:
+                print(f'Failed to load template for finger {finger_id}:', e)
+                continue
+            if slot is not None:
+                slots[slot] = finger_id
+        return slots
+
+    async def get_fingerprint(self, records):
+        """Capture a fingerprint in one pass and compare it 1:1 with the finger
+        IDs of the given records (1:N search only if fingerprint_capture.SEARCH_FALLBACK).
+        Fingers not resident on the sensor are uploaded first by the slot manager.
+        Returns the matched finger ID if successful, otherwise None."""
+        with tracing.span('template'):
+            slots = await self.sensor(self._resident_slots, records)
+        if not slots:
+            print("No template could be made resident; denying")
+            return None
+        print("Waiting for image...")
+        with tracing.span('fingerprint'):
+            result = await self.sensor(fingerprint_capture.verify, self.fingerprint_sensor, list(slots))
+        print("Fingerprint", fingerprint_capture.format_timings(result))
+        if result.status != fingerprint_capture.MATCH:
+            return None
+        finger_id = slots.get(result.finger_id, self.slots.finger_for_slot(result.finger_id))
+        print(f"Found fingerprint with ID {finger_id} in slot {result.finger_id}!")
+        return finger_id
+
+    # Verification
+
+    async def verify_fingerprint_and_pin(self, pin_input, instructors, schedule=None):
+        """Verify an instructor's schedule and fingerprint for a resolved PIN.
+
+        `schedule` is the rows compiled to a schedule_index.WeeklySchedule
+        (compiled here when not given).
+        """
+        try:
+            if not instructors:
+                self.lcd_clear()
+                self.lcd_display("PIN not found", 1, 0)
+                await asyncio.sleep(2)
+                print('PIN not found')
+                self.record(access_journal.DENIED, reason='unknown_pin')
+
+                self.consecutive_wrong_attempts += 1
+                if self.consecutive_wrong_attempts >= 3:
+                    print("3 consecutive wrong PIN attempts. Triggering alarm!")
+                    self.lcd_clear()
+                    self.lcd_display("3 Incorrect PINs", 1, 0)
+                    self.lcd_display("Alarm Triggered", 2, 0)
+                    self.trigger_alarm()
+                    self.consecutive_wrong_attempts = 0
+
+                return False
+
+            self.consecutive_wrong_attempts = 0
+            server_now = self.clock.now()  # Server-aligned time, no network call
+            if server_now is None:
+                self.lcd_clear()
+                self.lcd_display("Server Time Error", 1, 0)
+                await asyncio.sleep(2)
+                return False
+
+            with tracing.span('schedule'):
+                if schedule is None:
+                    schedule = schedule_index.WeeklySchedule(instructors)
+                access = schedule.lookup(server_now)  # O(log n): allowed now, and until when
+            if access is None:
+                self.lcd_clear()
+                self.lcd_display("No Schedule", 1, 0)
+                await asyncio.sleep(2)
+                print("No valid schedule for this PIN")
+                self.record(access_journal.DENIED, reason='no_schedule',
+                            username=instructors[0].get('username'))
+                return False
+
+            username = access.record.get('username', 'Unknown User')
+            name = access.record.get('name', 'Unknown Name')
+
+            self.lcd_clear()
+            self.lcd_display("Place Finger", 1, 0)
+
+            matched_finger_id = await self.get_fingerprint(instructors)
+            if matched_finger_id is None:
+                print("Fingerprint verification failed")
+                self.lcd_clear()
+                self.lcd_display("Scan Failed", 1, 0)
+                self.record(access_journal.DENIED, reason='fingerprint', username=username)
+                await asyncio.sleep(2)
+                return False
+
+            for instructor in instructors:
+                stored_finger_id = instructor.get('finger_id')
+                print("Stored Finger ID:", stored_finger_id)
+                if stored_finger_id is None:
+                    continue
+
+                if matched_finger_id == stored_finger_id:
+                    self.lcd_clear()
+                    self.lcd_display(f"Welcome {name}", 1, 0)
+                    self.lcd_display(f"User: {username}", 2, 0)
+                    self.beep()
+                    self.set_relay(locked=False)  # Unlock the system
+                    tracing.record('unlock.instructor', self.pin_entered, time.perf_counter_ns())
+                    self.manual_control = True
+                    # Auto-lock and the pre-end warning are timed events; the
+                    # keypad stays live for other users, early lock and extensions
+                    extended = username in self.sessions.sessions
+                    session = self.sessions.open(username, access.until, name=name)
+                    self.record(access_journal.GRANTED, username=username, finger_id=matched_finger_id,
+                                until=session.until.isoformat(), extended=extended)
+                    print(f"Session for {username} {'extended' if extended else 'open'} "
+                          f"until {session.until}")
+                    await asyncio.sleep(2)  # Show the welcome message
+                    return True
+
+            self.lcd_clear()
+            self.lcd_display("Access Denied", 1, 0)
+            self.record(access_journal.DENIED, reason='finger_mismatch', username=username,
+                        finger_id=matched_finger_id)
+            await asyncio.sleep(2)
             return False
 
-        lcd.lcd_clear()
-        lcd.lcd_display_string("Admin Place ", 1, 0)
-        lcd.lcd_display_string(" Finger", 2, 0)
-        sleep(1)
-
-        while fingerprint_sensor.get_image() != adafruit_fingerprint.OK:
-            sleep(0.1)
-
-        sleep(2)
-        
-        matched_finger_id = get_fingerprint()
-        if matched_finger_id is None:
-            print("Fingerprint verification failed")
-            lcd.lcd_clear()
-            lcd.lcd_display_string("Scan Failed", 1, 0)
-            sleep(2)
-            consecutive_wrong_attempts += 1
-            if consecutive_wrong_attempts >= 3:
-                trigger_alarm()  # Trigger the alarm for 10 seconds
-                consecutive_wrong_attempts = 0  # Reset the counter after alarming
+        except Exception as e:
+            print('Error:', e)
             return False
 
-        stored_finger_id = admin.get('finger_id')
-        print("Stored Admin Finger ID:", stored_finger_id)
-        if stored_finger_id is None or matched_finger_id != stored_finger_id:
-            lcd.lcd_clear()
-            lcd.lcd_display_string("Admin Access Denied", 1, 0)
-            sleep(2)
-            consecutive_wrong_attempts += 1
-            if consecutive_wrong_attempts >= 3:
-                trigger_alarm()  # Trigger the alarm for 10 seconds
-                consecutive_wrong_attempts = 0  # Reset the counter after alarming
-            manual_control = False
+    async def verify_admin_fingerprint_and_pin(self, pin_input, admin):
+        """Verify admin PIN and fingerprint for a resolved admin record."""
+        try:
+            if not admin:
+                self.lcd_clear()
+                self.lcd_display("Admin PIN ", 1, 0)
+                self.lcd_display(" Not found", 2, 0)
+                self.record(access_journal.DENIED, reason='unknown_admin_pin')
+                await asyncio.sleep(2)
+                self.consecutive_wrong_attempts += 1
+                if self.consecutive_wrong_attempts >= 3:
+                    self.trigger_alarm()  # Trigger the alarm for 10 seconds
+                    self.consecutive_wrong_attempts = 0  # Reset the counter after alarming
+                return False
+
+            self.lcd_clear()
+            self.lcd_display("Admin Place ", 1, 0)
+            self.lcd_display(" Finger", 2, 0)
+
+            matched_finger_id = await self.get_fingerprint([admin])
+            if matched_finger_id is None:
+                print("Fingerprint verification failed")
+                self.lcd_clear()
+                self.lcd_display("Scan Failed", 1, 0)
+                self.record(access_journal.DENIED, reason='fingerprint', admin=admin.get('username'))
+                await asyncio.sleep(2)
+                self.consecutive_wrong_attempts += 1
+                if self.consecutive_wrong_attempts >= 3:
+                    self.trigger_alarm()  # Trigger the alarm for 10 seconds
+                    self.consecutive_wrong_attempts = 0  # Reset the counter after alarming
+                return False
+
+            stored_finger_id = admin.get('finger_id')
+            print("Stored Admin Finger ID:", stored_finger_id)
+            if stored_finger_id is None or matched_finger_id != stored_finger_id:
+                self.lcd_clear()
+                self.lcd_display("Admin Access Denied", 1, 0)
+                self.record(access_journal.DENIED, reason='finger_mismatch', admin=admin.get('username'),
+                            finger_id=matched_finger_id)
+                await asyncio.sleep(2)
+                self.consecutive_wrong_attempts += 1
+                if self.consecutive_wrong_attempts >= 3:
+                    self.trigger_alarm()  # Trigger the alarm for 10 seconds
+                    self.consecutive_wrong_attempts = 0  # Reset the counter after alarming
+                return False  # manual_control untouched: open sessions keep the door
+
+            # If access is granted, reset the consecutive_wrong_attempts counter
+            self.consecutive_wrong_attempts = 0
+
+            self.lcd_clear()
+            self.lcd_display(f"Admin Access", 1, 0)
+            self.beep()
+            self.set_relay(locked=False)  # Unlock the system
+            tracing.record('unlock.admin', self.pin_entered, time.perf_counter_ns())
+            self.manual_control = True
+            self.record(access_journal.GRANTED, admin=admin.get('username'), finger_id=matched_finger_id)
+            print("Admin Access Granted. System Unlocked.")
+
+            # Here, admin can lock/unlock the system manually
+            while True:
+                self.lcd_display("Press * to Lock", 2, 0)
+                self.keypad.flush()  # Ignore keys pressed during the scan
+                self.input_pin = await self.next_key()  # Wait for the admin to press a key
+
+                if self.input_pin == "*":  # If the admin presses the * button
+                    self.sessions.close_all()  # The admin lock also ends instructor sessions
+                    self.set_relay(locked=True)  # Lock the system
+                    self.lcd_clear()
+                    self.lcd_display("System Locked", 1, 0)
+                    print("System Locked by Admin.")
+                    self.record(access_journal.ADMIN_LOCK, admin=admin.get('username'))
+                    await asyncio.sleep(2)
+                    self.release_control()
+                    break
+
+            return True
+
+        except Exception as e:
+            print('Error:', e)
             return False
 
-        # If access is granted, reset the consecutive_wrong_attempts counter
-        consecutive_wrong_attempts = 0
-        
-        lcd.lcd_clear()
-        lcd.lcd_display_string(f"Admin Access", 1, 0)
-        GPIO.output(buzzer, GPIO.HIGH)
-        sleep(0.3)
-        GPIO.output(buzzer, GPIO.LOW)
-        GPIO.output(Relay, GPIO.LOW)  # Unlock the system
-        manual_control = True
-        print("Admin Access Granted. System Unlocked.")
-        
-        # Here, admin can lock/unlock the system manually
+    # Keypad session task
+
+    async def read_pin(self, prompt, timeout):
+        """Read a 4-digit PIN under `prompt`; None on D or after `timeout` seconds."""
+        pin = ""
+        deadline = self.loop.time() + timeout
+        self.lcd_clear()
+        self.lcd_display(prompt, 1, 0)
+        while len(pin) < 4:
+            self.lcd_display(f"PIN: {pin:<4}", 2, 0)
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                return None
+            key = await self.next_key(remaining)
+            if key is None or key == "D":
+                return None
+            if key.isdigit():
+                pin += key
+        return pin
+
+    async def early_lock_task(self):
+        """'*' while sessions run: the session owner's PIN ends their session early.
+
+        Only an instructor with an open session can end it, and only their
+        own; anyone else is refused and the door stays as it is.
+        """
+        pin = await self.read_pin("Lock: Enter PIN", EARLY_LOCK_TIMEOUT)
+        if pin is None:
+            self.lcd_clear()
+            return
+        resolution = await self.resolver.resolve(pin)
+        owners = {record.get('username') for record in resolution.instructors or ()}
+        ended = [username for username in owners if username and self.early_lock(username)]
+        if not ended:
+            print("Early lock refused: PIN has no open session")
+            self.record(access_journal.DENIED, reason='early_lock')
+            self.lcd_clear()
+            self.lcd_display("Not Allowed", 1, 0)
+        elif self.sessions.active():
+            self.lcd_clear()
+            self.lcd_display("Session Ended", 1, 0)
+        await asyncio.sleep(2)
+        self.lcd_clear()
+        self.keypad.flush()
+
+    async def keypad_task(self):
         while True:
-            lcd.lcd_display_string("Press * to Lock", 2, 0)
-            input_pin = ""  # Clear input_pin to ensure fresh input for "*"
-            
-            while len(input_pin) < 1:  # Wait for the admin to press a key
-                setAllColumns(GPIO.LOW)
-                readLine(C1, ["D", "C", "B", "A"])
-                readLine(C2, ["#", "9", "6", "3"])
-                readLine(C3, ["0", "8", "5", "2"])
-                readLine(C4, ["*", "7", "4", "1"])
-                sleep(0.1)
-
-            if input_pin == "*":  # If the admin presses the * button
-                GPIO.output(Relay, GPIO.HIGH)  # Lock the system
-                lcd.lcd_clear()
-                lcd.lcd_display_string("System Locked", 1, 0)
-                print("System Locked by Admin.")
-                sleep(2)
-                manual_control = False
-                break
+            self.lcd_display("Enter Your PIN:", 1, 0)
+            # Update the LCD with the input PIN
+            self.lcd_display(f"PIN: {self.input_pin}", 2, 0)
 
-        return True
-
-    except Exception as e:
-        print('Error:', e)
-        return False
-
-def fetch_server_time():
-    """Fetch the current server time from the API."""
-    api_url_time = 'https://lockup.pro/api/time/24-hour'  # Replace with your actual API endpoint for server time
-    try:
-        response = requests.get(api_url_time)
-        response.raise_for_status()
-        data = response.json()
-        server_time = data.get('time')  # Ensure your API returns time in 'HH:MM:SS' format
-        print('Fetched server time from API:', server_time)
-        return server_time
-    except Exception as e:
-        print('Failed to fetch server time:', e)
-        return None
-    sleep(0.1)
+            await self.handle_key(await self.next_key())  # D clears the input
 
-def check_lock_status():
-    """Fetch lock status from the API and control the relay accordingly."""
-    api_url_lock_status = 'https://lockup.pro/api/logs'
-    global manual_control  # Use the manual control flag to avoid conflict
-
-    while True:
-        if not manual_control:  # Only check API if not under manual control
-            try:
-                response = requests.get(api_url_lock_status)
-                response.raise_for_status()
-                data = response.json()
-                status = data.get('status')
-                
-                if status == 'unlock':
-                    print('Unlocking system via API')
-                    GPIO.output(Relay, GPIO.LOW)  # Unlock the system
-                elif status == 'lock':
-                    print('Locking system via API')
-                    GPIO.output(Relay, GPIO.HIGH)  # Lock the system
+            if self.input_pin == "*":
+                self.input_pin = ""  # '*' is never part of a PIN
+                if self.sessions.active():
+                    await self.early_lock_task()
+                continue
 
-            except Exception as e:
-                print('Failed to fetch lock status:', e)
-
-        sleep(5)  # Check every 10 seconds
-
-
-def trigger_alarm(duration=10, interval=0.1):
-    """Trigger the buzzer for the specified duration with the given interval."""
-    for _ in range(int(duration / interval)):
-        GPIO.output(buzzer, GPIO.HIGH)
-        sleep(interval)
-        GPIO.output(buzzer, GPIO.LOW)
-        sleep(interval)
-
-def setAllColumns(state):
-    GPIO.output(C1, state)
-    GPIO.output(C2, state)
-    GPIO.output(C3, state)
-    GPIO.output(C4, state)
-
-def readLine(line, characters):
-    global input_pin, manual_control
-    GPIO.output(line, GPIO.HIGH)
-    if GPIO.input(R1) == 1:
-        keypadPressed = characters[0]
-        print(keypadPressed)
-        if keypadPressed == "D":
-            input_pin = ""  # Clear the input PIN
-            lcd.lcd_display_string("PIN Cleared   ", 2, 0)  # Update LCD
-            sleep(1)  # Briefly show the cleared message
-            lcd.lcd_display_string("PIN:          ", 2, 0)  # Reset LCD to show empty PIN
-        else:
-            input_pin += keypadPressed
-    if GPIO.input(R2) == 1:
-        keypadPressed = characters[1]
-        print(keypadPressed)
-        input_pin += keypadPressed
-    if GPIO.input(R3) == 1:
-        keypadPressed = characters[2]
-        print(keypadPressed)
-        input_pin += keypadPressed
-    if GPIO.input(R4) == 1:
-        keypadPressed = characters[3]
-        print(keypadPressed)
-        input_pin += keypadPressed
-    GPIO.output(line, GPIO.LOW)
-
-
-# Start the lock status check in a separate thread
-lock_status_thread = threading.Thread(target=check_lock_status)
-lock_status_thread.start()
-
-
-# Main loop
-print("Starting main loop")
-try:
-    while True:
-        temperature, humidity = fetch_temperature()
-        
-        lcd.lcd_display_string("Enter Your PIN:", 1, 0)
-
-        setAllColumns(GPIO.LOW)
-        readLine(C1, ["D", "C", "B", "A"])  # Assign D button for clearing input
-        readLine(C2, ["#", "9", "6", "3"])
-        readLine(C3, ["0", "8", "5", "2"])
-        readLine(C4, ["*", "7", "4", "1"])
-        sleep(0.1)
-
-        # Update the LCD with the input PIN
-        lcd.lcd_display_string(f"PIN: {input_pin}", 2, 0)
-
-        # Limit input PIN to 4 digits
-        if len(input_pin) >= 4:
-            print("Input PIN:", input_pin)
-
-            # First check if the PIN belongs to an admin
-            if verify_admin_fingerprint_and_pin(input_pin):
-                print("Admin Access granted.")
-            else:
-                # If not an admin, proceed with regular verification
-                if verify_fingerprint_and_pin(input_pin):
+            if len(self.input_pin) == 3:
+                self.resolver.prefetch(self.input_pin)  # Speculative work on the 3rd digit
+
+            # Limit input PIN to 4 digits
+            if len(self.input_pin) >= 4:
+                print("Input PIN:", self.input_pin)
+                self.pin_entered = time.perf_counter_ns()
+
+                # Admin and instructor lookups run together; an admin match takes precedence
+                with tracing.span('resolve'):
+                    resolution = await self.resolver.resolve(self.input_pin)
+                print(f"PIN resolved to {resolution.path} path ({resolution.source}) "
+                      f"in {resolution.latency * 1000:.1f} ms")
+                if resolution.path == pin_resolver.ADMIN:
+                    if await self.verify_admin_fingerprint_and_pin(self.input_pin, resolution.admin):
+                        print("Admin Access granted.")
+                    else:
+                        print("Access denied.")
+                elif await self.verify_fingerprint_and_pin(self.input_pin, resolution.instructors,
+                                                           resolution.schedule):
                     print("Access granted.")
                 else:
                     print("Access denied.")
 
-            input_pin = ""  # Reset input PIN after checking
-            lcd.lcd_clear()  # Clear LCD after checking
-            sleep(1)
-
-except KeyboardInterrupt:
-    print("Terminated by user")
-finally:
-    GPIO.cleanup()
-    print("Cleaned up GPIO pins")
\ No newline at end of file
+                self.input_pin = ""  # Reset input PIN after checking
+                self.lcd_clear()  # Clear LCD after checking
+                await asyncio.sleep(1)
+                self.keypad.flush()  # Drop keys pressed while verifying
+
+    async def run(self):
+        """Run every task of this door until cancelled."""
+        self.loop = asyncio.get_running_loop()
+        self.buzzer.start()
+        try:
+            await self.sensor(self.slots.load)
+        except Exception as e:
+            print('Failed to read template slots:', e)
+        tasks = [
+            asyncio.create_task(self.keypad_task()),
+            asyncio.create_task(self.sessions.run()),
+        ]
+        if self.owns_channels:
+            tasks += [
+                asyncio.create_task(self.lock_status.run()),
+                asyncio.create_task(self.sampler.run()),
+            ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Don't block the loop (and the other doors) on a scan or key read
+            # still running; queued sensor work is dropped, the threads exit after
+            self.uart.shutdown(wait=False, cancel_futures=True)
+            self.keypad_io.shutdown(wait=False, cancel_futures=True)
+            self.buzzer.stop()
+
+
+def load_doors(path):
+    """Read a JSON list of door configs, filling gaps from DEFAULT_DOOR."""
+    with open(path) as f:
+        configs = json.load(f)
+    doors = []
+    for i, config in enumerate(configs):
+        door = dict(DEFAULT_DOOR, name=f'door{i + 1}')
+        door.update(config)
+        if 'slot_map' not in config:
+            door['slot_map'] = f"template_slots_{door['name']}.json"  # One map per sensor
+        if isinstance(door['lcd_address'], str):
+            door['lcd_address'] = int(door['lcd_address'], 0)
+        doors.append(door)
+    return doors
+
+
+def open_door(config, store, clock, journal, lock_status=None, sampler=None):
+    """Bring up one door's sensor, LCD, relay, buzzer and keypad."""
+    # Initialize the Adafruit Fingerprint Sensor on its UART
+    fingerprint_sensor = hal.open_fingerprint(config['uart'])
+    if fingerprint_sensor is None:
+        raise ValueError('Failed to initialize fingerprint sensor!')
+    print(f"{config['name']}: fingerprint sensor initialized successfully.")
+
+    # Initialize LCD behind a shadow framebuffer that only sends changed cells
+    lcd = lcd_renderer.FramebufferLCD(hal.open_lcd(config['lcd_address']))
+
+    GPIO.setup(config['buzzer'], GPIO.OUT)
+    GPIO.setup(config['relay'], GPIO.OUT)
+    GPIO.output(config['relay'], GPIO.HIGH)
+
+    # Edge-driven keypad: debounced key events arrive through a queue
+    keypad = keypad_driver.Keypad(keypad_driver.GpioBackend(GPIO),
+                                  columns=tuple(config['columns']), rows=tuple(config['rows']))
+    keypad.start()
+
+    return DoorController(fingerprint_sensor, lcd, keypad, store, clock, journal,
+                          relay_pin=config['relay'], buzzer_pin=config['buzzer'],
+                          name=config['name'], slot_map=config['slot_map'],
+                          lock_status=lock_status, sampler=sampler)
+
+
+async def main(configs=None):
+    configs = configs or [DEFAULT_DOOR]
+    multi = len(configs) > 1
+
+    GPIO.setwarnings(False)
+    GPIO.setmode(GPIO.BCM)
+
+    # Every door shares one keep-alive pool; leave room for each door's lookups
+    http_client.POOL_MAXSIZE = max(http_client.POOL_MAXSIZE, 2 * len(configs) + 4)
+
+    # Local mirror of instructors/admins and the server-aligned clock
+    store = local_store.LocalStore()
+    syncer = local_store.Syncer(store)
+    clock = server_clock.ServerClock()
+
+    # Access events are journaled on-device and shipped in the background
+    journal = access_journal.AccessJournal()
+    journal.start()
+    shipper = access_journal.JournalShipper(journal)
+
+    # With several doors, one lock-status stream and one temperature sampler fan out to all
+    doors = []
+    lock_status = sampler = None
+    if multi:
+        lock_status = lock_channel.open_channel(
+            lambda status: [door._on_lock_status(status) for door in doors],
+            is_enabled=lambda: any(not door.manual_control for door in doors))
+        sampler = telemetry.TelemetrySampler(
+            on_alarm=lambda: [door._on_heat_alarm() for door in doors])
+
+    for config in configs:
+        try:
+            doors.append(open_door(config, store, clock, journal, lock_status, sampler))
+        except Exception as e:
+            print(f"Failed to initialize {config['name']}:", e)
+    if not doors:
+        journal.stop()
+        GPIO.cleanup()
+        return 1
+
+    # Stage histograms and API error counts, for LOCKUP_METRICS_PORT / LOCKUP_METRICS_FILE
+    metrics = tracing.MetricsExporter()
+    metrics.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    print(f"Starting main loop for {len(doors)} door(s)")
+    tasks = [
+        asyncio.create_task(syncer.run()),
+        asyncio.create_task(clock.run()),
+        asyncio.create_task(shipper.run()),
+    ] + [asyncio.create_task(door.run()) for door in doors]
+    if multi:
+        tasks += [asyncio.create_task(lock_status.run()), asyncio.create_task(sampler.run())]
+    stopper = asyncio.create_task(stop.wait())
+    try:
+        done, _ = await asyncio.wait(tasks + [stopper], return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task is not stopper and task.exception() is not None:
+                print('Task failed:', task.exception())
+        print("Terminated by user" if stop.is_set() else "Shutting down")
+    finally:
+        for task in tasks + [stopper]:
+            task.cancel()
+        await asyncio.gather(*tasks, stopper, return_exceptions=True)
+        for door in doors:
+            door.keypad.stop()
+        journal.stop()
+        metrics.stop()
+        print("Journal stats:", journal.stats())
+        for door in doors:
+            door.lcd.wait_idle(timeout=1)
+            door.lcd.stop()
+            print(f"{door.name} LCD stats:", door.lcd.stats())
+            print(f"{door.name} PIN resolution stats:", door.resolver.stats())
+            print(f"{door.name} template slot stats:", door.slots.stats())
+        print("Server clock stats:", clock.stats())
+        print("HTTP client stats:", http_client.stats())
+        GPIO.cleanup()
+        print("Cleaned up GPIO pins")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(asyncio.run(main(load_doors(sys.argv[1]) if len(sys.argv) > 1 else None)))
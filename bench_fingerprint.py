@@ -0,0 +1,79 @@
+"""Scan-to-decision latency: single-pass capture pipeline vs the original flow.
+
+Runs against fingerprint_sim.SimulatedFingerprintSensor:
+
+    python bench_fingerprint.py --scans 10 --library 100 --bad-image-rate 0.2
+"""
+import argparse
+import random
+import statistics
+import time
+import fingerprint_capture
+import fingerprint_sim
+
+
+def legacy_flow(sensor):
+    """verify_fingerprint_and_pin() + get_fingerprint() as they were: two waits, two 2 s sleeps."""
+    time.sleep(1)
+    while sensor.get_image() != fingerprint_sim.OK:
+        time.sleep(0.1)
+    time.sleep(2)
+    while sensor.get_image() != fingerprint_sim.OK:
+        time.sleep(0.1)
+    time.sleep(2)
+    if sensor.image_2_tz(1) != fingerprint_sim.OK:
+        return None
+    if sensor.finger_fast_search() == fingerprint_sim.OK:
+        return sensor.finger_id
+    return None
+
+
+def pipeline_flow(sensor, stages):
+    result = fingerprint_capture.capture(sensor)
+    for stage, seconds in result.timings.items():
+        stages.setdefault(stage, []).append(seconds)
+    return result.finger_id
+
+
+def run(name, flow, args):
+    rng = random.Random(args.seed)
+    sensor = fingerprint_sim.SimulatedFingerprintSensor()
+    for slot in range(args.library):
+        sensor.enroll(slot, f'finger-{slot}')
+    latencies = []
+    matched = 0
+    for _ in range(args.scans):
+        slot = rng.randrange(args.library)
+        bad = 1 if rng.random() < args.bad_image_rate else 0
+        sensor.place_finger(f'finger-{slot}', after=rng.uniform(0.3, 1.5), bad_images=bad)
+        placed_at = sensor.finger_at
+        finger_id = flow(sensor)
+        latencies.append(time.monotonic() - placed_at)
+        matched += finger_id == slot
+        sensor.lift_finger()
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:8} scan-to-decision s: p50 {statistics.median(latencies):.2f}  "
+          f"p95 {p95:.2f}  matched {matched}/{args.scans}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scans', type=int, default=10)
+    parser.add_argument('--library', type=int, default=100, help='enrolled templates')
+    parser.add_argument('--bad-image-rate', type=float, default=0.2,
+                        help='share of scans whose first image fails to template')
+    parser.add_argument('--skip-legacy', action='store_true')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if not args.skip_legacy:
+        run('legacy', legacy_flow, args)
+    stages = {}
+    run('pipeline', lambda sensor: pipeline_flow(sensor, stages), args)
+    print('pipeline stage medians ms: ' + '  '.join(
+        f"{stage} {statistics.median(values) * 1000:.0f}" for stage, values in stages.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""Upstream load and door-side latency for a fleet of doors, direct vs through site_gateway.
+
+Starts stub_server as the API with an injected round trip, optionally a
+site_gateway process in front of it, and N simulated doors (threads). Each
+door follows the lock status (SSE direct, LAN announcements via the
+gateway), makes PIN attempts (instructor + admin lookup and server time)
+and reads temperatures, while lock commands are posted upstream:
+
+    python bench_gateway.py --doors 100 --duration 30 --rtt-ms 40
+    python bench_gateway.py --doors 100 --mode gateway
+"""
+import argparse
+import collections
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import http_client
+import lock_channel
+import server_clock
+import stub_server
+import telemetry
+
+LAN_KEY = 'bench'
+LAN_GROUP = '239.255.76.67:47656'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gateway(upstream):
+    """Run site_gateway.py in its own process; returns (process, base_url)."""
+    port = free_port()
+    env = dict(os.environ, LOCKUP_LAN_KEY=LAN_KEY, LOCKUP_LAN_GROUP=LAN_GROUP)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'site_gateway.py'),
+         '--upstream', upstream, '--host', '127.0.0.1', '--port', str(port)],
+        env=env, stdout=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            http_client.get(base_url + '/gateway/stats').raise_for_status()
+            return process, base_url
+        except Exception:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('gateway did not start')
+
+
+class Door(threading.Thread):
+    """One simulated door: PIN attempts and temperature reads on a thread."""
+
+    def __init__(self, index, pins, attempt_interval, stop, received):
+        super().__init__(name=f'door{index}', daemon=True)
+        self.index = index
+        self.pins = pins
+        self.attempt_interval = attempt_interval
+        self.stop = stop
+        self.received = received
+        self.rng = random.Random(index)
+        self.attempts = []
+        self.errors = 0
+
+    def on_status(self, status):
+        self.received.append((self.index, status, time.monotonic()))
+
+    def _get(self, path):
+        try:
+            http_client.get(path).raise_for_status()
+        except Exception:
+            self.errors += 1
+
+    def run(self):
+        next_temperature = time.monotonic() + self.rng.uniform(0, telemetry.SAMPLE_INTERVAL)
+        while not self.stop.wait(self.rng.expovariate(1 / self.attempt_interval)):
+            pin = self.rng.choice(self.pins)
+            t = time.perf_counter()
+            self._get(f'/api/admin/pin/{pin}')
+            self._get(f'/api/instructors/{pin}')
+            self._get(server_clock.TIME_URL)
+            self.attempts.append(time.perf_counter() - t)
+            if time.monotonic() >= next_temperature:
+                self._get(telemetry.TEMPERATURES_URL)
+                next_temperature += telemetry.SAMPLE_INTERVAL
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else float('nan')
+
+
+def run_mode(mode, args):
+    server, state, upstream = stub_server.start(rtt=args.rtt_ms / 1000)
+    pins = [f'{i:04d}' for i in range(args.pins)]
+    for pin in pins[::2]:
+        state.instructors[pin] = [{'day': 'Monday', 'start_time': '08:00:00',
+                                   'end_time': '10:00:00', 'username': f'user{pin}'}]
+    http_client.close()
+    http_client.POOL_MAXSIZE = 2 * args.doors + 8
+    http_client.API_BASE = upstream
+    gateway = None
+    if mode == 'gateway':
+        gateway, http_client.API_BASE = start_gateway(upstream)
+        time.sleep(1)  # Let the gateway sync its clock and subscribe upstream
+
+    stop = threading.Event()
+    received = []
+    doors = [Door(i, pins, args.attempt_interval, stop, received) for i in range(args.doors)]
+    channels = []
+    for door in doors:
+        if mode == 'gateway':
+            channel = lock_channel.LanListener(door.on_status, group=LAN_GROUP, key=LAN_KEY)
+        else:
+            channel = lock_channel.LockStatusChannel(door.on_status)
+        channel.start()
+        channels.append(channel)
+    time.sleep(1)
+    baseline = collections.Counter(state.paths)
+    received.clear()
+    for door in doors:
+        door.start()
+
+    # Post lock commands upstream and time how long every door takes to see each
+    started = time.monotonic()
+    commands = []
+    while time.monotonic() - started < args.duration:
+        status = 'unlock' if len(commands) % 2 == 0 else 'lock'
+        commands.append((status, time.monotonic()))
+        state.set_status(status)
+        time.sleep(args.duration / args.commands)
+    elapsed = time.monotonic() - started
+    stop.set()
+    for door in doors:
+        door.join()
+    time.sleep(0.5)
+    for channel in channels:
+        # Closing a stream another thread is reading can block; the daemon threads just end with us
+        if mode == 'gateway':
+            channel.stop()
+        else:
+            channel.stop_event.set()
+
+    fanout = []
+    for i, (status, sent) in enumerate(commands):
+        until = commands[i + 1][1] if i + 1 < len(commands) else float('inf')
+        seen = {}
+        for door, got, at in received:
+            if got == status and sent <= at < until:
+                seen.setdefault(door, at - sent)
+        fanout.append((len(seen), max(seen.values(), default=float('nan'))))
+    upstream_paths = collections.Counter()
+    for path, count in state.paths.items():
+        upstream_paths[http_client.endpoint_for(path)] += count - baseline[path]
+    attempts = [sample for door in doors for sample in door.attempts]
+    if gateway is not None:
+        gateway.terminate()
+        gateway.wait()
+    server.shutdown()
+    return {
+        'upstream_rps': sum(upstream_paths.values()) / elapsed,
+        'by_endpoint': {path: round(count / elapsed, 1) for path, count in upstream_paths.most_common()
+                        if count > 0},
+        'streams': state.paths['/api/logs/stream'],
+        'attempts': len(attempts),
+        'attempt_p50_ms': percentile(attempts, 0.5) * 1000,
+        'attempt_p99_ms': percentile(attempts, 0.99) * 1000,
+        'errors': sum(door.errors for door in doors),
+        'reached_all': sum(1 for count, _ in fanout if count == args.doors),
+        'commands': len(fanout),
+        'fanout_max_ms': statistics.median(worst for _, worst in fanout) * 1000 if fanout else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('direct', 'gateway', 'both'), default='both')
+    parser.add_argument('--doors', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--rtt-ms', type=float, default=40.0)
+    parser.add_argument('--attempt-interval', type=float, default=5.0,
+                        help='mean seconds between PIN attempts per door')
+    parser.add_argument('--pins', type=int, default=50, help='distinct PINs in use across the site')
+    parser.add_argument('--commands', type=int, default=10)
+    args = parser.parse_args()
+
+    modes = ('direct', 'gateway') if args.mode == 'both' else (args.mode,)
+    results = {mode: run_mode(mode, args) for mode in modes}
+    print(f"{'mode':>8}  {'upstream/s':>10}  {'SSE conns':>9}  {'attempts':>8}  {'p50 ms':>7}  "
+          f"{'p99 ms':>7}  {'errors':>6}  {'cmds to all':>11}  {'fan-out ms':>10}")
+    for mode, r in results.items():
+        print(f"{mode:>8}  {r['upstream_rps']:>10.1f}  {r['streams']:>9}  {r['attempts']:>8}  "
+              f"{r['attempt_p50_ms']:>7.1f}  {r['attempt_p99_ms']:>7.1f}  {r['errors']:>6}  "
+              f"{r['reached_all']:>5}/{r['commands']:<5}  {r['fanout_max_ms']:>10.1f}")
+    for mode, r in results.items():
+        print(f'{mode} upstream requests/s by endpoint:', r['by_endpoint'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Key-to-event latency and CPU: edge-driven Keypad vs the 100 ms polling scanner.
+
+Runs entirely against keypad_driver.SimulatedBackend:
+
+    python bench_keypad.py --presses 50 --hold 0.15
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+import keypad_driver
+
+
+def polling_scanner(backend, stop, on_key, interval=0.1):
+    """The original api.py readLine() loop: append every key seen high on every scan."""
+    while not stop.is_set():
+        for c, column in enumerate(keypad_driver.COLUMNS):
+            backend.set_column(column, 1)
+            for r, row in enumerate(keypad_driver.ROWS):
+                if backend.read_row(row):
+                    on_key(keypad_driver.LAYOUT[c][r])
+            backend.set_column(column, 0)
+        time.sleep(interval)
+
+
+def drive(backend, seen, presses, hold, rng):
+    """Tap random keys; return (latencies, events per press)."""
+    keys = [key for column in keypad_driver.LAYOUT for key in column]
+    latencies = []
+    counts = []
+    for _ in range(presses):
+        time.sleep(rng.uniform(0.05, 0.3))
+        key = rng.choice(keys)
+        del seen[:]
+        pressed_at = time.monotonic()
+        backend.press(key)
+        time.sleep(hold)
+        backend.release(key)
+        time.sleep(0.15)
+        hits = [t for k, t in list(seen) if k == key]
+        counts.append(len(hits))
+        if hits:
+            latencies.append(hits[0] - pressed_at)
+    return latencies, counts
+
+
+def idle_cpu(seconds):
+    cpu = time.process_time()
+    time.sleep(seconds)
+    return (time.process_time() - cpu) / seconds * 100
+
+
+def report(name, latencies, counts, cpu_idle, cpu_active):
+    ms = sorted(latency * 1000 for latency in latencies)
+    if ms:
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"{name:8} latency ms: p50 {statistics.median(ms):6.1f}  p95 {p95:6.1f}  max {ms[-1]:6.1f}")
+    print(f"{name:8} events/press: mean {statistics.mean(counts):.2f}  "
+          f"missed {counts.count(0)}  double-counted {sum(1 for c in counts if c > 1)}")
+    print(f"{name:8} CPU: idle {cpu_idle:.2f}%  active {cpu_active:.2f}%")
+
+
+def run_polling(args):
+    backend = keypad_driver.SimulatedBackend()
+    seen = []
+    stop = threading.Event()
+    thread = threading.Thread(target=polling_scanner, daemon=True,
+                              args=(backend, stop, lambda key: seen.append((key, time.monotonic()))))
+    thread.start()
+    cpu_idle = idle_cpu(args.idle)
+    cpu, wall = time.process_time(), time.monotonic()
+    latencies, counts = drive(backend, seen, args.presses, args.hold, random.Random(args.seed))
+    cpu_active = (time.process_time() - cpu) / (time.monotonic() - wall) * 100
+    stop.set()
+    thread.join()
+    report('polling', latencies, counts, cpu_idle, cpu_active)
+
+
+def run_events(args):
+    backend = keypad_driver.SimulatedBackend()
+    keypad = keypad_driver.Keypad(backend)
+    seen = []
+    stop = threading.Event()
+
+    def consume():
+        while not stop.is_set():
+            event = keypad.get(timeout=0.1)
+            if event is not None and event.kind == keypad_driver.PRESS:
+                seen.append((event.key, time.monotonic()))
+
+    keypad.start()
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    cpu_idle = idle_cpu(args.idle)
+    cpu, wall = time.process_time(), time.monotonic()
+    latencies, counts = drive(backend, seen, args.presses, args.hold, random.Random(args.seed))
+    cpu_active = (time.process_time() - cpu) / (time.monotonic() - wall) * 100
+    stop.set()
+    consumer.join()
+    keypad.stop()
+    report('events', latencies, counts, cpu_idle, cpu_active)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--presses', type=int, default=50)
+    parser.add_argument('--hold', type=float, default=0.15, help='seconds each key is held')
+    parser.add_argument('--idle', type=float, default=2.0, help='seconds of idle CPU sampling')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    run_polling(args)
+    run_events(args)
@@ -0,0 +1,98 @@
+"""Remote command latency and idle traffic of the lock-status channel.
+
+Starts stub_server locally, subscribes a door and posts lock/unlock commands:
+
+    python bench_lock_channel.py --mode stream --commands 20
+    python bench_lock_channel.py --mode conditional
+    python bench_lock_channel.py --mode poll        # the original 5 s GET loop
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+import http_client
+import lock_channel
+import stub_server
+
+
+def original_poll(on_status, stop, interval):
+    """check_lock_status() as it was: a full GET of /api/logs every interval."""
+    while not stop.is_set():
+        try:
+            response = http_client.get(lock_channel.LOGS_URL)
+            response.raise_for_status()
+            on_status(response.json().get('status'))
+        except Exception as e:
+            print('Failed to fetch lock status:', e)
+        stop.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('stream', 'conditional', 'poll'), default='stream')
+    parser.add_argument('--commands', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=lock_channel.POLL_INTERVAL,
+                        help='poll interval for the conditional/poll modes')
+    parser.add_argument('--idle', type=float, default=10.0, help='seconds of idle traffic sampling')
+    args = parser.parse_args()
+
+    server, state, base_url = stub_server.start()
+    http_client.API_BASE = base_url
+    received = []
+    got = threading.Condition()
+
+    def on_status(status):
+        with got:
+            received.append((status, time.monotonic()))
+            got.notify_all()
+
+    stop = threading.Event()
+    if args.mode == 'poll':
+        threading.Thread(target=original_poll, args=(on_status, stop, args.interval),
+                         daemon=True).start()
+    else:
+        channel = lock_channel.LockStatusChannel(on_status, poll_interval=args.interval)
+        if args.mode == 'conditional':
+            channel.stream_retry_at = float('inf')
+        channel.start()
+    time.sleep(0.5)
+
+    latencies = []
+    status = state.status
+    for _ in range(args.commands):
+        status = 'unlock' if status == 'lock' else 'lock'
+        with got:
+            del received[:]
+        sent = time.monotonic()
+        http_client.get_session().post(base_url + lock_channel.LOGS_URL, json={'status': status})
+        deadline = sent + args.interval * 2 + 1
+        with got:
+            while not any(s == status for s, _ in received) and time.monotonic() < deadline:
+                got.wait(deadline - time.monotonic())
+            hits = [t for s, t in received if s == status]
+        if hits:
+            latencies.append((hits[0] - sent) * 1000)
+        time.sleep(random.uniform(0, 0.2))
+
+    requests_before, bytes_before = state.requests, state.bytes_sent
+    time.sleep(args.idle)
+    idle_requests = state.requests - requests_before
+    idle_bytes = state.bytes_sent - bytes_before
+
+    stop.set()
+    if args.mode != 'poll':
+        channel.stop()
+    server.shutdown()
+
+    latencies.sort()
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{args.mode}: command latency ms p50 {statistics.median(latencies):.1f} "
+              f"p95 {p95:.1f} max {latencies[-1]:.1f} ({len(latencies)}/{args.commands} delivered)")
+    print(f"{args.mode}: idle {idle_requests / args.idle:.2f} req/s, "
+          f"{idle_bytes / args.idle:.1f} body bytes/s")
+
+
+if __name__ == '__main__':
+    main()
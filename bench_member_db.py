@@ -0,0 +1,97 @@
+"""PIN lookup cost: per-attempt SELECT vs member_db.MemberDB's in-memory index.
+
+Uses a SQLite stand-in for the MySQL `members` table, optionally with an
+injected per-query round trip to model the network hop to the DB host:
+
+    python bench_member_db.py --members 500 --attempts 2000 --rtt-ms 1
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import member_db
+
+
+def create_members(path, count):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE members (ID INTEGER PRIMARY KEY, PIN TEXT, updated_at TEXT)')
+    conn.execute('CREATE INDEX members_pin ON members (PIN)')
+    conn.executemany('INSERT INTO members VALUES (?, ?, ?)',
+                     [(i, f'{i:04d}', '2024-01-01 00:00:00') for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def slow_connect(path, rtt):
+    """sqlite_connect() whose cursors sleep `rtt` per execute, like a remote server."""
+    class Cursor(sqlite3.Cursor):
+        def execute(self, *args):
+            time.sleep(rtt)
+            return super().execute(*args)
+
+    class Connection(sqlite3.Connection):
+        def cursor(self, factory=Cursor):
+            return super().cursor(factory)
+
+    def connect():
+        return sqlite3.connect(path, check_same_thread=False, factory=Connection)
+    return connect
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (statistics.median(samples) * 1e6,
+            samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--attempts', type=int, default=2000)
+    parser.add_argument('--rtt-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'members.db')
+        create_members(path, args.members)
+        connect = slow_connect(path, args.rtt_ms / 1000)
+        pins = [f'{random.randrange(args.members * 2):04d}' for _ in range(args.attempts)]
+
+        # Before: one long-lived connection, the SELECT run twice per attempt
+        conn = connect()
+        cursor = conn.cursor()
+        legacy = []
+        for pin in pins:
+            t = time.perf_counter()
+            for _ in range(2):
+                cursor.execute('SELECT ID FROM members WHERE PIN = ?', (pin,))
+                cursor.fetchone()
+            legacy.append(time.perf_counter() - t)
+        conn.close()
+
+        db = member_db.MemberDB(connect)
+        t = time.perf_counter()
+        db.refresh()
+        load = time.perf_counter() - t
+        indexed = []
+        for pin in pins:
+            t = time.perf_counter()
+            db.member_for_pin(pin)
+            db.member_for_pin(pin)
+            indexed.append(time.perf_counter() - t)
+        queries = db.queries
+        db.refresh()  # Incremental pass: nothing changed
+        db.stop()
+
+    print(f"{'mode':>10}  {'p50 us':>10}  {'p99 us':>10}  {'DB trips/attempt':>16}")
+    print(f"{'select':>10}  {percentiles(legacy)[0]:>10.1f}  {percentiles(legacy)[1]:>10.1f}  {2:>16}")
+    print(f"{'index':>10}  {percentiles(indexed)[0]:>10.2f}  {percentiles(indexed)[1]:>10.2f}  {0:>16}")
+    print(f"index load: {load * 1000:.1f} ms for {args.members} members in {queries} queries; "
+          f"incremental refresh: {db.queries - queries} query")
+
+
+if __name__ == '__main__':
+    main()
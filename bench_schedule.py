@@ -0,0 +1,88 @@
+"""Access-decision cost: the old per-attempt string-compare scan vs schedule_index lookups.
+
+Builds a random weekly roster of the given sizes (rows for one PIN, as
+returned by /api/instructors/<pin>) and times both paths at random
+moments of the week and at the start of random rows (which the old scan
+reaches only after walking every row listed before them):
+
+    python bench_schedule.py --sizes 10 100 1000 10000 --lookups 2000
+"""
+import argparse
+import datetime
+import random
+import statistics
+import time
+import schedule_index
+
+MONDAY = datetime.datetime(2024, 1, 1)  # A Monday
+
+
+def roster(size, rng):
+    rows = []
+    for i in range(size):
+        start = rng.randrange(0, 24 * 3600, 900)
+        length = rng.choice((3600, 5400, 7200, 10800))
+        end = (start + length) % (24 * 3600)
+        rows.append({
+            'day': rng.choice(schedule_index.DAYS),
+            'start_time': f'{start // 3600:02d}:{start // 60 % 60:02d}:00',
+            'end_time': f'{end // 3600:02d}:{end // 60 % 60:02d}:00',
+            'username': f'user{i}',
+        })
+    return rows
+
+
+def legacy_lookup(instructors, server_now):
+    """The loop verify_fingerprint_and_pin used to run (same-day slots only)."""
+    server_time = server_now.strftime('%H:%M:%S')
+    current_day = server_now.strftime('%A')
+    for instructor in instructors:
+        subject_day = instructor.get('day')
+        subject_start_time = instructor.get('start_time')
+        subject_end_time = instructor.get('end_time')
+        if (subject_day == current_day and
+                subject_start_time <= server_time <= subject_end_time):
+            end_time_dt = datetime.datetime.strptime(subject_end_time, '%H:%M:%S')
+            pre_end_time_dt = end_time_dt - datetime.timedelta(minutes=10)
+            return instructor, pre_end_time_dt.strftime('%H:%M:%S')
+    return None
+
+
+def timed(fn, moments):
+    samples = []
+    for moment in moments:
+        t = time.perf_counter()
+        fn(moment)
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'rows':>6}  {'moments':>9}  {'scan us':>9}  {'index us':>9}  {'compile ms':>10}  {'intervals':>9}")
+    for size in args.sizes:
+        rows = roster(size, rng)
+        moments = [MONDAY + datetime.timedelta(seconds=rng.randrange(schedule_index.WEEK))
+                   for _ in range(args.lookups)]
+        row_starts = []
+        for row in rng.choices(rows, k=args.lookups):
+            day = schedule_index.DAYS.index(row['day'])
+            row_starts.append(MONDAY + datetime.timedelta(
+                days=day, seconds=schedule_index.parse_time(row['start_time'])))
+        t = time.perf_counter()
+        schedule = schedule_index.WeeklySchedule(rows)
+        compile_ms = (time.perf_counter() - t) * 1000
+        for label, sample in (('random', moments), ('row start', row_starts)):
+            scan = timed(lambda moment: legacy_lookup(rows, moment), sample)
+            index = timed(schedule.lookup, sample)
+            print(f"{size:>6}  {label:>9}  {scan:>9.1f}  {index:>9.2f}  {compile_ms:>10.2f}  {len(schedule):>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+"""Soak test: tens of thousands of door events in compressed time, watching for leaks.
+
+Runs one DoorController on the simulated HAL against stub_server and
+replays synthetic traffic through it: PIN attempts from instructors (some
+outside their slots, some with the wrong finger), admins and unknown
+PINs, remote lock/unlock commands and temperature alarms. The server
+clock runs --speed times faster so weekly schedules, session warnings
+and auto-locks all come round. RSS, CPU, open FDs and sockets and the
+thread count are sampled throughout, and the run fails (exit 1) when
+they grow beyond the thresholds between the warm-up and the end, or when
+the idle controller burns more CPU than --max-idle-cpu:
+
+    python bench_soak.py --attempts 20000 --output soak.json
+    python bench_soak.py --attempts 2000 --keys matrix   # through the keypad scanner too
+"""
+import os
+os.environ.setdefault('LOCKUP_HAL', 'sim')
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+import types
+import access_journal
+import api
+import bench_unlock
+import fingerprint_sim
+import hal
+import http_client
+import keypad_driver
+import local_store
+import schedule_index
+import session_scheduler
+import stub_server
+import telemetry
+
+HOT, COOL = telemetry.ALARM_THRESHOLD + 5, 21.5  # °C
+
+
+class CompressedClock:
+    """Server-aligned clock that runs `speed` times faster than real time."""
+
+    def __init__(self, speed):
+        self.speed = speed
+        self.start = datetime.datetime.now()
+        self.mono_ref = time.monotonic()
+
+    def now(self):
+        return self.start + datetime.timedelta(seconds=(time.monotonic() - self.mono_ref) * self.speed)
+
+    def stats(self):
+        return {'speed': self.speed}
+
+
+class ResourceSampler(threading.Thread):
+    """Samples this process's RSS, CPU, FDs, sockets and threads from /proc."""
+
+    def __init__(self, interval, progress):
+        super().__init__(name='soak-sampler', daemon=True)
+        self.interval = interval
+        self.progress = progress
+        self.samples = []
+        self.stop_event = threading.Event()
+
+    def sample(self):
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+        fds = os.listdir('/proc/self/fd')
+        sockets = 0
+        for fd in fds:
+            try:
+                sockets += os.readlink(f'/proc/self/fd/{fd}').startswith('socket:')
+            except OSError:
+                pass
+        times = os.times()
+        return {
+            'elapsed': time.monotonic(),
+            'attempts': self.progress(),
+            'rss_mb': int(status['VmRSS'].split()[0]) / 1024,
+            'cpu_s': times.user + times.system,
+            'fds': len(fds),
+            'sockets': sockets,
+            'threads': int(status['Threads']),
+        }
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.samples.append(self.sample())
+
+
+def seed(state, rng, instructors, admins, slots_per_week):
+    """Instructors with random 1-2 h weekly slots, admins, and their templates."""
+    users = []
+    for i in range(instructors):
+        pin, finger_id = f'{2000 + i:04d}', i + 1
+        rows = []
+        for _ in range(slots_per_week):
+            start = rng.randrange(0, schedule_index.DAY - 7200, 900)
+            end = start + rng.choice((3600, 5400, 7200))
+            rows.append({'day': rng.choice(schedule_index.DAYS),
+                         'start_time': f'{start // 3600:02d}:{start // 60 % 60:02d}:00',
+                         'end_time': f'{end // 3600:02d}:{end // 60 % 60:02d}:00',
+                         'finger_id': finger_id, 'name': f'User {i}', 'username': f'user{i}'})
+        state.instructors[pin] = rows
+        users.append(('instructor', pin, finger_id))
+    for i in range(admins):
+        pin, finger_id = f'{9000 + i:04d}', 1000 + i
+        state.admins[pin] = {'finger_id': finger_id, 'username': f'admin{i}'}
+        users.append(('admin', pin, finger_id))
+    for kind, pin, finger_id in users:
+        state.templates[str(finger_id)] = bytes((finger_id * 7 + j) % 256 for j in range(64))
+    return users
+
+
+async def soak(args, state, users, progress):
+    rng = random.Random(args.seed)
+    session_scheduler.MAX_SLEEP = 0.05  # Follow the compressed clock closely
+    store = local_store.LocalStore(os.path.join(args.workdir, 'cache.db'))
+    syncer = local_store.Syncer(store, interval=args.sync_interval)
+    clock = CompressedClock(args.speed)
+    journal = access_journal.AccessJournal(os.path.join(args.workdir, 'journal'), segment_bytes=64 << 10)
+    journal.start()
+    shipper = access_journal.JournalShipper(journal, interval=args.sync_interval)
+    config = dict(api.DEFAULT_DOOR, slot_map=os.path.join(args.workdir, 'slots.json'))
+    door = api.open_door(config, store, clock, journal)
+    door.sampler.interval = args.temperature_interval
+    probe = bench_unlock.Probe(door)
+    sensor = hal.sensors[-1]
+    keypad = hal.GPIO.keypad(config['columns'], config['rows'])
+    loop = asyncio.get_running_loop()
+
+    async def press(keys):
+        if args.keys == 'matrix':
+            await loop.run_in_executor(None, keypad.type, keys, 0.03, 0.03)
+        else:
+            for key in keys:
+                door.keypad.events.put(keypad_driver.KeyEvent(key, keypad_driver.PRESS, time.monotonic()))
+
+    async def admin_lock():
+        # The admin flow waits for '*' after the grant
+        while not probe.done.is_set():
+            await asyncio.sleep(0.02)
+            if door.manual_control:
+                await press('*')
+
+    schedules = {pin: schedule_index.WeeklySchedule(state.instructors[pin])
+                 for kind, pin, finger_id in users if kind == 'instructor'}
+
+    def pick():
+        if rng.random() < args.in_slot_rate:
+            now = clock.now()
+            allowed = [user for user in users if user[1] in schedules and schedules[user[1]].lookup(now)]
+            if allowed:
+                return rng.choice(allowed)
+        return rng.choice(users)
+
+    tasks = [asyncio.create_task(coro) for coro in
+             (door.run(), syncer.run(), shipper.run())]
+    await asyncio.sleep(0.5)
+    status = 'lock'
+    hot_until = 0
+    for i in range(args.attempts):
+        kind, pin, finger_id = pick()
+        if rng.random() < args.unknown_rate:
+            pin, finger_id = f'{rng.randrange(5000, 9000):04d}', None
+        wrong_finger = rng.random() < args.wrong_finger_rate
+        template = state.templates.get(str(finger_id)) if finger_id else None
+        sensor.place_finger(b'wrong' if wrong_finger or template is None else template)
+        probe.done.clear()
+        await press(pin)
+        helper = asyncio.create_task(admin_lock()) if kind == 'admin' else None
+        try:
+            await asyncio.wait_for(probe.done.wait(), timeout=30)
+        except asyncio.TimeoutError:
+            print(f'Attempt {i} ({pin}) did not finish')
+        if helper is not None:
+            helper.cancel()
+        sensor.lift_finger()
+        progress.count = i + 1
+        if args.command_every and i % args.command_every == 0:
+            status = 'unlock' if status == 'lock' else 'lock'
+            state.set_status(status)
+        if args.alarm_every and i % args.alarm_every == 0:
+            state.temperatures = [{'temperature': HOT, 'humidity': 40.0}]
+            hot_until = time.monotonic() + 2 * args.temperature_interval  # Long enough for one sample
+        elif hot_until and time.monotonic() >= hot_until:
+            state.temperatures = [{'temperature': COOL, 'humidity': 40.0}]
+            hot_until = 0
+        await asyncio.sleep(3 * args.ui_pause)  # Back at "Enter Your PIN"
+        door.keypad.flush()
+
+    progress.idle_from = time.monotonic()
+    await asyncio.sleep(args.idle)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    door.keypad.stop()
+    door.lcd.stop()
+    journal.stop()
+    return {'journal': journal.stats(), 'slots': door.slots.stats(), 'resolver': door.resolver.stats()}
+
+
+def window(samples, start, end):
+    """Median of each metric over the samples in the [start, end) fraction of the run."""
+    chunk = samples[int(len(samples) * start):max(int(len(samples) * end), int(len(samples) * start) + 1)]
+    return {key: statistics.median(s[key] for s in chunk) for key in ('rss_mb', 'fds', 'sockets', 'threads')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--speed', type=float, default=3600, help='simulated seconds per real second')
+    parser.add_argument('--keys', choices=('queue', 'matrix'), default='queue',
+                        help='queue: keys straight to the controller; matrix: through the scanner')
+    parser.add_argument('--instructors', type=int, default=200, help='more than the 150 sensor slots')
+    parser.add_argument('--admins', type=int, default=3)
+    parser.add_argument('--slots-per-week', type=int, default=10)
+    parser.add_argument('--in-slot-rate', type=float, default=0.5,
+                        help='share of attempts by instructors inside one of their slots')
+    parser.add_argument('--unknown-rate', type=float, default=0.1)
+    parser.add_argument('--wrong-finger-rate', type=float, default=0.05)
+    parser.add_argument('--command-every', type=int, default=50, help='attempts between remote commands')
+    parser.add_argument('--alarm-every', type=int, default=500, help='attempts between heat alarms')
+    parser.add_argument('--sync-interval', type=float, default=2.0)
+    parser.add_argument('--temperature-interval', type=float, default=0.5)
+    parser.add_argument('--ui-pause', type=float, default=0.005)
+    parser.add_argument('--sample-interval', type=float, default=1.0)
+    parser.add_argument('--idle', type=float, default=10.0, help='seconds idle at the end to measure CPU')
+    parser.add_argument('--max-rss-growth-mb', type=float, default=10.0)
+    parser.add_argument('--max-fd-growth', type=int, default=5)
+    parser.add_argument('--max-socket-growth', type=int, default=3)
+    parser.add_argument('--max-thread-growth', type=int, default=2)
+    parser.add_argument('--max-idle-cpu', type=float, default=10.0, help='percent of one core')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write samples and the verdict as JSON to this path')
+    parser.add_argument('--verbose', action='store_true', help='keep the door\'s console output')
+    args = parser.parse_args()
+
+    server, state, base_url = stub_server.start()
+    http_client.API_BASE = base_url
+    users = seed(state, random.Random(args.seed), args.instructors, args.admins, args.slots_per_week)
+    hal.SIM_LATENCIES.update({command: 0.001 for command in fingerprint_sim.LATENCIES})
+    api.asyncio = bench_unlock.fast_asyncio(args.ui_pause)
+
+    progress = types.SimpleNamespace(count=0, idle_from=None)
+    sampler = ResourceSampler(args.sample_interval, lambda: progress.count)
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        sampler.start()
+        with contextlib.ExitStack() as stack:
+            if not args.verbose:
+                stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+            summary = asyncio.run(soak(args, state, users, progress))
+        sampler.stop_event.set()
+        sampler.join()
+    server.shutdown()
+    elapsed = time.monotonic() - started
+
+    samples = sampler.samples
+    busy = [s for s in samples if progress.idle_from is None or s['elapsed'] < progress.idle_from]
+    idle = [s for s in samples if progress.idle_from is not None and s['elapsed'] >= progress.idle_from]
+    before, after = window(busy, 0.1, 0.2), window(busy, 0.9, 1.0)
+    growth = {key: after[key] - before[key] for key in before}
+    idle_cpu = ((idle[-1]['cpu_s'] - idle[0]['cpu_s']) / (idle[-1]['elapsed'] - idle[0]['elapsed']) * 100
+                if len(idle) > 1 else 0.0)
+    busy_cpu = ((busy[-1]['cpu_s'] - busy[0]['cpu_s']) / (busy[-1]['elapsed'] - busy[0]['elapsed']) * 100
+                if len(busy) > 1 else 0.0)
+    limits = {'rss_mb': args.max_rss_growth_mb, 'fds': args.max_fd_growth,
+              'sockets': args.max_socket_growth, 'threads': args.max_thread_growth}
+    failures = [f'{key} grew by {growth[key]:.1f} (limit {limits[key]})'
+                for key in limits if growth[key] > limits[key]]
+    if idle_cpu > args.max_idle_cpu:
+        failures.append(f'idle CPU {idle_cpu:.1f}% (limit {args.max_idle_cpu}%)')
+
+    print(f"{args.attempts} attempts in {elapsed:.0f} s ({args.attempts / elapsed:.0f}/s), "
+          f"{elapsed * args.speed / 86400:.1f} simulated days")
+    print(f"{'metric':>8}  {'warm-up':>8}  {'end':>8}  {'growth':>8}  {'limit':>6}")
+    for key in limits:
+        print(f"{key:>8}  {before[key]:>8.1f}  {after[key]:>8.1f}  {growth[key]:>+8.1f}  {limits[key]:>6}")
+    print(f"CPU: {busy_cpu:.0f}% of a core under load, {idle_cpu:.1f}% idle")
+    print('Journal:', summary['journal'], 'Slots:', summary['slots'])
+    print('FAIL: ' + '; '.join(failures) if failures else 'PASS')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k not in ('output', 'workdir')},
+                       'elapsed_s': elapsed, 'warmup': before, 'end': after, 'growth': growth,
+                       'busy_cpu_pct': busy_cpu, 'idle_cpu_pct': idle_cpu, 'failures': failures,
+                       'summary': summary, 'samples': samples}, f, indent=2)
+        print('Wrote', args.output)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,235 @@
+"""Keypress-to-relay latency of the door flow, per stage, on simulated hardware.
+
+Runs one DoorController under LOCKUP_HAL=sim against stub_server with a
+configurable round trip and jitter. Each attempt types a 4-digit PIN on
+the simulated keypad with the user's finger already on the sensor, and
+the time from the last key press to the relay opening is split into:
+
+    keypad       last key press -> PIN handed to the resolver (debounce, scan)
+    resolve      admin + instructor lookup (local store or API)
+    schedule     server-aligned time, schedule check and LCD prompt
+    template     making the user's template resident on the sensor
+    fingerprint  capture and 1:1 verify (includes the template stage)
+    relay        match -> relay write
+
+    python bench_unlock.py --attempts 100 --rtt-ms 40 --jitter-ms 10 --output unlock.json
+    python bench_unlock.py --store synced --resident   # warm: everything local
+
+Percentiles go to stdout and, with --output, to a JSON file (with the git
+commit) so runs can be diffed between commits.
+"""
+import os
+os.environ.setdefault('LOCKUP_HAL', 'sim')
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import subprocess
+import tempfile
+import time
+import types
+import access_journal
+import api
+import hal
+import http_client
+import local_store
+import server_clock
+import stub_server
+
+STAGES = ('keypad', 'resolve', 'schedule', 'template', 'fingerprint', 'relay', 'total')
+TEMPLATE_BYTES = 512
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else None
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def seed_users(state, count):
+    """One instructor per PIN, allowed all day today, with a server-side template."""
+    today = datetime.datetime.now().strftime('%A')
+    users = []
+    for i in range(count):
+        pin, finger_id = f'{1000 + i:04d}', i + 1
+        template = bytes((finger_id * 7 + j) % 256 for j in range(TEMPLATE_BYTES))
+        state.instructors[pin] = [{'day': today, 'start_time': '00:00:00', 'end_time': '23:59:59',
+                                   'finger_id': finger_id, 'name': f'User {i}', 'username': f'user{i}'}]
+        state.templates[str(finger_id)] = template
+        users.append((pin, finger_id, template))
+    return users
+
+
+class Probe:
+    """Wraps the door's stage methods to timestamp each attempt."""
+
+    def __init__(self, door):
+        self.door = door
+        self.marks = {}
+        self.done = asyncio.Event()
+        self.wrap_async('resolve', door.resolver, 'resolve')
+        self.wrap_async('fingerprint', door, 'get_fingerprint')
+        self.wrap_async('verify', door, 'verify_fingerprint_and_pin')
+        self.wrap_async('verify', door, 'verify_admin_fingerprint_and_pin')
+        self.wrap_sync('template', door, '_resident_slots')
+
+    def wrap_async(self, stage, owner, name):
+        original = getattr(owner, name)
+
+        async def timed(*args, **kwargs):
+            self.marks[stage + '_start'] = time.monotonic()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                self.marks[stage + '_end'] = time.monotonic()
+                if stage == 'verify':
+                    self.done.set()
+        setattr(owner, name, timed)
+
+    def wrap_sync(self, stage, owner, name):
+        original = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            self.marks[stage + '_start'] = time.monotonic()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.marks[stage + '_end'] = time.monotonic()
+        setattr(owner, name, timed)
+
+
+def fast_asyncio(pause):
+    """api's asyncio with UI pauses (welcome screens, lockouts) cut to `pause`."""
+    sleep = asyncio.sleep
+    return types.SimpleNamespace(**dict(vars(asyncio), sleep=lambda delay, *a: sleep(min(delay, pause), *a)))
+
+
+async def attempt(door, probe, keypad, sensor, pin, template, hold):
+    probe.marks.clear()
+    probe.done.clear()
+    sensor.place_finger(template)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, keypad.type, pin[:-1], hold, hold)
+    keypad.press(pin[-1])
+    pressed = time.monotonic()
+    await asyncio.sleep(hold)
+    keypad.release(pin[-1])
+    await asyncio.wait_for(probe.done.wait(), timeout=30)
+    sensor.lift_finger()
+    marks = probe.marks
+    unlocked = [at for at, level in hal.GPIO.history(door.relay_pin) if level == 0 and at >= pressed]
+    if not unlocked or 'fingerprint_end' not in marks:
+        return None
+    stages = {
+        'keypad': marks['resolve_start'] - pressed,
+        'resolve': marks['resolve_end'] - marks['resolve_start'],
+        'schedule': marks['fingerprint_start'] - marks['resolve_end'],
+        'template': marks['template_end'] - marks['template_start'],
+        'fingerprint': marks['fingerprint_end'] - marks['fingerprint_start'],
+        'relay': unlocked[0] - marks['fingerprint_end'],
+        'total': unlocked[0] - pressed,
+    }
+    return stages
+
+
+async def run(args, users):
+    store = local_store.LocalStore(':memory:')
+    if args.store == 'synced':
+        local_store.Syncer(store).sync_once()
+    clock = server_clock.ServerClock()
+    clock.sync()
+    journal = access_journal.AccessJournal(os.path.join(args.workdir, 'journal'))
+    config = dict(api.DEFAULT_DOOR, slot_map=os.path.join(args.workdir, 'slots.json'))
+    door = api.open_door(config, store, clock, journal)
+    sensor = hal.sensors[-1]
+    if args.resident:
+        for pin, finger_id, template in users:
+            door.slots.ensure_resident(finger_id, template)  # Mapped, so run() keeps them
+    probe = Probe(door)
+    keypad = hal.GPIO.keypad(config['columns'], config['rows'])
+    task = asyncio.create_task(door.run())
+    await asyncio.sleep(0.5)
+
+    results, failures = [], 0
+    for i in range(args.attempts):
+        pin, finger_id, template = users[i % len(users)]
+        stages = await attempt(door, probe, keypad, sensor, pin, template, args.hold_ms / 1000)
+        if stages is None:
+            failures += 1
+        else:
+            results.append(stages)
+        await asyncio.sleep(3 * args.ui_pause + 0.05)  # Back at "Enter Your PIN"
+        door.sessions.close_all()
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    door.keypad.stop()
+    door.lcd.stop()
+    journal.stop()
+    return results, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=50)
+    parser.add_argument('--rtt-ms', type=float, default=40.0)
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--store', choices=('empty', 'synced'), default='empty',
+                        help='empty: every PIN is looked up over the API; synced: all local')
+    parser.add_argument('--resident', action='store_true',
+                        help='templates already on the sensor (else uploaded on first use)')
+    parser.add_argument('--hold-ms', type=float, default=80.0, help='key hold and gap')
+    parser.add_argument('--ui-pause', type=float, default=0.05,
+                        help='cap on the flow\'s UI sleeps (welcome screens), seconds')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--verbose', action='store_true', help='keep the door\'s console output')
+    args = parser.parse_args()
+
+    server, state, base_url = stub_server.start(rtt=args.rtt_ms / 1000, jitter=args.jitter_ms / 1000)
+    http_client.API_BASE = base_url
+    users = seed_users(state, args.attempts)  # A fresh PIN per attempt
+    api.asyncio = fast_asyncio(args.ui_pause)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        with contextlib.ExitStack() as stack:
+            if not args.verbose:
+                stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+            results, failures = asyncio.run(run(args, users))
+    server.shutdown()
+
+    summary = {}
+    print(f"{'stage':>12}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}")
+    for stage in STAGES:
+        samples = [r[stage] for r in results]
+        summary[stage] = {f'p{int(q * 100)}_ms': round(percentile(samples, q) * 1000, 3) if samples else None
+                          for q in (0.5, 0.95, 0.99)}
+        row = summary[stage]
+        print(f"{stage:>12}  {row['p50_ms'] or 0:>8.1f}  {row['p95_ms'] or 0:>8.1f}  {row['p99_ms'] or 0:>8.1f}")
+    print(f'{len(results)} unlocks, {failures} failed attempts')
+
+    if args.output:
+        report = {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'config': {key: value for key, value in vars(args).items() if key not in ('output', 'workdir')},
+            'unlocks': len(results),
+            'failures': failures,
+            'stages': summary,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('Wrote', args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Matching latency of 1:1 template compare vs 1:N library search by library size.
+
+Runs against fingerprint_sim.SimulatedFingerprintSensor; the image and
+templating stages are the same for both and are left out of the figures:
+
+    python bench_verify.py --sizes 10 50 100 150 500 1000 --scans 5
+"""
+import argparse
+import statistics
+import fingerprint_capture
+import fingerprint_sim
+
+
+def match_time(result):
+    return sum(result.timings.get(stage, 0.0) for stage in ('search', 'load', 'compare'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100, 150, 500, 1000])
+    parser.add_argument('--scans', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'templates':>9}  {'1:N search ms':>13}  {'1:1 compare ms':>14}")
+    for size in args.sizes:
+        sensor = fingerprint_sim.SimulatedFingerprintSensor(library_size=size)
+        for slot in range(size):
+            sensor.enroll(slot, f'finger-{slot}')
+        search, compare = [], []
+        for scan in range(args.scans):
+            slot = (scan * 7919) % size
+            sensor.place_finger(f'finger-{slot}')
+            result = fingerprint_capture.capture(sensor)
+            assert result.finger_id == slot, result
+            search.append(match_time(result))
+            result = fingerprint_capture.verify(sensor, [slot])
+            assert result.finger_id == slot, result
+            compare.append(match_time(result))
+        print(f"{size:>9}  {statistics.median(search) * 1000:>13.1f}  "
+              f"{statistics.median(compare) * 1000:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
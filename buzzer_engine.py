@@ -0,0 +1,127 @@
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+# steps: ((on_seconds, off_seconds), ...) played `repeat` times (None = until cancelled).
+# A pattern still queued after `ttl` seconds is dropped instead of played late.
+Pattern = collections.namedtuple('Pattern', 'name steps repeat priority ttl',
+                                 defaults=(1, 0, None))
+
+CHIRP = Pattern('chirp', ((0.3, 0),), priority=1, ttl=1)
+WARNING = Pattern('warning', ((0.1, 0.1),), repeat=50, priority=2)   # 10-minute warning, 10 s
+ALARM = Pattern('alarm', ((0.1, 0.1),), repeat=50, priority=3)       # 10 s
+LONG_ALARM = Pattern('long_alarm', ((1, 2),), repeat=10, priority=3)  # 30 s
+
+
+class BuzzerEngine:
+    """Plays buzzer patterns on a background thread; play() returns immediately.
+
+    The highest-priority pending pattern plays next. A pattern with a higher
+    priority than the one sounding preempts it; equal or lower ones wait.
+    """
+
+    def __init__(self, set_level):
+        self.set_level = set_level  # Callable taking True (on) / False (off)
+        self.cond = threading.Condition()
+        self.pending = []
+        self.current = None
+        self.current_pattern = None
+        self.ids = itertools.count(1)
+        self.stopping = False
+        self.thread = None
+
+    def play(self, pattern):
+        """Queue a pattern; returns a handle usable with cancel()."""
+        with self.cond:
+            handle = next(self.ids)
+            heapq.heappush(self.pending, (-pattern.priority, handle, pattern, time.monotonic()))
+            if self.current_pattern is not None and pattern.priority > self.current_pattern.priority:
+                self.current = None  # Preempt the pattern that is sounding
+            self.cond.notify_all()
+            return handle
+
+    def cancel(self, handle=None):
+        """Stop the sounding pattern, or drop the pattern with the given handle."""
+        with self.cond:
+            if handle is None or handle == self.current:
+                self.current = None
+            else:
+                self.pending = [entry for entry in self.pending if entry[1] != handle]
+                heapq.heapify(self.pending)
+            self.cond.notify_all()
+
+    def cancel_all(self):
+        with self.cond:
+            self.pending = []
+            self.current = None
+            self.cond.notify_all()
+
+    def active(self):
+        """Return the name of the sounding pattern, or None."""
+        with self.cond:
+            return self.current_pattern.name if self.current is not None else None
+
+    def _next(self):
+        """Block until a live pattern is pending; return (handle, pattern) or None on stop."""
+        with self.cond:
+            while True:
+                while not self.pending and not self.stopping:
+                    self.cond.wait()
+                if self.stopping:
+                    return None
+                _, handle, pattern, queued_at = heapq.heappop(self.pending)
+                if pattern.ttl is not None and time.monotonic() - queued_at > pattern.ttl:
+                    continue
+                self.current = handle
+                self.current_pattern = pattern
+                return handle, pattern
+
+    def _hold(self, handle, seconds):
+        """Wait, returning False early if the pattern was cancelled or preempted."""
+        deadline = time.monotonic() + seconds
+        with self.cond:
+            while self.current == handle and not self.stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                self.cond.wait(remaining)
+            return False
+
+    def _play(self, handle, pattern):
+        cycles = itertools.count() if pattern.repeat is None else range(pattern.repeat)
+        try:
+            for _ in cycles:
+                for on, off in pattern.steps:
+                    self.set_level(True)
+                    if not self._hold(handle, on):
+                        return
+                    self.set_level(False)
+                    if not self._hold(handle, off):
+                        return
+        finally:
+            self.set_level(False)
+            with self.cond:
+                if self.current == handle:
+                    self.current = None
+                    self.current_pattern = None
+
+    def _run(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            self._play(*job)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+        self.set_level(False)
@@ -0,0 +1,187 @@
+import base64
+import collections
+import csv
+import itertools
+import queue
+import threading
+import time
+import upload_outbox
+
+POLL_INTERVAL = 0.05     # Seconds between readImage() polls while no finger is present
+CAPTURE_TIMEOUT = 60     # Seconds to wait for a finger before giving up on a job
+
+# Event kinds posted to EnrollmentWorker.events
+QUEUED, WAITING, CAPTURED, UPLOADING, RETRY, DONE, FAILED, CANCELLED, DELETED = (
+    'queued', 'waiting', 'captured', 'uploading', 'retry', 'done', 'failed', 'cancelled', 'deleted')
+
+Job = collections.namedtuple('Job', 'id email pin')
+Event = collections.namedtuple('Event', 'job kind message')
+
+
+class Cancelled(Exception):
+    pass
+
+
+def load_roster(path):
+    """Read a CSV roster with 'email' and 'pin' columns.
+
+    Returns (rows, errors): valid (email, pin) pairs in file order, and
+    one message per rejected line.
+    """
+    rows, errors = [], []
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+        if 'email' not in fields or 'pin' not in fields:
+            return [], ["CSV must have 'email' and 'pin' columns"]
+        for line, record in enumerate(reader, start=2):
+            email = (record[fields['email']] or '').strip()
+            pin = (record[fields['pin']] or '').strip()
+            if not email or not pin:
+                errors.append(f'Line {line}: email and PIN are required')
+            elif not pin.isdigit() or len(pin) != 4:
+                errors.append(f'Line {line}: PIN must be a 4-digit number')
+            else:
+                rows.append((email, pin))
+    return rows, errors
+
+
+class EnrollmentWorker:
+    """Enrolls fingerprints off the Tk thread.
+
+    The sensor thread captures and stores one template at a time (and also
+    runs deletions, so every sensor command stays serialised). Each
+    template's PUT is then written to a persistent upload_outbox and
+    drained by a pool of upload threads with retries, so scanning goes on
+    back-to-back whether the API is slow or down, and unsent uploads
+    survive a restart. Progress is posted as Events to `events` for the
+    GUI to drain with root.after().
+    """
+
+    def __init__(self, sensor, api_url, poll_interval=POLL_INTERVAL,
+                 capture_timeout=CAPTURE_TIMEOUT, outbox=None):
+        self.sensor = sensor
+        self.api_url = api_url
+        self.poll_interval = poll_interval
+        self.capture_timeout = capture_timeout
+        self.events = queue.Queue()
+        self.sensor_jobs = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.outbox = outbox or upload_outbox.UploadOutbox()
+        self.drainer = upload_outbox.OutboxDrainer(self.outbox, on_result=self._on_upload)
+        self.uploads = {}  # outbox id -> Job
+        self.uploads_lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._sensor_loop, name='enroll-sensor', daemon=True)
+        self.thread.start()
+        self.drainer.start()
+
+    def stop(self):
+        self.cancel_event.set()
+        self.sensor_jobs.put(None)
+        self.thread.join(timeout=self.poll_interval + 1)
+        self.drainer.stop()
+        self.outbox.close()
+
+    # Called from the GUI thread
+
+    def submit(self, email, pin):
+        """Queue an enrollment scan; returns its Job."""
+        job = Job(next(self.ids), email, pin)
+        self.sensor_jobs.put(('enroll', job))
+        self._post(job, QUEUED, f'Queued {email}')
+        return job
+
+    def delete(self, position):
+        """Queue deletion of a template slot behind any pending captures."""
+        self.sensor_jobs.put(('delete', position))
+
+    def cancel(self):
+        """Abandon (skip) the capture that is currently waiting for a finger."""
+        self.cancel_event.set()
+
+    # Worker threads
+
+    def _post(self, job, kind, message):
+        self.events.put(Event(job, kind, message))
+
+    def _sensor_loop(self):
+        while True:
+            item = self.sensor_jobs.get()
+            if item is None:
+                return
+            action, arg = item
+            if action == 'delete':
+                self._delete(arg)
+                continue
+            self.cancel_event.clear()
+            try:
+                result = self._capture(arg)
+            except Cancelled:
+                self._post(arg, CANCELLED, f'Cancelled {arg.email}')
+                continue
+            except Exception as e:
+                self._post(arg, FAILED, f'Operation failed! {e}')
+                continue
+            if result is not None:
+                self._enqueue_upload(arg, *result)
+
+    def _capture(self, job):
+        """Wait for a finger and store a new template; returns (position, template) or None."""
+        waiting = self.sensor_jobs.qsize()
+        self._post(job, WAITING, f'Place finger for {job.email}'
+                                 + (f' ({waiting} more queued)' if waiting else ''))
+        end = time.monotonic() + self.capture_timeout
+        while not self.sensor.readImage():
+            if self.cancel_event.is_set():
+                raise Cancelled()
+            if time.monotonic() >= end:
+                self._post(job, FAILED, 'No finger detected')
+                return None
+            time.sleep(self.poll_interval)
+
+        self.sensor.convertImage(0x01)
+
+        position = self.sensor.searchTemplate()[0]
+        if position >= 0:
+            self._post(job, FAILED, f'Fingerprint already registered at position {position}!')
+            return None
+
+        self.sensor.createTemplate()
+        position = self.sensor.storeTemplate()
+
+        # Download the characteristics of the template to store as BLOB
+        self.sensor.loadTemplate(position, 0x01)
+        template = bytearray(self.sensor.downloadCharacteristics(0x01))
+        self._post(job, CAPTURED, f'Fingerprint registered at position {position}')
+        return position, template
+
+    def _delete(self, position):
+        try:
+            self.sensor.deleteTemplate(position)
+            self._post(None, DELETED, f'Fingerprint at position {position} deleted successfully!')
+        except Exception as e:
+            self._post(None, FAILED, f'Failed to delete fingerprint: {e}')
+
+    def _enqueue_upload(self, job, position, template):
+        payload = {
+            'finger_id': position,
+            'pin': int(job.pin),
+            'fingerprint_template': base64.b64encode(template).decode('utf-8'),
+        }
+        with self.uploads_lock:
+            row_id = self.outbox.put(self.api_url.format(job.email), payload, label=job.email)
+            self.uploads[row_id] = job
+        self._post(job, QUEUED, f'Upload of {job.email} queued')
+        self.drainer.notify()
+
+    def _on_upload(self, row_id, label, kind, message):
+        # Uploads left over from an earlier session have no Job of their own
+        with self.uploads_lock:
+            job = self.uploads.get(row_id) or Job(f'outbox-{row_id}', label, None)
+            if kind in (DONE, FAILED):
+                self.uploads.pop(row_id, None)
+        self._post(job, kind, f'{label}: {message}' if kind != UPLOADING else message)
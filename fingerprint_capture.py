@@ -0,0 +1,115 @@
+import collections
+import time
+import tracing
+
+# Confirmation codes, as in adafruit_fingerprint (kept local so the pipeline
+# also runs against fingerprint_sim without the hardware library)
+OK = 0x00
+
+CAPTURE_DEADLINE = 15   # Seconds from the prompt until the scan is abandoned
+POLL_INTERVAL = 0.05    # Seconds between get_image() polls while no finger is present
+MAX_ATTEMPTS = 3        # Captures tried when image_2_tz() rejects the image
+SEARCH_FALLBACK = False  # Let verify() fall back to a 1:N library search
+
+MATCH, NO_MATCH, TIMEOUT, BAD_IMAGE = 'match', 'no_match', 'timeout', 'bad_image'
+
+CaptureResult = collections.namedtuple('CaptureResult', 'status finger_id confidence timings attempts')
+
+
+class _Scan:
+    """Timing and attempt bookkeeping shared by capture() and verify()."""
+
+    def __init__(self, deadline):
+        self.started = time.perf_counter()
+        self.end = time.monotonic() + deadline
+        self.timings = {'image': 0.0, 'templating': 0.0}
+        self.attempts = 0
+
+    def result(self, status, finger_id=None, confidence=None):
+        self.timings['total'] = time.perf_counter() - self.started
+        return CaptureResult(status, finger_id, confidence, self.timings, self.attempts)
+
+    def timed(self, stage, fn, *args):
+        t = time.perf_counter()
+        try:
+            with tracing.span('sensor.' + fn.__name__):
+                return fn(*args)
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - t
+
+
+def _acquire(sensor, scan, poll_interval, max_attempts):
+    """Get one image into char buffer 1; returns None on success or a failure status.
+
+    A new image is taken only when image_2_tz() rejects the previous one.
+    """
+    while True:
+        t, waited = time.perf_counter(), time.perf_counter_ns()
+        while True:
+            polled = time.perf_counter_ns()
+            if sensor.get_image() == OK:
+                # Only the capture that took an image; empty polls would flood the ring
+                tracing.record('sensor.get_image', polled, time.perf_counter_ns())
+                break
+            if time.monotonic() >= scan.end:
+                scan.timings['image'] += time.perf_counter() - t
+                return TIMEOUT
+            time.sleep(poll_interval)
+        scan.timings['image'] += time.perf_counter() - t
+        tracing.record('sensor.finger_wait', waited, time.perf_counter_ns())
+        scan.attempts += 1
+        if scan.timed('templating', sensor.image_2_tz, 1) == OK:
+            return None
+        if scan.attempts >= max_attempts or time.monotonic() >= scan.end:
+            return BAD_IMAGE
+
+
+def _search(sensor, scan):
+    if scan.timed('search', sensor.finger_fast_search) != OK:
+        return scan.result(NO_MATCH)
+    return scan.result(MATCH, sensor.finger_id, getattr(sensor, 'confidence', None))
+
+
+def capture(sensor, deadline=CAPTURE_DEADLINE, poll_interval=POLL_INTERVAL,
+            max_attempts=MAX_ATTEMPTS):
+    """Capture one image, template it and search the whole sensor library (1:N).
+
+    Returns a CaptureResult with per-stage timings in seconds (image,
+    templating, search, total); the finger must arrive within `deadline`.
+    """
+    scan = _Scan(deadline)
+    failure = _acquire(sensor, scan, poll_interval, max_attempts)
+    if failure:
+        return scan.result(failure)
+    return _search(sensor, scan)
+
+
+def verify(sensor, finger_ids, deadline=CAPTURE_DEADLINE, poll_interval=POLL_INTERVAL,
+           max_attempts=MAX_ATTEMPTS, search_fallback=None):
+    """Capture one image and compare it 1:1 against the expected template slots.
+
+    Each slot in `finger_ids` is loaded into char buffer 2 and compared with
+    the live capture on the sensor, so the cost does not grow with the size
+    of the library. Only when search_fallback (default SEARCH_FALLBACK) is
+    set does a miss fall back to capture()'s 1:N search.
+    """
+    if search_fallback is None:
+        search_fallback = SEARCH_FALLBACK
+    scan = _Scan(deadline)
+    failure = _acquire(sensor, scan, poll_interval, max_attempts)
+    if failure:
+        return scan.result(failure)
+    for finger_id in finger_ids:
+        if scan.timed('load', sensor.load_model, finger_id, 2) != OK:
+            continue
+        if scan.timed('compare', sensor.compare_templates) == OK:
+            return scan.result(MATCH, finger_id, getattr(sensor, 'confidence', None))
+    if search_fallback:
+        return _search(sensor, scan)
+    return scan.result(NO_MATCH)
+
+
+def format_timings(result):
+    """One-line summary of a CaptureResult for the log."""
+    stages = ' '.join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in result.timings.items())
+    return f"{result.status} after {result.attempts} capture(s): {stages}"
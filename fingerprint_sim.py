@@ -0,0 +1,204 @@
+import threading
+import time
+
+# Confirmation codes, as in adafruit_fingerprint
+OK = 0x00
+NOFINGER = 0x02
+IMAGEMESS = 0x06
+NOMATCH = 0x08
+NOTFOUND = 0x09
+BADLOCATION = 0x0B
+DBREADFAIL = 0x0C
+
+# Seconds per command on a 57600 baud R30x-class sensor
+LATENCIES = {
+    'get_image': 0.08,
+    'image_2_tz': 0.25,
+    'search_base': 0.02,
+    'search_per_template': 0.002,
+    'load_model': 0.03,
+    'compare_templates': 0.02,
+    'read_templates': 0.02,
+    'delete_model': 0.03,
+    'send_fpdata': 0.15,  # ~512 byte template over the UART
+    'store_model': 0.03,
+}
+
+
+class SimulatedFingerprintSensor:
+    """Stands in for adafruit_fingerprint.Adafruit_Fingerprint without a UART.
+
+    Fingers are arbitrary labels: enroll() stores one in a slot and
+    place_finger() puts one on the glass. Every command sleeps for its
+    configured latency so pipelines can be timed off-hardware.
+    """
+
+    def __init__(self, library_size=150, latencies=None):
+        self.library_size = library_size
+        self.latencies = dict(LATENCIES, **(latencies or {}))
+        self.templates = {}
+        self.buffers = {}
+        self.finger = None
+        self.finger_at = 0
+        self.image = None
+        self.bad_images = 0
+        self.finger_id = None
+        self.confidence = None
+        self.lock = threading.Lock()
+
+    def _busy(self, seconds):
+        time.sleep(seconds)
+
+    # Test controls
+
+    def enroll(self, slot, label):
+        self.templates[slot] = label
+
+    def place_finger(self, label, after=0, bad_images=0):
+        """Put a finger on the sensor `after` seconds from now; the first
+        `bad_images` captures will fail to template."""
+        with self.lock:
+            self.finger = label
+            self.finger_at = time.monotonic() + after
+            self.bad_images = bad_images
+
+    def lift_finger(self):
+        with self.lock:
+            self.finger = None
+
+    # Sensor commands
+
+    def get_image(self):
+        self._busy(self.latencies['get_image'])
+        with self.lock:
+            if self.finger is None or time.monotonic() < self.finger_at:
+                return NOFINGER
+            if self.bad_images:
+                self.bad_images -= 1
+                self.image = None
+            else:
+                self.image = self.finger
+        return OK
+
+    def image_2_tz(self, slot=1):
+        self._busy(self.latencies['image_2_tz'])
+        if self.image is None:
+            return IMAGEMESS
+        self.buffers[slot] = self.image
+        return OK
+
+    def finger_fast_search(self):
+        self._busy(self.latencies['search_base']
+                   + self.latencies['search_per_template'] * len(self.templates))
+        probe = self.buffers.get(1)
+        for slot, label in sorted(self.templates.items()):
+            if label == probe:
+                self.finger_id, self.confidence = slot, 100
+                return OK
+        self.finger_id, self.confidence = None, 0
+        return NOTFOUND
+
+    def load_model(self, location, slot=1):
+        self._busy(self.latencies['load_model'])
+        if location not in self.templates:
+            return DBREADFAIL
+        self.buffers[slot] = self.templates[location]
+        return OK
+
+    def compare_templates(self):
+        self._busy(self.latencies['compare_templates'])
+        probe = self.buffers.get(1)
+        if probe is not None and probe == self.buffers.get(2):
+            self.confidence = 100
+            return OK
+        self.confidence = 0
+        return NOMATCH
+
+    def read_templates(self):
+        self._busy(self.latencies['read_templates'])
+        return OK
+
+    def delete_model(self, location):
+        self._busy(self.latencies['delete_model'])
+        self.templates.pop(location, None)
+        return OK
+
+    def send_fpdata(self, data, sensorbuffer='char', slot=1):
+        """Upload template bytes into a char buffer; uploaded fingers are
+        matched by placing the same bytes on the sensor."""
+        self._busy(self.latencies['send_fpdata'])
+        self.buffers[slot] = bytes(data)
+        return OK
+
+    def store_model(self, location, slot=1):
+        self._busy(self.latencies['store_model'])
+        if location >= self.library_size or slot not in self.buffers:
+            return BADLOCATION
+        self.templates[location] = self.buffers[slot]
+        return OK
+
+
+class SimulatedPyFingerprint:
+    """The pyfingerprint.PyFingerprint calls the legacy scripts make, on a
+    SimulatedFingerprintSensor (same template library and latencies)."""
+
+    def __init__(self, sensor=None):
+        self.sensor = sensor or SimulatedFingerprintSensor()
+
+    def verifyPassword(self):
+        return True
+
+    def getTemplateCount(self):
+        return len(self.sensor.templates)
+
+    def getStorageCapacity(self):
+        return self.sensor.library_size
+
+    def readImage(self):
+        return self.sensor.get_image() == OK
+
+    def convertImage(self, charBufferNumber=0x01):
+        if self.sensor.image_2_tz(charBufferNumber) != OK:
+            raise Exception('The image is too messy')
+        return True
+
+    def searchTemplate(self, charBufferNumber=0x01, positionStart=0, count=-1):
+        if charBufferNumber != 1:
+            self.sensor.buffers[1] = self.sensor.buffers.get(charBufferNumber)
+        if self.sensor.finger_fast_search() != OK:
+            return -1, -1
+        return self.sensor.finger_id, self.sensor.confidence
+
+    def createTemplate(self):
+        second = self.sensor.buffers.get(2)
+        if second is not None and second != self.sensor.buffers.get(1):
+            raise Exception('The characteristics not matching')
+        return True
+
+    def storeTemplate(self, positionNumber=-1, charBufferNumber=0x01):
+        if positionNumber == -1:
+            free = [slot for slot in range(self.sensor.library_size)
+                    if slot not in self.sensor.templates]
+            if not free:
+                raise Exception('Could not find a free template position')
+            positionNumber = free[0]
+        if self.sensor.store_model(positionNumber, charBufferNumber) != OK:
+            raise Exception('Could not store template in that position')
+        return positionNumber
+
+    def loadTemplate(self, positionNumber, charBufferNumber=0x01):
+        if self.sensor.load_model(positionNumber, charBufferNumber) != OK:
+            raise Exception('The template could not be read')
+        return True
+
+    def downloadCharacteristics(self, charBufferNumber=0x01):
+        self.sensor._busy(self.sensor.latencies['send_fpdata'])  # Same transfer, other direction
+        data = self.sensor.buffers.get(charBufferNumber)
+        if not isinstance(data, (bytes, bytearray)):
+            data = str(data).encode()
+        return list(data)
+
+    def deleteTemplate(self, positionNumber, count=1):
+        for position in range(positionNumber, positionNumber + count):
+            self.sensor.delete_model(position)
+        return True
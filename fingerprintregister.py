@@ -1,14 +1,15 @@
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import font
+from tkinter import filedialog
 from PIL import Image, ImageTk  # Import Image and ImageTk from Pillow
-from pyfingerprint.pyfingerprint import PyFingerprint
-import requests
-import base64
+import queue
+import enrollment_worker
+import hal
 
 # Initialize fingerprint sensor
 try:
-    f = PyFingerprint('/dev/ttyUSB0', 57600, 0xFFFFFFFF, 0x00000000)
+    f = hal.open_pyfingerprint('/dev/ttyUSB0', 57600, 0xFFFFFFFF, 0x00000000)
 
     if not f.verifyPassword():
         raise ValueError('The given fingerprint sensor password is wrong!')
@@ -50,35 +51,9 @@ button_bg = "#004d99"
 button_fg = "#ffffff"  
 border_color = "#dddddd"  
 
-def register_fingerprint():
-    try:
-        print('Waiting for finger...')
-        while not f.readImage():
-            pass
-
-        f.convertImage(0x01)
-
-        result = f.searchTemplate()
-        positionNumber = result[0]
-
-        if positionNumber >= 0:
-            messagebox.showwarning("Warning", "Fingerprint already registered!")
-            return
-
-        f.createTemplate()
-        positionNumber = f.storeTemplate()
-        
-        # Download the characteristics of the template to store as BLOB
-        f.loadTemplate(positionNumber, 0x01)
-        characteristics = f.downloadCharacteristics(0x01)
-        fingerprint_blob = bytearray(characteristics)
-        
-        messagebox.showinfo("Success", f"Fingerprint registered at position {positionNumber}")
-
-        return positionNumber, fingerprint_blob
-
-    except Exception as e:
-        messagebox.showerror("Error", f"Operation failed! {str(e)}")
+# Enrollment runs on worker threads; the GUI drains its events with root.after()
+worker = enrollment_worker.EnrollmentWorker(f, API_URL)
+EVENT_POLL_MS = 100
 
 def register():
     email = email_entry.get().strip()
@@ -92,40 +67,31 @@ def register():
         messagebox.showwarning("Input Error", "PIN must be a 4-digit number!")
         return
 
-    result = register_fingerprint()
-    if result is not None:
-        finger_id, fingerprint_blob = result
+    # Clear the form so the next user's details can be entered right away
+    worker.submit(email, pin)
+    email_entry.delete(0, tk.END)
+    pin_entry.delete(0, tk.END)
 
-        fingerprint_blob_base64 = base64.b64encode(fingerprint_blob).decode('utf-8')
+def import_roster():
+    path = filedialog.askopenfilename(title="Import CSV roster", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+    if not path:
+        return
 
-        payload = {
-            'finger_id': finger_id,
-            'pin': int(pin),
-            'fingerprint_template': fingerprint_blob_base64
-        }
+    try:
+        rows, errors = enrollment_worker.load_roster(path)
+    except (OSError, UnicodeDecodeError) as e:
+        messagebox.showerror("Error", f"Failed to read roster: {str(e)}")
+        return
 
-        api_url = API_URL.format(email)
+    if errors:
+        messagebox.showwarning("Roster Errors", "\n".join(errors[:10]) + (f"\n...and {len(errors) - 10} more" if len(errors) > 10 else ""))
 
-        try:
-            headers = {'Content-Type': 'application/json'}
-            response = requests.put(api_url, json=payload, headers=headers)
-            response.raise_for_status()
+    # Scans then run back-to-back; each user is prompted in turn on the status line
+    for email, pin in rows:
+        worker.submit(email, pin)
 
-            if response.status_code == 200:
-                messagebox.showinfo("Success", "User registered successfully!")
-            else:
-                messagebox.showerror("Error", f"Failed to register user: {response.text}")
-
-        except requests.HTTPError as http_err:
-            try:
-                error_message = response.json().get('errors', response.text)
-            except requests.JSONDecodeError:
-                error_message = response.text
-            print(f"HTTP error occurred: {error_message}")
-            messagebox.showerror("HTTP Error", f"Failed to send data to API: {error_message}")
-        except requests.RequestException as e:
-            messagebox.showerror("Network Error", f"Failed to send data to API: {str(e)}")
-            print("Network Error", f"Failed to send data to API: {str(e)}")
+def cancel_scan():
+    worker.cancel()
 
 def delete_fingerprint():
     try:
@@ -135,13 +101,41 @@ def delete_fingerprint():
             messagebox.showwarning("Input Error", "Position must be between 0 and 149!")
             return
 
-        f.deleteTemplate(position)
-        messagebox.showinfo("Success", f"Fingerprint at position {position} deleted successfully!")
+        worker.delete(position)
 
     except ValueError:
         messagebox.showwarning("Input Error", "Invalid position. Please enter a number between 0 and 149.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to delete fingerprint: {str(e)}")
+
+def poll_events():
+    try:
+        while True:
+            event = worker.events.get_nowait()
+            print(event.message)
+            status_label.config(text=event.message)
+            if event.job is not None:
+                line = f"#{event.job.id} {event.job.email}: {event.message}"
+                index = job_rows.get(event.job.id)
+                if index is None:
+                    job_rows[event.job.id] = jobs_list.size()
+                    jobs_list.insert(tk.END, line)
+                else:
+                    jobs_list.delete(index)
+                    jobs_list.insert(index, line)
+            if event.kind == enrollment_worker.FAILED:
+                status_label.config(fg="#cc0000")
+            else:
+                status_label.config(fg="#333333")
+            if event.kind in (enrollment_worker.QUEUED, enrollment_worker.RETRY,
+                              enrollment_worker.DONE, enrollment_worker.FAILED):
+                counts = worker.outbox.counts()
+                outbox_label.config(text=f"Uploads pending: {counts['pending']}  failed: {counts['failed']}")
+    except queue.Empty:
+        pass
+    root.after(EVENT_POLL_MS, poll_events)
+
+def on_close():
+    worker.stop()
+    root.destroy()
 
 # Create and place widgets
 root.title_frame = tk.Frame(root, bg="#004d99", padx=20, pady=10)
@@ -162,7 +156,23 @@ pin_entry = tk.Entry(frame, show="*", font=entry_font, bd=2, relief="solid", bg=
 pin_entry.grid(row=2, column=1, padx=10, pady=10, sticky="ew")
 
 register_button = tk.Button(frame, text="Register", font=button_font, bg=button_bg, fg=button_fg, bd=0, relief="flat", command=register)
-register_button.grid(row=3, column=0, columnspan=2, pady=20)
+register_button.grid(row=3, column=0, pady=20)
+
+cancel_button = tk.Button(frame, text="Cancel Scan", font=button_font, bg=button_bg, fg=button_fg, bd=0, relief="flat", command=cancel_scan)
+cancel_button.grid(row=3, column=1, pady=20)
+
+import_button = tk.Button(frame, text="Import CSV", font=button_font, bg=button_bg, fg=button_fg, bd=0, relief="flat", command=import_roster)
+import_button.grid(row=3, column=2, pady=20)
+
+status_label = tk.Label(frame, text="Ready", font=entry_font, bg=frame_bg, fg="#333333", anchor="w")
+status_label.grid(row=4, column=0, columnspan=3, padx=10, sticky="ew")
+
+jobs_list = tk.Listbox(frame, font=entry_font, height=4, bd=1, relief="solid")
+jobs_list.grid(row=5, column=0, columnspan=3, padx=10, pady=(5, 0), sticky="ew")
+job_rows = {}
+
+outbox_label = tk.Label(frame, text="", font=entry_font, bg=frame_bg, fg="#333333", anchor="w")
+outbox_label.grid(row=6, column=0, columnspan=3, padx=10, sticky="ew")
 
 # Frame for deletion section
 delete_frame = tk.Frame(root, bg=frame_bg, padx=10, pady=10, relief="flat")
@@ -183,4 +193,7 @@ delete_frame.grid_columnconfigure(1, weight=1)
 frame.config(highlightbackground=border_color, highlightcolor=border_color, highlightthickness=1)
 delete_frame.config(highlightbackground=border_color, highlightcolor=border_color, highlightthickness=1)
 
+worker.start()
+root.after(EVENT_POLL_MS, poll_events)
+root.protocol("WM_DELETE_WINDOW", on_close)
 root.mainloop()
@@ -0,0 +1,239 @@
+import collections
+import json
+import os
+import threading
+import time
+import fingerprint_sim
+import keypad_driver
+import lcd_renderer
+
+# LOCKUP_HAL=sim swaps every driver for an in-process simulator, so the door
+# scripts run (and can be profiled) on any Linux box. LOCKUP_SIM_LATENCY
+# overrides fingerprint command latencies, e.g. '{"image_2_tz": 0.1}'.
+BACKEND = os.environ.get('LOCKUP_HAL', 'real')
+SIM_LATENCIES = json.loads(os.environ.get('LOCKUP_SIM_LATENCY') or '{}')
+
+I2C_HZ = 100000     # PCF8574 backpack on the standard-mode bus
+TIMELINE_SIZE = 10000
+
+# Simulated devices created so far, for harnesses to script and inspect
+sensors = []
+lcds = []
+
+
+class SimulatedKeypad:
+    """A key matrix wired between SimulatedGPIO column outputs and row inputs."""
+
+    def __init__(self, gpio, columns, rows, layout):
+        self.gpio = gpio
+        self.positions = {}
+        for c, keys in enumerate(layout):
+            for r, key in enumerate(keys):
+                self.positions[key] = (columns[c], rows[r])
+        self.pressed = set()
+
+    def press(self, key):
+        self.gpio._update(lambda: self.pressed.add(self.positions[key]))
+
+    def release(self, key):
+        self.gpio._update(lambda: self.pressed.discard(self.positions[key]))
+
+    def tap(self, key, hold=0.08):
+        self.press(key)
+        time.sleep(hold)
+        self.release(key)
+
+    def type(self, keys, hold=0.08, gap=0.08):
+        """Press and release each key in turn, like a person at the door."""
+        for key in keys:
+            self.tap(key, hold)
+            time.sleep(gap)
+
+
+class SimulatedGPIO:
+    """RPi.GPIO stand-in: pin levels, rising/falling edge callbacks, key matrices.
+
+    Every output change is kept on a timeline of (monotonic, pin, level), so
+    relay and buzzer activity can be checked and timed. Row inputs read
+    high while a pressed key connects them to a column driven high.
+    """
+
+    BCM, BOARD = 'BCM', 'BOARD'
+    OUT, IN = 'out', 'in'
+    LOW, HIGH = 0, 1
+    PUD_OFF, PUD_DOWN, PUD_UP = 'off', 'down', 'up'
+    RISING, FALLING, BOTH = 'rising', 'falling', 'both'
+
+    def __init__(self, timeline_size=TIMELINE_SIZE):
+        self.mode = None
+        self.directions = {}
+        self.outputs = {}
+        self.pulls = {}
+        self.callbacks = {}
+        self.keypads = {}
+        self.timeline = collections.deque(maxlen=timeline_size)
+        self.lock = threading.RLock()
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, channel, direction, pull_up_down=None, initial=None):
+        for pin in self._pins(channel):
+            self.directions[pin] = direction
+            self.pulls[pin] = pull_up_down
+            if direction == self.OUT and initial is not None:
+                self.output(pin, initial)
+
+    def output(self, channel, level):
+        for pin in self._pins(channel):
+            self._update(lambda: self.outputs.__setitem__(pin, 1 if level else 0))
+            self.timeline.append((time.monotonic(), pin, 1 if level else 0))
+
+    def input(self, channel):
+        with self.lock:
+            if self.directions.get(channel) == self.OUT:
+                return self.outputs.get(channel, 0)
+            for keypad in self.keypads.values():
+                if any(r == channel and self.outputs.get(c) for c, r in keypad.pressed):
+                    return 1
+            return 1 if self.pulls.get(channel) == self.PUD_UP else 0
+
+    def add_event_detect(self, channel, edge, callback=None, bouncetime=None):
+        self.callbacks[channel] = (edge, callback)
+
+    def remove_event_detect(self, channel):
+        self.callbacks.pop(channel, None)
+
+    def cleanup(self, channel=None):
+        with self.lock:
+            for pin in self._pins(channel) if channel is not None else list(self.directions):
+                self.directions.pop(pin, None)
+                self.callbacks.pop(pin, None)
+
+    def _pins(self, channel):
+        return channel if isinstance(channel, (list, tuple)) else (channel,)
+
+    def _update(self, change):
+        """Apply a change and fire edge callbacks for inputs it flipped."""
+        with self.lock:
+            watched = list(self.callbacks)
+            before = {pin: self.input(pin) for pin in watched}
+            change()
+            flipped = [(pin, self.input(pin)) for pin in watched if self.input(pin) != before[pin]]
+        for pin, level in flipped:
+            edge, callback = self.callbacks.get(pin, (None, None))
+            wanted = self.BOTH if edge == self.BOTH else (self.RISING if level else self.FALLING)
+            if callback is not None and edge == wanted:
+                callback(pin)
+
+    # Simulation controls
+
+    def keypad(self, columns=keypad_driver.COLUMNS, rows=keypad_driver.ROWS,
+               layout=keypad_driver.LAYOUT):
+        """The key matrix on these pins, wired up on first use."""
+        key = (tuple(columns), tuple(rows))
+        with self.lock:
+            if key not in self.keypads:
+                self.keypads[key] = SimulatedKeypad(self, columns, rows, layout)
+            return self.keypads[key]
+
+    def history(self, pin):
+        """(monotonic, level) for every write to an output pin still on the timeline."""
+        return [(at, level) for at, written, level in self.timeline if written == pin]
+
+
+class SimulatedLCD:
+    """I2C_LCD_driver.lcd stand-in: a 16x2 HD44780 that records every write.
+
+    Each lcd_write() costs the time the real driver's six PCF8574
+    transactions take on the bus, and the screen contents follow the
+    set-address, clear and character commands like the glass would.
+    """
+
+    def __init__(self, rows=lcd_renderer.ROWS, cols=lcd_renderer.COLS, i2c_hz=I2C_HZ):
+        self.rows = rows
+        self.cols = cols
+        bits = lcd_renderer.TRANSACTIONS_PER_WRITE * lcd_renderer.BYTES_PER_TRANSACTION * 9
+        self.write_latency = bits / i2c_hz if i2c_hz else 0
+        self.screen = [[' '] * cols for _ in range(rows)]
+        self.address = 0
+        self.writes = collections.deque(maxlen=TIMELINE_SIZE)
+        self.lock = threading.Lock()
+
+    def lcd_write(self, cmd, mode=0):
+        time.sleep(self.write_latency)
+        with self.lock:
+            self.writes.append((time.monotonic(), cmd, mode))
+            if mode & lcd_renderer.RS:
+                row, col = divmod(self.address, 0x40)
+                if row < self.rows and col < self.cols:
+                    self.screen[row][col] = chr(cmd)
+                self.address += 1
+            elif cmd & 0x80:
+                self.address = cmd & 0x7F
+            elif cmd in (0x01, 0x02):  # Clear display, return home
+                if cmd == 0x01:
+                    self.screen = [[' '] * self.cols for _ in range(self.rows)]
+                self.address = 0
+
+    def lcd_write_char(self, charvalue, mode=1):
+        self.lcd_write(charvalue, mode)
+
+    def lcd_display_string(self, string, line=1, pos=0):
+        self.lcd_write(lcd_renderer.LINE_ADDRESSES[line - 1] + pos)
+        for char in string:
+            self.lcd_write(ord(char), lcd_renderer.RS)
+
+    def lcd_clear(self):
+        self.lcd_write(0x01)
+        self.lcd_write(0x02)
+
+    def backlight(self, state):
+        pass
+
+    def text(self):
+        """The lines currently on the display."""
+        with self.lock:
+            return [''.join(row) for row in self.screen]
+
+
+if BACKEND == 'sim':
+    GPIO = SimulatedGPIO()
+else:
+    import RPi.GPIO as GPIO
+
+
+def open_lcd(address=None):
+    """The 16x2 I2C display (at `address`, else the driver's default)."""
+    if BACKEND == 'sim':
+        lcd = SimulatedLCD()
+        lcds.append(lcd)
+        return lcd
+    import I2C_LCD_driver
+    if address is not None:
+        I2C_LCD_driver.ADDRESS = address  # Read when the lcd is constructed
+    return I2C_LCD_driver.lcd()
+
+
+def open_fingerprint(port, baudrate=57600):
+    """An adafruit_fingerprint sensor on a serial port."""
+    if BACKEND == 'sim':
+        sensor = fingerprint_sim.SimulatedFingerprintSensor(latencies=SIM_LATENCIES)
+        sensors.append(sensor)
+        return sensor
+    import adafruit_fingerprint
+    import serial
+    return adafruit_fingerprint.Adafruit_Fingerprint(serial.Serial(port, baudrate=baudrate, timeout=1))
+
+
+def open_pyfingerprint(port, baudrate=57600, address=0xFFFFFFFF, password=0x00000000):
+    """A pyfingerprint sensor, as the enrollment and keypad scripts use."""
+    if BACKEND == 'sim':
+        sensor = fingerprint_sim.SimulatedFingerprintSensor(latencies=SIM_LATENCIES)
+        sensors.append(sensor)
+        return fingerprint_sim.SimulatedPyFingerprint(sensor)
+    from pyfingerprint.pyfingerprint import PyFingerprint
+    return PyFingerprint(port, baudrate, address, password)
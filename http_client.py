@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import tracing
+
+# LOCKUP_API_BASE points the door at a site gateway (or a stub) instead
+API_BASE = os.environ.get('LOCKUP_API_BASE', 'https://lockup.pro').rstrip('/')
+
+# (connect, read) timeouts in seconds, matched on the longest path prefix
+DEFAULT_TIMEOUT = (3.05, 10)
+ENDPOINT_TIMEOUTS = {
+    '/api/instructors/': (3.05, 5),
+    '/api/admin/pin/': (3.05, 5),
+    '/api/time/24-hour': (3.05, 2),
+    '/api/temperatures': (3.05, 10),
+    '/api/logs': (3.05, 5),
+    '/api/access-events': (3.05, 15),
+}
+
+# One pool per host; keep a few spare sockets for the background threads
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 8
+
+_session = None
+_adapter = None
+_lock = threading.Lock()
+_endpoint_requests = {}
+
+
+def get_session():
+    """Return the shared keep-alive session, creating it on first use."""
+    global _session, _adapter
+    with _lock:
+        if _session is None:
+            _adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                                   pool_maxsize=POOL_MAXSIZE)
+            session = requests.Session()
+            session.mount('https://', _adapter)
+            session.mount('http://', _adapter)
+            # requests decodes gzip/deflate bodies transparently
+            session.headers.update({
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+            })
+            _session = session
+        return _session
+
+
+def endpoint_for(path):
+    """Map a request path to its configured endpoint name (longest prefix)."""
+    best = None
+    for prefix in ENDPOINT_TIMEOUTS:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return best or path
+
+
+def metric_endpoint(path):
+    """endpoint_for() with IDs collapsed, so metric labels stay a bounded set."""
+    path = urlsplit(path).path if path.startswith('http') else path.split('?', 1)[0]
+    endpoint = endpoint_for(path)
+    return endpoint if endpoint != path else re.sub(r'/\d+(?=/|$)', '/{id}', path)
+
+
+def timeout_for(path):
+    """Return the (connect, read) timeout for the given request path."""
+    return ENDPOINT_TIMEOUTS.get(endpoint_for(path), DEFAULT_TIMEOUT)
+
+
+def request(method, path, **kwargs):
+    """Send a request for an API path (or absolute URL) through the shared pool."""
+    url = path if path.startswith('http') else API_BASE + path
+    kwargs.setdefault('timeout', timeout_for(path))
+    endpoint = endpoint_for(path)
+    with _lock:
+        _endpoint_requests[endpoint] = _endpoint_requests.get(endpoint, 0) + 1
+    start = time.perf_counter_ns()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except Exception as e:
+        tracing.api_request(metric_endpoint(path), start, time.perf_counter_ns(), type(e).__name__)
+        raise
+    # 4xx is an answer (404 is how an unknown PIN comes back), not a failure
+    error = str(response.status_code) if response.status_code >= 500 else None
+    tracing.api_request(metric_endpoint(path), start, time.perf_counter_ns(), error)
+    return response
+
+
+def get(path, **kwargs):
+    """GET an API path (or absolute URL) through the shared pool."""
+    return request('GET', path, **kwargs)
+
+
+def post(path, **kwargs):
+    """POST to an API path (or absolute URL) through the shared pool."""
+    return request('POST', path, **kwargs)
+
+
+def stats():
+    """Return request, handshake and connection-reuse counters for the pool."""
+    get_session()
+    connections = 0
+    pool_requests = 0
+    manager = _adapter.poolmanager
+    for key in manager.pools.keys():
+        pool = manager.pools.get(key)
+        if pool is None:
+            continue
+        connections += pool.num_connections
+        pool_requests += pool.num_requests
+    with _lock:
+        by_endpoint = dict(_endpoint_requests)
+    return {
+        'requests': pool_requests,
+        'handshakes': connections,
+        'reused': max(pool_requests - connections, 0),
+        'by_endpoint': by_endpoint,
+    }
+
+
+def close():
+    """Close every pooled connection."""
+    global _session, _adapter
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _adapter = None
@@ -0,0 +1,233 @@
+import collections
+import queue
+import threading
+import time
+
+# BCM pins of the 4x4 matrix and the key under each (column, row) crossing
+COLUMNS = (5, 6, 13, 19)
+ROWS = (12, 16, 20, 21)
+LAYOUT = (
+    ("D", "C", "B", "A"),  # C1, rows R1-R4
+    ("#", "9", "6", "3"),  # C2
+    ("0", "8", "5", "2"),  # C3
+    ("*", "7", "4", "1"),  # C4
+)
+
+PRESS, REPEAT, RELEASE = 'press', 'repeat', 'release'
+KeyEvent = collections.namedtuple('KeyEvent', 'key kind timestamp')
+
+# Per-key debounce states
+IDLE, PRESS_PENDING, HELD, RELEASE_PENDING = range(4)
+
+
+class GpioBackend:
+    """Matrix access through RPi.GPIO, with rising-edge detection on the rows."""
+
+    def __init__(self, gpio):
+        self.GPIO = gpio
+
+    def setup(self, columns, rows):
+        for column in columns:
+            self.GPIO.setup(column, self.GPIO.OUT)
+        for row in rows:
+            self.GPIO.setup(row, self.GPIO.IN, pull_up_down=self.GPIO.PUD_DOWN)
+
+    def set_column(self, column, level):
+        self.GPIO.output(column, self.GPIO.HIGH if level else self.GPIO.LOW)
+
+    def read_row(self, row):
+        return self.GPIO.input(row)
+
+    def watch_rows(self, rows, callback):
+        for row in rows:
+            self.GPIO.add_event_detect(row, self.GPIO.RISING, callback=callback)
+
+    def unwatch_rows(self, rows):
+        for row in rows:
+            self.GPIO.remove_event_detect(row)
+
+
+class SimulatedBackend:
+    """In-memory keypad matrix; press()/release() drive it like a finger would."""
+
+    def __init__(self, columns=COLUMNS, rows=ROWS, layout=LAYOUT):
+        self.columns = columns
+        self.rows = rows
+        self.positions = {}
+        for c, keys in enumerate(layout):
+            for r, key in enumerate(keys):
+                self.positions[key] = (columns[c], rows[r])
+        self.levels = {column: 0 for column in columns}
+        self.pressed = set()
+        self.callback = None
+        self.lock = threading.Lock()
+
+    def setup(self, columns, rows):
+        pass
+
+    def _row_levels(self):
+        return {row: self.read_row(row) for row in self.rows}
+
+    def _update(self, change):
+        with self.lock:
+            before = self._row_levels()
+            change()
+            after = self._row_levels()
+        if self.callback is not None:
+            for row in self.rows:
+                if after[row] and not before[row]:
+                    self.callback(row)
+
+    def set_column(self, column, level):
+        self._update(lambda: self.levels.__setitem__(column, 1 if level else 0))
+
+    def read_row(self, row):
+        return int(any(self.levels[c] for c, r in self.pressed if r == row))
+
+    def watch_rows(self, rows, callback):
+        self.callback = callback
+
+    def unwatch_rows(self, rows):
+        self.callback = None
+
+    def press(self, key):
+        self._update(lambda: self.pressed.add(self.positions[key]))
+
+    def release(self, key):
+        self._update(lambda: self.pressed.discard(self.positions[key]))
+
+
+class Keypad:
+    """Edge-woken 4x4 keypad scanner with per-key debounce and auto-repeat.
+
+    While idle every column is driven high and the thread sleeps until a row
+    edge fires; it then scans the matrix every scan_interval until all keys
+    are released. Debounced events are delivered through the events queue.
+    """
+
+    def __init__(self, backend, columns=COLUMNS, rows=ROWS, layout=LAYOUT,
+                 debounce=0.02, scan_interval=0.005, repeat_delay=None,
+                 repeat_interval=0.1):
+        self.backend = backend
+        self.columns = columns
+        self.rows = rows
+        self.layout = layout
+        self.debounce = debounce
+        self.scan_interval = scan_interval
+        self.repeat_delay = repeat_delay  # None disables auto-repeat
+        self.repeat_interval = repeat_interval
+        self.events = queue.Queue()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.states = {}
+        self.thread = None
+
+    def start(self):
+        self.backend.setup(self.columns, self.rows)
+        self._set_columns(1)
+        self.backend.watch_rows(self.rows, self._on_edge)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+        self.backend.unwatch_rows(self.rows)
+
+    def get(self, timeout=None):
+        """Return the next KeyEvent, or None on timeout."""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def read_key(self, timeout=None):
+        """Return the next pressed (or auto-repeated) key, or None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            event = self.get(remaining)
+            if event is None:
+                return None
+            if event.kind != RELEASE:
+                return event.key
+
+    def flush(self):
+        """Drop any queued events, e.g. keys pressed while the door was busy."""
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def _on_edge(self, channel):
+        self.wake.set()
+
+    def _set_columns(self, level):
+        for column in self.columns:
+            self.backend.set_column(column, level)
+
+    def _any_row_high(self):
+        return any(self.backend.read_row(row) for row in self.rows)
+
+    def _scan(self):
+        """Drive one column at a time and return the set of keys that read high."""
+        down = set()
+        self._set_columns(0)
+        for c, column in enumerate(self.columns):
+            self.backend.set_column(column, 1)
+            for r, row in enumerate(self.rows):
+                if self.backend.read_row(row):
+                    down.add(self.layout[c][r])
+            self.backend.set_column(column, 0)
+        return down
+
+    def _emit(self, key, kind, now):
+        self.events.put(KeyEvent(key, kind, now))
+
+    def _step(self, down, now):
+        """Advance every tracked key's debounce/auto-repeat state machine."""
+        for key in down | set(self.states):
+            state, since, next_repeat = self.states.get(key, (IDLE, now, None))
+            pressed = key in down
+            if state == IDLE:
+                if pressed:
+                    self.states[key] = (PRESS_PENDING, now, None)
+            elif state == PRESS_PENDING:
+                if not pressed:
+                    del self.states[key]
+                elif now - since >= self.debounce:
+                    self._emit(key, PRESS, now)
+                    if self.repeat_delay is not None:
+                        next_repeat = now + self.repeat_delay
+                    self.states[key] = (HELD, now, next_repeat)
+            elif state == HELD:
+                if not pressed:
+                    self.states[key] = (RELEASE_PENDING, now, next_repeat)
+                elif next_repeat is not None and now >= next_repeat:
+                    self._emit(key, REPEAT, now)
+                    self.states[key] = (HELD, since, now + self.repeat_interval)
+            elif state == RELEASE_PENDING:
+                if pressed:
+                    self.states[key] = (HELD, now, next_repeat)
+                elif now - since >= self.debounce:
+                    self._emit(key, RELEASE, now)
+                    del self.states[key]
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            # Idle: all columns high, sleep until a row rises
+            self.wake.clear()
+            self._set_columns(1)
+            if not self._any_row_high():
+                self.wake.wait()
+                if self.stop_event.is_set():
+                    break
+            # Active: scan until every key has been released and debounced
+            while not self.stop_event.is_set():
+                self._step(self._scan(), time.monotonic())
+                if not self.states:
+                    break
+                time.sleep(self.scan_interval)
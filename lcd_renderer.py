@@ -0,0 +1,137 @@
+import threading
+import time
+import tracing
+
+ROWS, COLS = 2, 16
+LINE_ADDRESSES = (0x80, 0xC0)  # HD44780 "set DDRAM address" for lines 1 and 2
+RS = 0x01                      # Register-select bit: character data rather than a command
+
+# I2C_LCD_driver sends each LCD byte as two nibbles, each nibble as three
+# single-byte PCF8574 writes (data, strobe high, strobe low).
+TRANSACTIONS_PER_WRITE = 6
+BYTES_PER_TRANSACTION = 2      # Address byte + data byte
+
+
+class FramebufferLCD:
+    """Drop-in for I2C_LCD_driver.lcd that keeps a 16x2 shadow framebuffer.
+
+    lcd_display_string() and lcd_clear() only update the framebuffer and
+    return at once. A worker thread diffs it against what is on the glass
+    and sends just the changed cells, skipping cursor moves when the
+    display's auto-increment already points at the next cell.
+    """
+
+    def __init__(self, lcd, rows=ROWS, cols=COLS, frame_interval=0.02):
+        self.lcd = lcd
+        self.rows = rows
+        self.cols = cols
+        self.frame_interval = frame_interval  # Coalesce bursts of updates into one frame
+        self.target = [[' '] * cols for _ in range(rows)]
+        self.shown = [[None] * cols for _ in range(rows)]  # Unknown until first drawn
+        self.cursor = None
+        self.lock = threading.Lock()
+        self.dirty = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.stop_event = threading.Event()
+        self.writes = 0
+        self.naive_writes = 0
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def lcd_display_string(self, string, line=1, pos=0):
+        row = line - 1
+        with self.lock:
+            self.naive_writes += 1 + len(string)
+            for i, char in enumerate(string):
+                if 0 <= pos + i < self.cols:
+                    self.target[row][pos + i] = char
+            self._mark_dirty()
+
+    def lcd_clear(self):
+        with self.lock:
+            self.naive_writes += 1
+            for row in self.target:
+                row[:] = [' '] * self.cols
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        self.idle.clear()
+        self.dirty.set()
+
+    def runs(self, target):
+        """Return (row, col, text) spans covering every changed cell.
+
+        Spans separated by a single unchanged cell are merged, since
+        rewriting that cell costs the same as a cursor move.
+        """
+        spans = []
+        for row in range(self.rows):
+            start = end = None
+            for col in range(self.cols):
+                if target[row][col] == self.shown[row][col]:
+                    continue
+                if start is not None and col - end <= 1:
+                    end = col + 1
+                else:
+                    if start is not None:
+                        spans.append((row, start, ''.join(target[row][start:end])))
+                    start, end = col, col + 1
+            if start is not None:
+                spans.append((row, start, ''.join(target[row][start:end])))
+        return spans
+
+    def flush(self):
+        """Send the current framebuffer diff to the display."""
+        with self.lock:
+            target = [row[:] for row in self.target]
+        for row, col, text in self.runs(target):
+            if self.cursor != (row, col):
+                self.lcd.lcd_write(LINE_ADDRESSES[row] + col)
+                self.writes += 1
+            for char in text:
+                self.lcd.lcd_write(ord(char), RS)
+            self.writes += len(text)
+            self.cursor = (row, col + len(text))
+            self.shown[row][col:col + len(text)] = list(text)
+
+    def wait_idle(self, timeout=None):
+        """Block until everything written so far has reached the display."""
+        return self.idle.wait(timeout)
+
+    def stats(self):
+        """Return I2C traffic counters, with what the direct driver calls would have cost."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        transactions = self.writes * TRANSACTIONS_PER_WRITE
+        naive_transactions = self.naive_writes * TRANSACTIONS_PER_WRITE
+        return {
+            'lcd_writes': self.writes,
+            'i2c_transactions': transactions,
+            'i2c_bytes': transactions * BYTES_PER_TRANSACTION,
+            'i2c_transactions_per_s': transactions / elapsed,
+            'i2c_bytes_per_s': transactions * BYTES_PER_TRANSACTION / elapsed,
+            'unbuffered_i2c_transactions': naive_transactions,
+        }
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.dirty.wait()
+            if self.stop_event.is_set():
+                break
+            time.sleep(self.frame_interval)
+            self.dirty.clear()
+            try:
+                with tracing.span('lcd_flush'):
+                    self.flush()
+            except Exception as e:
+                print('Failed to update LCD:', e)
+                self.cursor = None
+                self.shown = [[None] * self.cols for _ in range(self.rows)]
+            if not self.dirty.is_set():
+                self.idle.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.dirty.set()
+        self.thread.join(timeout=1)
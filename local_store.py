@@ -0,0 +1,294 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import http_client
+import tracing
+import schedule_index
+
+DB_PATH = 'lockup_cache.db'
+SYNC_INTERVAL = 60  # Seconds between delta fetches
+# Seconds a cached PIN is trusted on its own. Past this, unless a delta sync
+# has succeeded since, a hit is re-checked against the per-PIN endpoints so
+# revoked PINs and changed schedules take effect even without delta sync.
+MAX_AGE = 300
+SYNC_ALERT_FAILURES = 3  # Consecutive failed delta syncs before warning loudly
+SCHEMA_VERSION = 3       # Bumped when the tables change; the cache is rebuilt
+
+# Delta endpoints: GET <url>?updated_since=<cursor> returns a list of records
+# carrying 'pin', 'updated_at' and optionally 'deleted' for removed rows.
+INSTRUCTORS_SYNC_URL = '/api/instructors'
+ADMINS_SYNC_URL = '/api/admin'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instructors (
+    id TEXT PRIMARY KEY,
+    pin TEXT NOT NULL,
+    finger_id INTEGER,
+    day TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    record TEXT NOT NULL,
+    cached_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS instructors_pin ON instructors (pin);
+CREATE TABLE IF NOT EXISTS admins (
+    pin TEXT PRIMARY KEY,
+    id TEXT,
+    finger_id INTEGER,
+    record TEXT NOT NULL,
+    cached_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    cursor TEXT
+);
+"""
+
+
+def _instructor_id(pin, record):
+    # One row per server schedule row, so a delta that moves the slot or
+    # changes the PIN replaces the row it came from instead of adding one
+    if record.get('id') is not None:
+        return str(record['id'])
+    return f"{pin}:{record.get('day')}:{record.get('start_time')}"
+
+
+class LocalStore:
+    """On-device SQLite mirror of instructors, admins and their schedules."""
+
+    def __init__(self, path=DB_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            # Only a cache of the API: start over rather than migrate
+            self.conn.executescript('DROP TABLE IF EXISTS instructors; DROP TABLE IF EXISTS admins; '
+                                    'DROP TABLE IF EXISTS sync_state;')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.schedules = {}  # pin -> compiled WeeklySchedule, dropped when the pin changes
+        self.synced_at = 0  # time.time() at the start of the last complete delta sync
+
+    def lookup_instructors(self, pin):
+        """Return the schedule rows stored for a PIN (empty list if none)."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT record FROM instructors WHERE pin = ?', (str(pin),)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def lookup_admin(self, pin):
+        """Return the admin record for a PIN, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT record FROM admins WHERE pin = ?', (str(pin),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def schedule_for(self, pin):
+        """Return the PIN's compiled weekly schedule, compiling it on first use."""
+        with self.lock:
+            schedule = self.schedules.get(str(pin))
+            if schedule is None:
+                rows = self.conn.execute(
+                    'SELECT record FROM instructors WHERE pin = ?', (str(pin),)).fetchall()
+                schedule = schedule_index.WeeklySchedule([json.loads(row[0]) for row in rows])
+                self.schedules[str(pin)] = schedule
+        return schedule
+
+    def needs_revalidation(self, pin, max_age=MAX_AGE):
+        """True if a PIN's cached rows are older than max_age and no delta
+        sync has vouched for them since."""
+        cutoff = time.time() - max_age
+        if self.synced_at >= cutoff:
+            return False
+        with self.lock:
+            return any(self.conn.execute(f'SELECT 1 FROM {table} WHERE pin = ? AND cached_at < ? LIMIT 1',
+                                         (str(pin), cutoff)).fetchone()
+                       for table in ('instructors', 'admins'))
+
+    def mark_synced(self, started):
+        """Record a complete delta sync that began at `started` (time.time())."""
+        self.synced_at = max(self.synced_at, started)
+
+    def has_pin_prefix(self, prefix):
+        """Return True if any instructor or admin PIN starts with prefix (index range scan)."""
+        bounds = (str(prefix), str(prefix) + '\x7f')
+        with self.lock:
+            for table in ('instructors', 'admins'):
+                if self.conn.execute(f'SELECT 1 FROM {table} WHERE pin >= ? AND pin < ? LIMIT 1',
+                                     bounds).fetchone():
+                    return True
+        return False
+
+    def pinned_finger_ids(self, day, time):
+        """Return the finger_ids still needed today: every admin, plus
+        instructors with a schedule on `day` that hasn't ended by `time`."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT finger_id FROM instructors WHERE day = ? AND end_time >= ? '
+                'UNION SELECT finger_id FROM admins', (day, time)).fetchall()
+        return {row[0] for row in rows if row[0] is not None}
+
+    def referenced_finger_ids(self, finger_ids):
+        """Return which of finger_ids a cached instructor or admin still has,
+        or None while the cache is empty and can't tell."""
+        with self.lock:
+            rows = self.conn.execute('SELECT finger_id FROM instructors '
+                                     'UNION SELECT finger_id FROM admins').fetchall()
+        if not rows:
+            return None
+        return {row[0] for row in rows} & set(finger_ids)
+
+    def put_instructors(self, pin, records):
+        """Replace every schedule row of a PIN with the given records."""
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM instructors WHERE pin = ?', (str(pin),))
+            for record in records:
+                self._upsert_instructor(pin, record)
+            if records:
+                self.schedules[str(pin)] = schedule_index.WeeklySchedule(records)
+            else:
+                self.schedules.pop(str(pin), None)
+
+    def put_admin(self, pin, record):
+        """Store (or replace) the admin record of a PIN; a falsy record removes it."""
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM admins WHERE pin = ?', (str(pin),))
+            if record:
+                self._upsert_admin(pin, record)
+
+    def apply_instructor_changes(self, records):
+        """Upsert or delete instructor rows from a delta fetch."""
+        with self.lock, self.conn:
+            for record in records:
+                pin = str(record.get('pin'))
+                self.schedules.pop(pin, None)
+                if record.get('deleted') and record.get('id') is None and record.get('day') is None:
+                    self.conn.execute('DELETE FROM instructors WHERE pin = ?', (pin,))  # The whole PIN
+                else:
+                    # Drop the row's previous version, under whatever PIN it had
+                    row_id = _instructor_id(pin, record)
+                    for (old_pin,) in self.conn.execute(
+                            'SELECT pin FROM instructors WHERE id = ?', (row_id,)).fetchall():
+                        self.schedules.pop(old_pin, None)
+                    self.conn.execute('DELETE FROM instructors WHERE id = ?', (row_id,))
+                    if not record.get('deleted'):
+                        self._upsert_instructor(pin, record)
+
+    def apply_admin_changes(self, records):
+        """Upsert or delete admin rows from a delta fetch."""
+        with self.lock, self.conn:
+            for record in records:
+                pin = str(record.get('pin'))
+                if record.get('id') is not None:
+                    # A changed PIN must not leave the old one granting admin access
+                    self.conn.execute('DELETE FROM admins WHERE id = ?', (str(record['id']),))
+                if record.get('deleted'):
+                    self.conn.execute('DELETE FROM admins WHERE pin = ?', (pin,))
+                else:
+                    self._upsert_admin(pin, record)
+
+    def get_cursor(self, name):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT cursor FROM sync_state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, name, cursor):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO sync_state (name, cursor) VALUES (?, ?)',
+                (name, cursor))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _upsert_instructor(self, pin, record):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO instructors '
+            '(id, pin, finger_id, day, start_time, end_time, record, cached_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (_instructor_id(pin, record), str(pin), record.get('finger_id'),
+             record.get('day'), record.get('start_time'), record.get('end_time'),
+             json.dumps(record), time.time()))
+
+    def _upsert_admin(self, pin, record):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO admins (pin, id, finger_id, record, cached_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (str(pin), None if record.get('id') is None else str(record['id']),
+             record.get('finger_id'), json.dumps(record), time.time()))
+
+
+class Syncer:
+    """Keeps a LocalStore current with delta fetches, on a thread or as a task."""
+
+    def __init__(self, store, interval=SYNC_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self.failures = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def sync_once(self):
+        """Fetch and apply changes since the stored cursors; True if both succeeded."""
+        started = time.time()
+        with tracing.span('store_sync'):
+            ok = self._sync('instructors', INSTRUCTORS_SYNC_URL,
+                            self.store.apply_instructor_changes)
+            ok = self._sync('admins', ADMINS_SYNC_URL, self.store.apply_admin_changes) and ok
+        if ok:
+            self.store.mark_synced(started)
+            self.failures = 0
+            return True
+        self.failures += 1
+        if self.failures >= SYNC_ALERT_FAILURES:
+            print(f'WARNING: delta sync has failed {self.failures} times in a row; revocations '
+                  f'reach this door only when a cached PIN older than {MAX_AGE}s is re-checked '
+                  f'against the per-PIN endpoints')
+        return False
+
+    def _sync(self, name, url, apply_changes):
+        cursor = self.store.get_cursor(name)
+        params = {'updated_since': cursor} if cursor else None
+        try:
+            response = http_client.get(url, params=params)
+            response.raise_for_status()
+            records = response.json()
+        except Exception as e:
+            print(f'Failed to sync {name}:', e)
+            return False
+        if not isinstance(records, list):
+            print(f'Unexpected {name} sync response:', records)
+            return False
+        if not records:
+            return True
+        apply_changes(records)
+        stamps = [r.get('updated_at') for r in records if r.get('updated_at')]
+        if stamps:
+            self.store.set_cursor(name, max(stamps))
+        print(f'Synced {len(records)} {name} change(s)')
+        return True
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.sync_once()
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    async def run(self):
+        """Asyncio variant of start(): sync now and every interval after."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.sync_once)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+import http_client
+import tracing
+
+LOGS_URL = '/api/logs'
+STREAM_URL = '/api/logs/stream'   # Server-sent events: "data: {"status": ...}"
+STREAM_READ_TIMEOUT = 45          # Three missed 15 s heartbeats drop the stream
+STREAM_RETRY_INTERVAL = 300       # While polling, re-try the stream this often
+POLL_INTERVAL = 5                 # Conditional GET interval when streaming is unavailable
+BACKOFF_BASE = 1
+BACKOFF_MAX = 60
+
+# Site gateway fan-out: signed UDP multicast announcements of the lock status.
+# Both ends need the same LOCKUP_LAN_KEY; without it the LAN path is off.
+LAN_KEY = os.environ.get('LOCKUP_LAN_KEY')
+LAN_GROUP = os.environ.get('LOCKUP_LAN_GROUP', '239.255.76.67:47655')
+LAN_SILENCE = 10     # No announcement for this long: confirm over HTTP
+LAN_MAX_SKEW = 30    # Announcements sent longer ago than this are replays
+MAC_SIZE = hashlib.sha256().digest_size
+
+
+def parse_group(group):
+    """'239.255.76.67:47655' -> ('239.255.76.67', 47655)."""
+    host, port = group.rsplit(':', 1)
+    return host, int(port)
+
+
+def pack_announcement(key, status, etag, changed):
+    """Sign a lock-status announcement; `changed` orders commands, `sent` dates the packet."""
+    payload = json.dumps({'status': status, 'etag': etag, 'changed': changed,
+                          'sent': time.time()}, separators=(',', ':')).encode()
+    return hmac.new(key.encode(), payload, hashlib.sha256).digest() + payload
+
+
+def unpack_announcement(key, datagram):
+    """Return the announcement dict, or None if unsigned, forged or stale."""
+    mac, payload = datagram[:MAC_SIZE], datagram[MAC_SIZE:]
+    if not hmac.compare_digest(mac, hmac.new(key.encode(), payload, hashlib.sha256).digest()):
+        return None
+    try:
+        announcement = json.loads(payload)
+        if abs(time.time() - announcement['sent']) > LAN_MAX_SKEW:
+            return None
+    except (ValueError, KeyError, TypeError):
+        return None
+    return announcement
+
+
+class LockStatusChannel:
+    """Delivers remote lock/unlock commands to on_status as soon as they change.
+
+    Subscribes to the SSE stream when the server offers one and falls back to
+    conditional GETs (ETag/If-None-Match) otherwise; failures back off
+    exponentially. A status arriving while is_enabled() is false is held
+    (the latest one wins) and delivered once it is true again, since the
+    ETag has already moved past it. A server that sends no ETag answers
+    every poll in full; only a status different from the last one received
+    is delivered then.
+    """
+
+    def __init__(self, on_status, is_enabled=lambda: True, poll_interval=POLL_INTERVAL,
+                 max_backoff=BACKOFF_MAX):
+        self.on_status = on_status
+        self.is_enabled = is_enabled
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.etag = None
+        self.held = None  # Latest status received while disabled
+        self.last = None  # Latest status received, delivered or held
+        self.failures = 0
+        self.stream_retry_at = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.response = None
+
+    def _deliver(self, status):
+        if status is None:
+            return
+        self.last = status
+        if not self.is_enabled():
+            self.held = status
+            return
+        self.held = None
+        self.on_status(status)
+
+    def _release_held(self):
+        """Deliver a status held while disabled, once enabled again."""
+        if self.held is not None and self.is_enabled():
+            self._deliver(self.held)
+
+    def _backoff(self):
+        """Return the delay after a failure: BACKOFF_BASE * 2^n seconds with jitter, capped."""
+        self.failures += 1
+        delay = min(BACKOFF_BASE * 2 ** (self.failures - 1), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _stream(self):
+        """Follow the event stream until it drops; returns the number of events
+        it delivered, or None if the server has no stream."""
+        response = http_client.get(STREAM_URL, stream=True,
+                                   timeout=(3.05, STREAM_READ_TIMEOUT),
+                                   headers={'Accept': 'text/event-stream'})
+        if response.status_code in (404, 405, 501):
+            response.close()
+            return None
+        response.raise_for_status()
+        self.response = response
+        events = 0
+        try:
+            # chunk_size=1 so each event is handed over as soon as it arrives
+            for line in response.iter_lines(chunk_size=1, decode_unicode=True):
+                if self.stop_event.is_set():
+                    break
+                if line and line.startswith('data:'):
+                    events += 1
+                    self.failures = 0  # Only a stream that delivers resets the backoff
+                    self._deliver(json.loads(line[5:]).get('status'))
+                else:
+                    self._release_held()  # Heartbeats come every 15 s
+        finally:
+            self.response = None
+            response.close()
+        return events
+
+    def _poll(self):
+        """One conditional GET; a 304 costs headers only."""
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        with tracing.span('lock_status_poll'):
+            response = http_client.get(LOGS_URL, headers=headers)
+        if response.status_code == 304:
+            return
+        response.raise_for_status()
+        self.etag = response.headers.get('ETag')
+        status = response.json().get('status')
+        if self.etag is None and status == self.last:
+            return  # Nothing to tell a repeat from a new command by; treat it as no change
+        self._deliver(status)
+
+    def step(self):
+        """Follow the stream until it drops, or poll once; return seconds to wait."""
+        try:
+            self._release_held()
+            if time.monotonic() >= self.stream_retry_at:
+                events = self._stream()
+                if events:
+                    return 0
+                if events is not None:
+                    # Closed before its first event: poll meanwhile and back off the
+                    # reconnect, or a server dropping every stream would be hammered
+                    self._poll()
+                    return self._backoff()
+                print('Lock status stream unavailable, polling', LOGS_URL)
+                self.stream_retry_at = time.monotonic() + STREAM_RETRY_INTERVAL
+            self._poll()
+            self.failures = 0
+            return self.poll_interval
+        except Exception as e:
+            if self.stop_event.is_set():
+                return 0
+            print('Failed to fetch lock status:', e)
+            return self._backoff()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.stop_event.wait(self.step())
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        response = self.response
+        if response is not None:
+            response.close()
+
+    async def run(self):
+        """Asyncio variant of start(); cancelling it closes any open stream."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await asyncio.sleep(await loop.run_in_executor(None, self.step))
+        finally:
+            self.stop()
+
+
+class LanListener(LockStatusChannel):
+    """Takes lock commands from a site gateway's multicast announcements.
+
+    The gateway re-announces the current status every few seconds, so a
+    lost datagram costs one interval; when no valid announcement has
+    arrived for `silence` seconds the listener does a conditional GET
+    (against API_BASE, i.e. the gateway) instead, however much other
+    traffic reaches the port. Announcements are HMAC-signed and ordered by
+    the time the command changed, so old ones replayed on the LAN are ignored.
+    """
+
+    def __init__(self, on_status, is_enabled=lambda: True, group=LAN_GROUP, key=LAN_KEY,
+                 silence=LAN_SILENCE, **kwargs):
+        super().__init__(on_status, is_enabled, **kwargs)
+        self.group = parse_group(group)
+        self.key = key
+        self.silence = silence
+        self.sock = None
+        self.changed = 0
+        self.announcements = 0
+        self.heard = time.monotonic()  # Last valid announcement (or fallback poll)
+
+    def _open(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', self.group[1]))
+        membership = struct.pack('4s4s', socket.inet_aton(self.group[0]), socket.inet_aton('0.0.0.0'))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        self.sock = sock
+
+    def _receive(self):
+        announcement = unpack_announcement(self.key, self.sock.recv(2048))
+        if announcement is None or announcement['changed'] < self.changed:
+            return  # Forged, skewed, or a replay: doesn't count as hearing the gateway
+        self.heard = time.monotonic()
+        if announcement['changed'] == self.changed:
+            return  # The periodic re-announcement
+        self.changed = announcement['changed']
+        self.announcements += 1
+        if announcement['etag'] != self.etag:  # Not already seen through a GET
+            self.etag = announcement['etag']
+            self._deliver(announcement['status'])
+
+    def step(self):
+        """Wait for one datagram, or poll once after a silence; return seconds to wait."""
+        try:
+            self._release_held()
+            if self.sock is None:
+                self._open()
+            wait = self.heard + self.silence - time.monotonic()
+            if wait <= 0:
+                self._poll()
+                self.heard = time.monotonic()  # Poll again after another silence
+            else:
+                self.sock.settimeout(wait)
+                try:
+                    self._receive()
+                except socket.timeout:
+                    pass
+            self.failures = 0
+            return 0
+        except Exception as e:
+            if self.stop_event.is_set():
+                return 0
+            print('Failed to receive lock status:', e)
+            self._close()
+            return self._backoff()
+
+    def _close(self):
+        sock, self.sock = self.sock, None
+        if sock is not None:
+            sock.close()
+
+    def stop(self):
+        super().stop()
+        self._close()
+
+
+def open_channel(on_status, is_enabled=lambda: True):
+    """The gateway's LAN announcements when LOCKUP_LAN_KEY is set, else HTTP."""
+    if LAN_KEY:
+        return LanListener(on_status, is_enabled)
+    return LockStatusChannel(on_status, is_enabled)
@@ -0,0 +1,185 @@
+import queue
+import sqlite3
+import threading
+import time
+
+POOL_SIZE = 3               # Connections kept open (keypad thread + refresher + spare)
+REFRESH_INTERVAL = 30       # Seconds between incremental PIN index refreshes
+FULL_RELOAD_INTERVAL = 3600  # Seconds between full reloads (picks up deleted members)
+RECONNECT_ATTEMPTS = 3
+
+# '?' placeholders work for both sqlite3 and mysql.connector prepared cursors
+CHANGED_MEMBERS = 'SELECT ID, PIN, updated_at FROM members WHERE updated_at >= ? ORDER BY updated_at'
+ALL_MEMBERS = 'SELECT ID, PIN FROM members'
+MAX_UPDATED_AT = 'SELECT MAX(updated_at) FROM members'
+
+
+def mysql_connect(config):
+    """Connection factory for the production MySQL database."""
+    import mysql.connector
+
+    def connect():
+        return mysql.connector.connect(**config)
+    return connect
+
+
+def sqlite_connect(path):
+    """Connection factory for a local SQLite stand-in with the same `members` table."""
+    def connect():
+        return sqlite3.connect(path, check_same_thread=False)
+    return connect
+
+
+class MemberDB:
+    """Pooled, reconnecting access to `members` behind an in-memory PIN index.
+
+    member_for_pin() answers from a dict, so a PIN attempt costs no
+    database round trip. The index is refreshed in the background with
+    prepared statements: rows with updated_at at or past the last seen
+    watermark every REFRESH_INTERVAL, and a full reload every
+    FULL_RELOAD_INTERVAL (or every refresh when the table has no
+    updated_at column) so deleted members drop out.
+    """
+
+    def __init__(self, connect, pool_size=POOL_SIZE, refresh_interval=REFRESH_INTERVAL,
+                 full_reload_interval=FULL_RELOAD_INTERVAL):
+        self.connect = connect
+        self.pool = queue.LifoQueue(maxsize=pool_size)
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.index = {}
+        self.pins = {}  # member ID -> PIN, so a PIN change finds the old entry directly
+        self.watermark = None
+        self.incremental = True
+        self.last_full_reload = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.queries = 0
+        self.reconnects = 0
+
+    # Connection pool
+
+    def _acquire(self):
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def _release(self, conn):
+        try:
+            self.pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _cursor(self, conn):
+        try:
+            return conn.cursor(prepared=True)  # mysql.connector: server-side prepared statement
+        except TypeError:
+            return conn.cursor()  # sqlite3 caches compiled statements per connection
+
+    def query(self, sql, params=()):
+        """Run a read query on a pooled connection, reconnecting on a dropped link."""
+        for attempt in range(RECONNECT_ATTEMPTS):
+            conn = self._acquire()
+            try:
+                cursor = self._cursor(conn)
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                cursor.close()
+                conn.commit()  # End the read so the next one sees fresh rows
+            except Exception as e:
+                if not _is_disconnect(e) or attempt == RECONNECT_ATTEMPTS - 1:
+                    self._release(conn)
+                    raise
+                print('Database connection lost, reconnecting:', e)
+                self.reconnects += 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                if attempt:
+                    time.sleep(min(2 ** attempt, 5))  # First retry is immediate on a fresh connection
+                continue
+            self.queries += 1
+            self._release(conn)
+            return rows
+
+    # PIN index
+
+    def member_for_pin(self, pin):
+        """Return the member ID for a PIN, or None (in-memory, no round trip)."""
+        return self.index.get(str(pin))
+
+    def refresh(self):
+        """Bring the PIN index up to date; returns the number of rows read."""
+        due = time.monotonic() - self.last_full_reload >= self.full_reload_interval
+        if self.incremental and self.watermark is not None and not due:
+            rows = self.query(CHANGED_MEMBERS, (self.watermark,))
+            with self.lock:
+                index, pins = dict(self.index), dict(self.pins)
+                for member_id, pin, updated_at in rows:
+                    old_pin = pins.get(member_id)
+                    if old_pin is not None and index.get(old_pin) == member_id:
+                        del index[old_pin]  # The member's PIN changed
+                    index[str(pin)] = member_id
+                    pins[member_id] = str(pin)
+                    self.watermark = max(self.watermark, updated_at)
+                self.index, self.pins = index, pins
+            return len(rows)
+
+        if self.incremental:
+            try:
+                watermark = self.query(MAX_UPDATED_AT)[0][0]
+            except Exception as e:
+                if _is_disconnect(e):
+                    raise
+                print('members has no updated_at column; reloading the full table each refresh')
+                self.incremental = False
+                watermark = None
+        rows = self.query(ALL_MEMBERS)
+        with self.lock:
+            self.index = {str(pin): member_id for member_id, pin in rows}
+            self.pins = {member_id: str(pin) for member_id, pin in rows}
+            self.watermark = watermark if self.incremental else None
+        self.last_full_reload = time.monotonic()
+        return len(rows)
+
+    def _run(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print('Failed to refresh member index:', e)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='member-index', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        return {'members': len(self.index), 'queries': self.queries,
+                'reconnects': self.reconnects, 'incremental': self.incremental}
+
+
+def _is_disconnect(error):
+    """True for errors that mean the connection is gone rather than the query is bad."""
+    try:
+        import mysql.connector
+        if isinstance(error, (mysql.connector.errors.InterfaceError,
+                              mysql.connector.errors.OperationalError)):
+            return True
+    except ImportError:
+        pass
+    if isinstance(error, ConnectionError):
+        return True
+    return isinstance(error, sqlite3.ProgrammingError) and 'closed' in str(error).lower()
@@ -0,0 +1,143 @@
+import asyncio
+import collections
+import time
+import http_client
+import schedule_index
+
+RESOLVE_DEADLINE = 5          # Seconds for every lookup of one PIN combined
+REVALIDATE_DEADLINE = 2       # Seconds to re-check a stale local hit before using it anyway
+WARM_URL = '/api/time/24-hour'  # Tiny response used to open a pooled connection early
+
+# Set these when the backend can list records by PIN prefix
+# (GET <url>?pin_prefix=123); the 3rd digit then prefetches every candidate.
+INSTRUCTORS_PREFIX_URL = None
+ADMINS_PREFIX_URL = None
+
+ADMIN, INSTRUCTOR, UNKNOWN = 'admin', 'instructor', 'unknown'
+
+# schedule: the instructors' rows compiled to a schedule_index.WeeklySchedule
+Resolution = collections.namedtuple('Resolution', 'path admin instructors schedule source latency')
+
+
+class PinResolver:
+    """Resolves a PIN to its admin record and instructor schedules at once.
+
+    Local store hits decide the path immediately, unless the store says
+    they need revalidation: then, as for PINs it doesn't know, the admin
+    and instructor lookups run concurrently and are merged under one
+    deadline, with admin taking precedence as before. A stale hit is
+    only used as-is when the API can't answer.
+    """
+
+    def __init__(self, store, fetch_admin, fetch_instructors, deadline=RESOLVE_DEADLINE):
+        self.store = store
+        self.fetch_admin = fetch_admin
+        self.fetch_instructors = fetch_instructors
+        self.deadline = deadline
+        self.prefetches = {}
+        self.latencies = collections.deque(maxlen=1000)
+        self.paths = collections.Counter()
+
+    def prefetch(self, prefix):
+        """Start speculative work for a partially entered PIN (the 3rd digit)."""
+        if prefix in self.prefetches or self.store.has_pin_prefix(prefix):
+            return
+        loop = asyncio.get_running_loop()
+        self.prefetches[prefix] = loop.run_in_executor(None, self._prefetch, prefix)
+
+    def _prefetch(self, prefix):
+        try:
+            if INSTRUCTORS_PREFIX_URL or ADMINS_PREFIX_URL:
+                self._fetch_prefix(prefix)
+            else:
+                # No prefix search upstream: at least have the TCP+TLS handshake done
+                http_client.get(WARM_URL).close()
+        except Exception as e:
+            print('Speculative PIN prefetch failed:', e)
+
+    def _fetch_prefix(self, prefix):
+        params = {'pin_prefix': prefix}
+        if INSTRUCTORS_PREFIX_URL:
+            response = http_client.get(INSTRUCTORS_PREFIX_URL, params=params)
+            response.raise_for_status()
+            by_pin = collections.defaultdict(list)
+            for record in response.json():
+                by_pin[str(record.get('pin'))].append(record)
+            for pin, records in by_pin.items():
+                self.store.put_instructors(pin, records)
+        if ADMINS_PREFIX_URL:
+            response = http_client.get(ADMINS_PREFIX_URL, params=params)
+            response.raise_for_status()
+            for record in response.json():
+                self.store.put_admin(str(record.get('pin')), record)
+
+    async def resolve(self, pin):
+        """Return a Resolution choosing the admin, instructor or unknown path."""
+        started = time.perf_counter()
+        end = time.monotonic() + self.deadline
+        pending = self.prefetches.pop(pin[:-1], None)
+        self.prefetches.clear()
+        if pending is not None and (INSTRUCTORS_PREFIX_URL or ADMINS_PREFIX_URL):
+            await asyncio.wait([pending], timeout=self.deadline)
+
+        admin = self.store.lookup_admin(pin)
+        instructors = self.store.lookup_instructors(pin)
+        source = 'local'
+        if not admin and not instructors:
+            source = 'network'
+            admin, instructors = await self._fetch_both(pin, max(end - time.monotonic(), 0))
+        elif self.store.needs_revalidation(pin):
+            fresh = await self._fetch_both(pin, min(max(end - time.monotonic(), 0), REVALIDATE_DEADLINE))
+            if None in fresh:
+                print(f'Could not revalidate PIN {pin} with the API; using cached records')
+                source = 'stale'
+            else:
+                (admin, instructors), source = fresh, 'revalidated'
+        if instructors and source in ('local', 'stale'):
+            schedule = self.store.schedule_for(pin)
+        else:
+            schedule = schedule_index.WeeklySchedule(instructors or [])
+
+        path = ADMIN if admin else INSTRUCTOR if instructors else UNKNOWN
+        latency = time.perf_counter() - started
+        self.latencies.append(latency)
+        self.paths[path] += 1
+        return Resolution(path, admin or None, instructors or [], schedule, source, latency)
+
+    async def _fetch_both(self, pin, timeout):
+        loop = asyncio.get_running_loop()
+        admin_future = loop.run_in_executor(None, self.fetch_admin, pin)
+        instructors_future = loop.run_in_executor(None, self.fetch_instructors, pin)
+        admin_future.add_done_callback(lambda f: self._store_admin(pin, f))
+        instructors_future.add_done_callback(lambda f: self._store_instructors(pin, f))
+        await asyncio.wait([admin_future, instructors_future], timeout=timeout)
+        # None: the lookup failed or missed the deadline, as opposed to an empty answer
+        admin = admin_future.result() if admin_future.done() else None
+        instructors = instructors_future.result() if instructors_future.done() else None
+        return admin, instructors
+
+    def _store_admin(self, pin, future):
+        # An empty answer removes the cached record: the PIN was revoked
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self.store.put_admin(pin, future.result())
+
+    def _store_instructors(self, pin, future):
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self.store.put_instructors(pin, future.result())
+
+    def stats(self):
+        """Return path-selection latency percentiles (ms) and counts per path."""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {'count': 0, 'paths': dict(self.paths)}
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return {
+            'count': len(latencies),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': latencies[-1] * 1000,
+            'paths': dict(self.paths),
+        }
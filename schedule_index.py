@@ -0,0 +1,89 @@
+import bisect
+import collections
+import datetime
+
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# record: the schedule row covering now; until: server-aligned datetime
+# at which the (merged) allowed interval ends
+Access = collections.namedtuple('Access', 'record until')
+
+
+def parse_time(value):
+    """'HH:MM[:SS]' -> seconds since midnight."""
+    parts = [int(part) for part in value.split(':')]
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) > 2 else 0)
+
+
+def week_seconds(moment):
+    """Seconds since Monday 00:00 for a datetime."""
+    return moment.weekday() * DAY + moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+class WeeklySchedule:
+    """One user's schedule rows compiled to disjoint intervals of seconds-since-week-start.
+
+    Rows are {'day', 'start_time', 'end_time'} as served by the API, with
+    the end time inclusive as in the old string compare. A row whose end is
+    before its start runs past midnight into the next day (Sunday wraps to
+    Monday). Overlapping or touching rows are merged, so lookup() is one
+    bisect and reports when the continuous allowed run ends.
+    """
+
+    def __init__(self, records):
+        slots = []
+        for record in records:
+            try:
+                day = DAYS.index(record.get('day'))
+                start = parse_time(record.get('start_time'))
+                end = parse_time(record.get('end_time')) + 1  # Inclusive end second
+            except (ValueError, TypeError, AttributeError, IndexError):
+                continue
+            if end <= start:
+                end += DAY  # Crosses midnight
+            start += day * DAY
+            end += day * DAY
+            if end > WEEK:
+                slots.append((start, WEEK, record))
+                slots.append((0, end - WEEK, record))
+            else:
+                slots.append((start, end, record))
+        slots.sort(key=lambda slot: slot[:2])
+
+        # Per slot in start order: the row reaching furthest among slots
+        # starting at or before it, so the covering row is one bisect away
+        self.slot_starts, self.reach_ends, self.reach_records = [], [], []
+        for start, end, record in slots:
+            self.slot_starts.append(start)
+            if self.reach_ends and self.reach_ends[-1] >= end:
+                self.reach_ends.append(self.reach_ends[-1])
+                self.reach_records.append(self.reach_records[-1])
+            else:
+                self.reach_ends.append(end)
+                self.reach_records.append(record)
+
+        # Disjoint merged runs, for when the allowed time ends
+        self.starts, self.ends = [], []
+        for start, end, record in slots:
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, moment):
+        """Return Access(record, until) if `moment` falls in a slot, else None."""
+        now = week_seconds(moment)
+        j = bisect.bisect_right(self.slot_starts, now) - 1
+        if j < 0 or now >= self.reach_ends[j]:
+            return None
+        i = bisect.bisect_right(self.starts, now) - 1
+        end = self.ends[i]
+        if end == WEEK and i > 0 and self.starts[0] == 0:
+            end += self.ends[0]  # Runs on across Sunday midnight
+        return Access(self.reach_records[j], moment.replace(microsecond=0) + datetime.timedelta(seconds=end - now))
@@ -0,0 +1,116 @@
+import asyncio
+import datetime
+import threading
+import time
+import http_client
+import tracing
+
+TIME_URL = '/api/time/24-hour'
+REFRESH_INTERVAL = 600  # Seconds between background re-syncs
+RETRY_INTERVAL = 30     # Seconds before retrying a failed sync
+SAMPLES = 4             # Requests per sync; the lowest-RTT one wins
+RESOLUTION = 1.0        # The server reports whole seconds ('HH:MM:SS')
+DAY = 24 * 3600
+
+
+def _seconds_of_day(hh_mm_ss):
+    hours, minutes, seconds = (int(part) for part in hh_mm_ss.split(':'))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class ServerClock:
+    """Server-aligned wall clock, anchored once and advanced with time.monotonic()."""
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, samples=SAMPLES):
+        self.refresh_interval = refresh_interval
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.mono_ref = None
+        self.server_ref = None
+        self.offset = None
+        self.uncertainty = None
+        self.drift_ppm = None
+        self.syncs = 0
+
+    def _sample(self):
+        """Take one NTP-style sample: (rtt, offset to local wall clock, mono, wall)."""
+        t0 = time.monotonic()
+        response = http_client.get(TIME_URL)
+        t1 = time.monotonic()
+        wall = datetime.datetime.now()
+        response.raise_for_status()
+        rtt = t1 - t0
+        # The reply was stamped about rtt/2 ago and truncated to the second
+        server_sod = _seconds_of_day(response.json().get('time')) + RESOLUTION / 2 + rtt / 2
+        local_sod = (wall.hour * 3600 + wall.minute * 60 + wall.second
+                     + wall.microsecond / 1e6)
+        offset = (server_sod - local_sod + DAY / 2) % DAY - DAY / 2
+        return rtt, offset, t1, wall
+
+    def sync(self):
+        """Estimate the server offset from the best of several samples."""
+        samples = []
+        with tracing.span('clock_sync'):
+            for _ in range(self.samples):
+                try:
+                    samples.append(self._sample())
+                except Exception as e:
+                    print('Failed to sample server time:', e)
+        if not samples:
+            return False
+        rtt, offset, mono, wall = min(samples, key=lambda sample: sample[0])
+        server_ref = wall + datetime.timedelta(seconds=offset)
+        with self.lock:
+            if self.mono_ref is not None and mono > self.mono_ref:
+                predicted = self.server_ref + datetime.timedelta(seconds=mono - self.mono_ref)
+                error = (server_ref - predicted).total_seconds()
+                self.drift_ppm = error / (mono - self.mono_ref) * 1e6
+            self.mono_ref = mono
+            self.server_ref = server_ref
+            self.offset = offset
+            self.uncertainty = rtt / 2 + RESOLUTION / 2
+            self.syncs += 1
+        print(f'Server clock synced: offset {offset:+.3f}s '
+              f'+/- {self.uncertainty:.3f}s (rtt {rtt * 1000:.0f} ms)')
+        return True
+
+    def now(self):
+        """Return the server-aligned datetime, or None before the first sync."""
+        with self.lock:
+            if self.mono_ref is None:
+                return None
+            return self.server_ref + datetime.timedelta(seconds=time.monotonic() - self.mono_ref)
+
+    def stats(self):
+        """Return the current offset, its uncertainty and the measured drift."""
+        with self.lock:
+            age = None if self.mono_ref is None else time.monotonic() - self.mono_ref
+            return {
+                'offset_s': self.offset,
+                'uncertainty_s': self.uncertainty,
+                'drift_ppm': self.drift_ppm,
+                'last_sync_age_s': age,
+                'syncs': self.syncs,
+            }
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            interval = self.refresh_interval if self.sync() else RETRY_INTERVAL
+            self.stop_event.wait(interval)
+
+    def start(self):
+        """Sync in the background now and every refresh_interval after."""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    async def run(self):
+        """Asyncio variant of start(): sync now and every refresh_interval after."""
+        loop = asyncio.get_running_loop()
+        while True:
+            synced = await loop.run_in_executor(None, self.sync)
+            await asyncio.sleep(self.refresh_interval if synced else RETRY_INTERVAL)
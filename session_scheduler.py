@@ -0,0 +1,122 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+
+WARNING_LEAD = 600   # Seconds before a session ends that the warning fires
+MAX_SLEEP = 30       # Re-read the server clock at least this often while waiting
+
+WARNING, END = 'warning', 'end'
+
+
+class Session:
+    """One granted stay: `until` is the server-aligned datetime it ends."""
+
+    def __init__(self, key, until, info):
+        self.key = key
+        self.until = until
+        self.info = info
+        self.warned = False
+        self.generation = 0
+
+    def __repr__(self):
+        return f'Session({self.key!r}, until={self.until})'
+
+
+class SessionScheduler:
+    """Timed warning and end events for concurrent door sessions, on one heap.
+
+    open() registers a session's pre-end warning and end as heap entries
+    and returns at once; run() is the only task, sleeping until the
+    earliest due entry (or a new earlier one). Extending or closing a
+    session bumps its generation, so stale entries are skipped when they
+    surface instead of being searched for. Due times are server-aligned
+    datetimes from `now()`, re-read at least every MAX_SLEEP seconds so
+    clock corrections are followed.
+    """
+
+    def __init__(self, now, on_warning, on_end, warning_lead=WARNING_LEAD):
+        self.now = now
+        self.on_warning = on_warning
+        self.on_end = on_end
+        self.warning_lead = datetime.timedelta(seconds=warning_lead)
+        self.sessions = {}
+        self.heap = []
+        self.order = itertools.count()
+        self.wake = asyncio.Event()
+
+    def _schedule(self, session):
+        session.generation += 1
+        if not session.warned:
+            self._push(session.until - self.warning_lead, session, WARNING)
+        self._push(session.until, session, END)
+        self.wake.set()
+
+    def _push(self, due, session, kind):
+        heapq.heappush(self.heap, (due, next(self.order), session.generation, session.key, kind))
+
+    # Session control
+
+    def open(self, key, until, **info):
+        """Start a session (or extend the open one with the same key) ending at `until`."""
+        session = self.sessions.get(key)
+        if session is not None:
+            return self.extend(key, until)
+        session = self.sessions[key] = Session(key, until, info)
+        self._schedule(session)
+        return session
+
+    def extend(self, key, until):
+        """Move an open session's end (earlier or later); returns it, or None if not open."""
+        session = self.sessions.get(key)
+        if session is None:
+            return None
+        if until > session.until and until - self.warning_lead > self.now():
+            session.warned = False  # Warn again before the new end
+        session.until = until
+        self._schedule(session)
+        return session
+
+    def close(self, key):
+        """End a session early without running on_end; returns it, or None."""
+        session = self.sessions.pop(key, None)
+        if session is not None:
+            session.generation += 1
+        return session
+
+    def close_all(self):
+        sessions = list(self.sessions)
+        return [self.close(key) for key in sessions]
+
+    def active(self):
+        return list(self.sessions.values())
+
+    # Timer loop
+
+    def _fire_due(self, now):
+        while self.heap and self.heap[0][0] <= now:
+            _, _, generation, key, kind = heapq.heappop(self.heap)
+            session = self.sessions.get(key)
+            if session is None or session.generation != generation:
+                continue  # Closed or rescheduled since this entry was pushed
+            if kind == WARNING:
+                session.warned = True
+                self.on_warning(session)
+            else:
+                del self.sessions[key]
+                self.on_end(session)
+
+    async def run(self):
+        """Fire warning and end events as they fall due, until cancelled."""
+        while True:
+            now = self.now()
+            delay = MAX_SLEEP
+            if now is not None:
+                self._fire_due(now)
+                if self.heap:
+                    delay = min(MAX_SLEEP, (self.heap[0][0] - now).total_seconds())
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,376 @@
+"""On-site gateway between a fleet of doors and the lockup.pro API.
+
+    LOCKUP_LAN_KEY=<secret> python site_gateway.py --port 8080
+
+then start each door with LOCKUP_API_BASE=http://<gateway>:8080 (and the
+same LOCKUP_LAN_KEY to take lock commands from the LAN announcements).
+
+Roster, admin and temperature GETs are cached for a few seconds and
+identical requests in flight are coalesced into one upstream call
+(singleflight); /api/time/24-hour is answered from the gateway's own
+server-aligned clock. One upstream lock-status subscription feeds the
+doors' /api/logs and /api/logs/stream and, with a LAN key, signed UDP
+multicast announcements. POSTs are passed through. GET /gateway/stats
+reports cache and upstream counters.
+"""
+import argparse
+import collections
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http_client
+import lock_channel
+import server_clock
+
+UPSTREAM = 'https://lockup.pro'
+PORT = 8080
+UPSTREAM_CONNECTIONS = 4  # Keep-alive sockets to the API, shared by every door
+
+# Seconds a 200 response may be served from cache, by longest path prefix;
+# 0 still coalesces concurrent identical requests but keeps nothing
+CACHE_TTLS = {
+    '/api/instructors/': 10,
+    '/api/admin/pin/': 10,
+    '/api/instructors': 15,
+    '/api/admin': 15,
+    '/api/temperatures': 5,
+    '/api/fingerprints/': 300,
+    '/api/time/24-hour': 0,
+}
+CACHE_ENTRIES = 4096
+STALE_IF_ERROR = 300      # Serve an expired entry this long when the API is down
+ANNOUNCE_INTERVAL = 2     # Re-send the current lock status this often
+HEARTBEAT_INTERVAL = 15   # SSE keep-alive comments to the doors
+
+Reply = collections.namedtuple('Reply', 'status content_type body')
+
+
+def ttl_for(path):
+    best = None
+    for prefix in CACHE_TTLS:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return CACHE_TTLS.get(best, 0)
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers share its result."""
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = self.Call()
+            else:
+                self.shared += 1
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class LanAnnouncer:
+    """Multicasts the current lock status, signed, on change and every interval."""
+
+    def __init__(self, key, group=lock_channel.LAN_GROUP, interval=ANNOUNCE_INTERVAL):
+        self.key = key
+        self.group = lock_channel.parse_group(group)
+        self.interval = interval
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)  # Stay on the site LAN
+        self.current = None
+        self.sent = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def announce(self, status, etag, changed):
+        self.current = (status, etag, changed)
+        self._send()
+
+    def _send(self):
+        if self.current is None:
+            return
+        try:
+            self.sock.sendto(lock_channel.pack_announcement(self.key, *self.current), self.group)
+            self.sent += 1
+        except OSError as e:
+            print('Failed to announce lock status:', e)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._send()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='lan-announce', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.sock.close()
+
+
+class Gateway:
+    """Cache, singleflight and lock-status fan-in shared by every request handler."""
+
+    def __init__(self, lan_key=lock_channel.LAN_KEY, lan_group=lock_channel.LAN_GROUP):
+        self.lock = threading.Lock()
+        self.cache = collections.OrderedDict()  # path -> (expires, Reply), LRU order
+        self.flight = SingleFlight()
+        self.clock = server_clock.ServerClock()
+        self.channel = lock_channel.LockStatusChannel(self.set_status)
+        self.announcer = LanAnnouncer(lan_key, lan_group) if lan_key else None
+        # Lock status as served to the doors; the epoch keeps ETags unique across restarts
+        self.epoch = uuid.uuid4().hex[:8]
+        self.status = None
+        self.version = 0
+        self.changed = threading.Condition()
+        self.counters = collections.Counter()
+
+    # Cached GETs
+
+    def fetch(self, path):
+        """Return a Reply for an upstream GET, from cache or one shared upstream call."""
+        ttl = ttl_for(path)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(path)
+            if entry is not None and entry[0] > now:
+                self.cache.move_to_end(path)
+                self.counters['hits'] += 1
+                return entry[1]
+        self.count('misses')
+        return self.flight.do(path, lambda: self._refresh(path, ttl))
+
+    def _refresh(self, path, ttl):
+        try:
+            response = http_client.get(path)
+            reply = Reply(response.status_code, response.headers.get('Content-Type'),
+                          response.content)
+        except Exception as e:
+            self.count('upstream_errors')
+            stale = self._stale(path)
+            if stale is None:
+                raise
+            print(f'Serving stale {path}: {e}')
+            return stale
+        self.count('upstream')
+        if reply.status >= 500:
+            self.count('upstream_errors')
+            return self._stale(path) or reply
+        if reply.status == 200 and ttl:
+            with self.lock:
+                self.cache[path] = (time.monotonic() + ttl, reply)
+                self.cache.move_to_end(path)
+                while len(self.cache) > CACHE_ENTRIES:
+                    self.cache.popitem(last=False)
+        return reply
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _stale(self, path):
+        with self.lock:
+            entry = self.cache.get(path)
+        if entry is not None and entry[0] + STALE_IF_ERROR > time.monotonic():
+            self.count('stale')
+            return entry[1]
+        return None
+
+    def server_time(self):
+        """The time reply from the gateway's clock, or None before its first sync."""
+        now = self.clock.now()
+        if now is None:
+            return None
+        self.count('time_local')
+        return Reply(200, 'application/json', json.dumps({'time': now.strftime('%H:%M:%S')}).encode())
+
+    # Lock status
+
+    def set_status(self, status):
+        """Upstream lock command: publish it to SSE clients, pollers and the LAN.
+
+        A repeat of the current status (an upstream poll without an ETag
+        re-delivers it every time) changes nothing and isn't republished.
+        """
+        with self.changed:
+            if status == self.status:
+                return
+            self.status = status
+            self.version += 1
+            etag = self.etag()
+            self.changed.notify_all()
+        self.count('commands')
+        if self.announcer is not None:
+            self.announcer.announce(status, etag, time.time())
+
+    def etag(self):
+        return f'"{self.epoch}-{self.version}"'
+
+    # Lifecycle
+
+    def start(self):
+        self.clock.start()
+        self.channel.start()
+        if self.announcer is not None:
+            self.announcer.start()
+
+    def stop(self):
+        self.channel.stop()
+        self.clock.stop()
+        if self.announcer is not None:
+            self.announcer.stop()
+        with self.changed:
+            self.changed.notify_all()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, cache_entries=len(self.cache))
+        stats.update(coalesced=self.flight.shared, lock_version=self.version,
+                     http=http_client.stats())
+        if self.announcer is not None:
+            stats['announcements'] = self.announcer.sent
+        return stats
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    gateway = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None):
+        self.send_response(status)
+        if body:
+            self.send_header('Content-Type', content_type or 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_reply(self, reply):
+        self._send(reply.status, reply.body, reply.content_type)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == lock_channel.LOGS_URL:
+            self.get_logs()
+        elif path == lock_channel.STREAM_URL:
+            self.stream_logs()
+        elif path == '/gateway/stats':
+            self._send(200, json.dumps(self.gateway.stats()).encode())
+        else:
+            reply = self.gateway.server_time() if path == server_clock.TIME_URL else None
+            try:
+                self._send_reply(reply or self.gateway.fetch(self.path))
+            except Exception as e:
+                self._send(502, json.dumps({'error': str(e)}).encode())
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        headers = {name: self.headers[name] for name in
+                   ('Content-Type', 'Content-Encoding', 'X-Device-Id') if self.headers.get(name)}
+        try:
+            response = http_client.post(self.path, data=body, headers=headers)
+            self._send(response.status_code, response.content, response.headers.get('Content-Type'))
+        except Exception as e:
+            self._send(502, json.dumps({'error': str(e)}).encode())
+
+    def get_logs(self):
+        gateway = self.gateway
+        with gateway.changed:
+            status, etag = gateway.status, gateway.etag()
+        if status is None:
+            self._send(503, json.dumps({'error': 'lock status not yet known'}).encode())
+        elif self.headers.get('If-None-Match') == etag:
+            self._send(304, headers={'ETag': etag})
+        else:
+            self._send(200, json.dumps({'status': status}).encode(), headers={'ETag': etag})
+
+    def stream_logs(self):
+        gateway = self.gateway
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        seen = 0
+        try:
+            while not gateway.channel.stop_event.is_set():
+                with gateway.changed:
+                    if gateway.version == seen:
+                        gateway.changed.wait(HEARTBEAT_INTERVAL)
+                    status, version = gateway.status, gateway.version
+                if version != seen:
+                    chunk = f'id: {version}\ndata: {json.dumps({"status": status})}\n\n'
+                    seen = version
+                else:
+                    chunk = ': ping\n\n'
+                self.wfile.write(chunk.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start(gateway, host='0.0.0.0', port=PORT):
+    """Serve `gateway` in a background thread; returns (server, base_url)."""
+    handler = type('BoundGatewayHandler', (GatewayHandler,), {'gateway': gateway})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{server.server_address[0]}:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--upstream', default=os.environ.get('LOCKUP_UPSTREAM', UPSTREAM))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+
+    http_client.API_BASE = args.upstream.rstrip('/')
+    http_client.POOL_MAXSIZE = UPSTREAM_CONNECTIONS
+    gateway = Gateway()
+    gateway.start()
+    server, base_url = start(gateway, args.host, args.port)
+    print('Gateway listening on', base_url, 'for', http_client.API_BASE,
+          '(LAN announcements on)' if gateway.announcer else '(LAN announcements off)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        gateway.stop()
+        print('Gateway stats:', gateway.stats())
@@ -0,0 +1,198 @@
+"""Local stand-in for the lockup.pro API, for benchmarks and off-site runs.
+
+    python stub_server.py --port 8080
+
+then point the door at it with LOCKUP_API_BASE=http://127.0.0.1:8080 (or
+http_client.API_BASE). POST /api/logs {"status": "unlock"} changes the lock
+status pushed to doors. --rtt-ms delays every reply to model the WAN hop and
+--jitter-ms adds an exponentially distributed extra delay with that mean.
+"""
+import argparse
+import base64
+import collections
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HEARTBEAT_INTERVAL = 15  # Seconds between SSE keep-alive comments
+
+
+class StubState:
+    """Mutable API state shared by every request handler."""
+
+    def __init__(self):
+        self.status = 'lock'
+        self.version = 1
+        self.changed = threading.Condition()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.paths = collections.Counter()
+        self.lock = threading.Lock()
+        self.rtt = 0
+        self.jitter = 0
+        # pin -> schedule rows / admin record, as served by the real API
+        self.instructors = {}
+        self.admins = {}
+        self.templates = {}  # finger_id (as in the URL) -> template bytes
+        self.temperatures = [{'temperature': 21.5, 'humidity': 40.0}]
+
+    def set_status(self, status):
+        with self.changed:
+            self.status = status
+            self.version += 1
+            self.changed.notify_all()
+
+    def count(self, sent):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += sent
+
+    def hit(self, path):
+        with self.lock:
+            self.paths[path] += 1
+
+    def delay(self):
+        """Sleep for one simulated round trip."""
+        delay = self.rtt + (random.expovariate(1 / self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.state.count(len(body))
+
+    def _send_empty(self, status, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.state.count(0)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        self.state.hit(path)
+        if path != '/api/logs/stream':
+            self.state.delay()
+        if path == '/api/logs':
+            self.get_logs()
+        elif path == '/api/logs/stream':
+            self.stream_logs()
+        elif path == '/api/time/24-hour':
+            self._send_json({'time': datetime.datetime.now().strftime('%H:%M:%S')})
+        elif path.startswith('/api/instructors/'):
+            self._send_json(self.state.instructors.get(path.rsplit('/', 1)[1], []))
+        elif path.startswith('/api/admin/pin/'):
+            self._send_json(self.state.admins.get(path.rsplit('/', 1)[1], []))
+        elif path == '/api/instructors':
+            self._send_json([dict(row, pin=pin) for pin, rows in self.state.instructors.items()
+                             for row in rows])
+        elif path == '/api/admin':
+            self._send_json([dict(admin, pin=pin) for pin, admin in self.state.admins.items()])
+        elif path == '/api/temperatures':
+            self._send_json(self.state.temperatures)
+        elif path.startswith('/api/fingerprints/'):
+            template = self.state.templates.get(path.rsplit('/', 1)[1])
+            if template is None:
+                self._send_json({'error': 'not found'}, status=404)
+            else:
+                self._send_json({'fingerprint_template': base64.b64encode(template).decode()})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        self.state.hit(self.path)
+        self.state.delay()
+        if self.path == '/api/access-events':
+            self._send_json({'accepted': True})
+            return
+        payload = json.loads(body or b'{}')
+        if self.path == '/api/logs':
+            self.state.set_status(payload.get('status'))
+            self._send_json({'status': self.state.status})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def get_logs(self):
+        with self.state.changed:
+            status, version = self.state.status, self.state.version
+        etag = f'"{version}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send_empty(304, {'ETag': etag})
+        else:
+            self._send_json({'status': status}, headers={'ETag': etag})
+
+    def stream_logs(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        self.state.count(0)
+        seen = None
+        try:
+            while True:
+                with self.state.changed:
+                    if self.state.version == seen:
+                        self.state.changed.wait(HEARTBEAT_INTERVAL)
+                    status, version = self.state.status, self.state.version
+                if version != seen:
+                    chunk = f'id: {version}\ndata: {json.dumps({"status": status})}\n\n'
+                    seen = version
+                else:
+                    chunk = ': ping\n\n'
+                self.wfile.write(chunk.encode())
+                self.wfile.flush()
+                self.state.count(len(chunk))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start(host='127.0.0.1', port=0, rtt=0, jitter=0):
+    """Start a stub server in a background thread; returns (server, state, base_url)."""
+    state = StubState()
+    state.rtt = rtt
+    state.jitter = jitter
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://{server.server_address[0]}:{server.server_address[1]}'
+    return server, state, base_url
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--rtt-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    args = parser.parse_args()
+    server, state, base_url = start(args.host, args.port, args.rtt_ms / 1000, args.jitter_ms / 1000)
+    print('Stub API listening on', base_url)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
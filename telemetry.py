@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+import http_client
+import tracing
+
+TEMPERATURES_URL = '/api/temperatures'
+SAMPLE_INTERVAL = 30    # Seconds between samples
+BUFFER_SIZE = 2880      # 24 hours of samples at the default rate
+ALARM_THRESHOLD = 40    # °C
+
+
+class RingBuffer:
+    """Fixed-size buffer of (timestamp, temperature, humidity) samples."""
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.size = size
+        self.samples = [None] * size
+        self.next = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, temperature, humidity):
+        with self.lock:
+            self.samples[self.next] = (timestamp, temperature, humidity)
+            self.next = (self.next + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+
+    def items(self):
+        """Return the stored samples, oldest first."""
+        with self.lock:
+            start = (self.next - self.count) % self.size
+            return [self.samples[(start + i) % self.size] for i in range(self.count)]
+
+    def latest(self):
+        with self.lock:
+            if not self.count:
+                return None
+            return self.samples[(self.next - 1) % self.size]
+
+    def __len__(self):
+        return self.count
+
+    def downsample(self, bucket_seconds):
+        """Aggregate samples into buckets with min/max/avg per reading."""
+        buckets = []
+        for timestamp, temperature, humidity in self.items():
+            start = timestamp - timestamp % bucket_seconds
+            if not buckets or buckets[-1]['start'] != start:
+                buckets.append({'start': start, 'count': 0,
+                                'temperature': [], 'humidity': []})
+            bucket = buckets[-1]
+            bucket['count'] += 1
+            bucket['temperature'].append(temperature)
+            bucket['humidity'].append(humidity)
+        for bucket in buckets:
+            for name in ('temperature', 'humidity'):
+                values = bucket[name]
+                bucket[name] = {'min': min(values), 'max': max(values),
+                                'avg': sum(values) / len(values)}
+        return buckets
+
+
+class TelemetrySampler:
+    """Samples temperature/humidity in the background and raises the heat alarm."""
+
+    def __init__(self, on_alarm, interval=SAMPLE_INTERVAL, threshold=ALARM_THRESHOLD,
+                 buffer_size=BUFFER_SIZE):
+        self.on_alarm = on_alarm
+        self.interval = interval
+        self.threshold = threshold
+        self.buffer = RingBuffer(buffer_size)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def fetch(self):
+        """Fetch the latest temperature and humidity from the API."""
+        try:
+            response = http_client.get(TEMPERATURES_URL)
+            response.raise_for_status()
+            data = response.json()
+            if not data:
+                print("No temperature data received.")
+                return None, None
+            latest_record = data[-1]  # Most recent record
+            return float(latest_record.get('temperature')), float(latest_record.get('humidity'))
+        except Exception as e:
+            print('Failed to fetch temperature data:', e)
+            return None, None
+
+    def sample(self):
+        with tracing.span('telemetry_fetch'):
+            temperature, humidity = self.fetch()
+        if temperature is None:
+            return
+        self.buffer.append(time.time(), temperature, humidity)
+        if temperature >= self.threshold:
+            print(f"Temperature is {temperature}°C (>= {self.threshold}°C). Triggering buzzer alarm!")
+            self.on_alarm()
+
+    def latest(self):
+        """Return the most recent (timestamp, temperature, humidity), or None."""
+        return self.buffer.latest()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    async def run(self):
+        """Asyncio variant of start(): sample now and every interval after."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.sample)
+            await asyncio.sleep(self.interval)
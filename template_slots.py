@@ -0,0 +1,230 @@
+import base64
+import json
+import os
+import threading
+import time
+import http_client
+
+OK = 0x00               # adafruit_fingerprint confirmation code
+CAPACITY = 150          # Template slots on the R30x sensor
+MAP_PATH = 'template_slots.json'
+# Server-side template store, used when a record carries no 'fingerprint_template'
+TEMPLATE_URL = '/api/fingerprints/{finger_id}'
+
+
+def fetch_template(finger_id):
+    """Download a base64 template for a finger_id from the server; bytes or None."""
+    try:
+        response = http_client.get(TEMPLATE_URL.format(finger_id=finger_id))
+        response.raise_for_status()
+        encoded = response.json().get('fingerprint_template')
+        return base64.b64decode(encoded) if encoded else None
+    except Exception as e:
+        print(f'Failed to fetch template for finger {finger_id}:', e)
+        return None
+
+
+class SlotManager:
+    """Treats the sensor's template library as a cache over the server's templates.
+
+    Keeps a finger_id -> slot map (persisted to MAP_PATH) on top of the
+    occupancy bitmap read from the sensor's template index. finger_ids are
+    the ids the server keeps with each record (the enrollment station's
+    template position); a slot number says nothing about whose template it
+    holds without the map. A finger that isn't
+    resident is uploaded into a free slot, evicting the least recently used
+    finger that is_pinned() doesn't protect (e.g. scheduled today).
+    is_referenced() returns which finger_ids some user still has, or None
+    when that isn't known yet; it decides which slots of a pre-map sensor
+    are adopted (see load()).
+    Every method talks to the sensor, so call them from the UART thread.
+    """
+
+    def __init__(self, sensor, capacity=None, path=MAP_PATH,
+                 fetch_template=fetch_template, is_pinned=lambda finger_ids: set(),
+                 is_referenced=lambda finger_ids: None):
+        self.sensor = sensor
+        self.capacity = capacity or getattr(sensor, 'library_size', None) or CAPACITY
+        self.path = path
+        self.fetch_template = fetch_template
+        self.is_pinned = is_pinned
+        self.is_referenced = is_referenced
+        self.occupied = bytearray((self.capacity + 7) // 8)
+        self.slots = {}      # finger_id -> slot
+        self.fingers = {}    # slot -> finger_id
+        self.last_used = {}  # finger_id -> time.time()
+        self.legacy = set()  # finger_ids adopted from slot == id, not yet seen referenced
+        self.lock = threading.Lock()
+        self.loaded = False
+
+    # Occupancy bitmap
+
+    def _is_occupied(self, slot):
+        return bool(self.occupied[slot // 8] & (1 << slot % 8))
+
+    def _set_occupied(self, slot, value):
+        if value:
+            self.occupied[slot // 8] |= 1 << slot % 8
+        else:
+            self.occupied[slot // 8] &= ~(1 << slot % 8) & 0xFF
+
+    def _free_slot(self):
+        for index, byte in enumerate(self.occupied):
+            if byte != 0xFF:
+                for bit in range(8):
+                    slot = index * 8 + bit
+                    if slot < self.capacity and not byte & (1 << bit):
+                        return slot
+        return None
+
+    # Persistence
+
+    def load(self):
+        """Read the sensor's template index and reconcile it with the saved map.
+
+        Without a map file the sensor predates the map, and its slots were
+        filled as slot == finger_id; those are adopted rather than cleared,
+        since nothing guarantees their templates can be fetched again. A
+        finger_id is dropped only once is_referenced() says no user has it
+        any more (its id could be handed to someone new). Occupied slots an
+        existing map doesn't account for (a corrupt map, a crash between
+        upload and save) were uploaded by this class from a fetchable
+        template, so they are cleared rather than guessed at.
+        """
+        with self.lock:
+            if self.sensor.read_templates() != OK:
+                raise RuntimeError('Failed to read the sensor template index')
+            self.occupied = bytearray((self.capacity + 7) // 8)
+            for slot in self.sensor.templates:
+                if slot < self.capacity:
+                    self._set_occupied(slot, True)
+            saved, legacy = {}, False
+            try:
+                with open(self.path) as f:
+                    saved = json.load(f)
+            except FileNotFoundError:
+                legacy = True
+            except ValueError as e:
+                print(f'Ignoring corrupt template slot map {self.path}:', e)
+            self.slots, self.fingers, self.last_used = {}, {}, {}
+            self.legacy = set(saved.get('legacy', ()))
+            for finger_id, entry in saved.get('slots', {}).items():
+                slot = entry['slot']
+                if slot < self.capacity and self._is_occupied(slot) and slot not in self.fingers:
+                    self._map(int(finger_id), slot, entry.get('last_used', 0))
+            self.legacy &= set(self.slots)
+            unmapped = [slot for slot in range(self.capacity)
+                        if self._is_occupied(slot) and slot not in self.fingers]
+            if legacy:
+                for slot in unmapped:
+                    self._map(slot, slot, 0)
+                self.legacy = set(unmapped)
+                unmapped = []
+            adopted = len(self.legacy)
+            if self.legacy:
+                referenced = self.is_referenced(set(self.legacy))
+                if referenced is not None:
+                    unmapped = [self.slots[f] for f in self.legacy if f not in referenced]
+                    for slot in unmapped:
+                        self._unmap(slot)
+                    self.legacy = set()
+            for slot in sorted(unmapped):
+                if self.sensor.delete_model(slot) != OK:
+                    raise RuntimeError(f'Failed to clear template slot {slot}')
+                self._set_occupied(slot, False)
+            if legacy or unmapped or len(self.slots) != len(saved.get('slots', {})) \
+                    or len(self.legacy) != len(saved.get('legacy', ())):
+                self._save()
+            self.loaded = True
+        if legacy and adopted:
+            print(f'Template slots: adopted {adopted} slot(s) enrolled before {self.path} existed')
+        if unmapped:
+            print(f'Template slots: cleared {len(unmapped)} slot(s) no user accounts for')
+        print(f'Template slots: {len(self.fingers)}/{self.capacity} in use')
+
+    def _save(self):
+        data = {'slots': {str(finger_id): {'slot': slot, 'last_used': self.last_used.get(finger_id, 0)}
+                          for finger_id, slot in self.slots.items()},
+                'legacy': sorted(self.legacy)}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def _map(self, finger_id, slot, last_used):
+        self.slots[finger_id] = slot
+        self.fingers[slot] = finger_id
+        self.last_used[finger_id] = last_used
+
+    def _unmap(self, slot):
+        finger_id = self.fingers.pop(slot, None)
+        if finger_id is not None:
+            self.slots.pop(finger_id, None)
+            self.last_used.pop(finger_id, None)
+            self.legacy.discard(finger_id)
+
+    # Lookups
+
+    def slot_for(self, finger_id):
+        """Return the slot holding finger_id, or None if it isn't resident."""
+        with self.lock:
+            return self.slots.get(finger_id)
+
+    def finger_for_slot(self, slot):
+        """Map a slot reported by a 1:N search back to its finger_id (None if unmapped)."""
+        with self.lock:
+            return self.fingers.get(slot)
+
+    # Residency
+
+    def ensure_resident(self, finger_id, template=None):
+        """Return the slot holding finger_id, uploading its template if needed.
+
+        `template` may be raw bytes or the base64 string stored by the
+        registration tool; without it the template is fetched from the
+        server. Returns None when no template is available.
+        """
+        if not self.loaded:
+            self.load()
+        with self.lock:
+            slot = self.slots.get(finger_id)
+            if slot is not None:
+                # Recency is only persisted with the next change to the map,
+                # so a hit costs no SD card write
+                self.last_used[finger_id] = time.time()
+                return slot
+        if isinstance(template, str):
+            template = base64.b64decode(template)
+        if template is None:
+            template = self.fetch_template(finger_id)
+        if template is None:
+            return None
+        with self.lock:
+            slot = self._free_slot()
+            if slot is None:
+                slot = self._evict()
+            if self.sensor.send_fpdata(list(template), 'char', 1) != OK \
+                    or self.sensor.store_model(slot, 1) != OK:
+                raise RuntimeError(f'Failed to upload template for finger {finger_id}')
+            self._set_occupied(slot, True)
+            self._map(finger_id, slot, time.time())
+            self._save()
+        print(f'Uploaded template for finger {finger_id} into slot {slot}')
+        return slot
+
+    def _evict(self):
+        """Free the least recently used unpinned slot (LRU overall if all are pinned)."""
+        pinned = self.is_pinned(set(self.slots))
+        candidates = [f for f in self.slots if f not in pinned] or list(self.slots)
+        victim = min(candidates, key=lambda f: self.last_used.get(f, 0))
+        slot = self.slots[victim]
+        if self.sensor.delete_model(slot) != OK:
+            raise RuntimeError(f'Failed to delete template slot {slot}')
+        self._set_occupied(slot, False)
+        self._unmap(slot)
+        print(f'Evicted finger {victim} from slot {slot}')
+        return slot
+
+    def stats(self):
+        with self.lock:
+            return {'resident': len(self.slots), 'capacity': self.capacity}
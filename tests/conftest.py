@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules live flat in the repo root; tests never touch real hardware
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOCKUP_HAL', 'sim')
@@ -0,0 +1,126 @@
+import pytest
+import fingerprint_capture
+import fingerprint_sim
+from fingerprint_capture import BAD_IMAGE, MATCH, NO_MATCH, TIMEOUT
+
+
+@pytest.fixture
+def sensor():
+    """A simulated sensor with every command instant, alice in slot 3 and bob in 7."""
+    sensor = fingerprint_sim.SimulatedFingerprintSensor(
+        latencies={name: 0 for name in fingerprint_sim.LATENCIES})
+    sensor.enroll(3, 'alice')
+    sensor.enroll(7, 'bob')
+    return sensor
+
+
+class FakeClock:
+    """monotonic() that only moves when the capture loop sleeps."""
+
+    def __init__(self, real):
+        self.real = real
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)  # perf_counter and friends stay real
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(fingerprint_capture.time)
+    monkeypatch.setattr(fingerprint_capture, 'time', clock)
+    return clock
+
+
+def test_capture_single_pass(sensor):
+    sensor.place_finger('bob')
+    result = fingerprint_capture.capture(sensor, poll_interval=0)
+    assert result.status == MATCH
+    assert result.finger_id == 7
+    assert result.attempts == 1
+    assert set(result.timings) >= {'image', 'templating', 'search', 'total'}
+
+
+def test_capture_retakes_a_bad_image(sensor):
+    sensor.place_finger('alice', bad_images=1)
+    result = fingerprint_capture.capture(sensor, poll_interval=0)
+    assert (result.status, result.finger_id, result.attempts) == (MATCH, 3, 2)
+
+
+def test_capture_gives_up_after_max_attempts(sensor):
+    sensor.place_finger('alice', bad_images=5)
+    result = fingerprint_capture.capture(sensor, poll_interval=0, max_attempts=3)
+    assert (result.status, result.attempts) == (BAD_IMAGE, 3)
+
+
+def test_capture_times_out_at_the_15_second_deadline(sensor, clock):
+    assert fingerprint_capture.CAPTURE_DEADLINE == 15
+    result = fingerprint_capture.capture(sensor)  # No finger ever arrives
+    assert result.status == TIMEOUT
+    assert result.attempts == 0
+    assert 15 <= clock.slept < 15 + 2 * fingerprint_capture.POLL_INTERVAL
+
+
+def test_finger_just_inside_the_deadline_is_captured(sensor, clock):
+    polls = []
+    get_image = sensor.get_image
+
+    def late_finger():
+        polls.append(clock.now)
+        if clock.now >= 1014.9:
+            sensor.place_finger('alice')
+        return get_image()
+
+    sensor.get_image = late_finger
+    result = fingerprint_capture.verify(sensor, [3])
+    assert result.status == MATCH
+    assert polls[-1] < 1000 + fingerprint_capture.CAPTURE_DEADLINE
+
+
+def test_verify_matches_through_load_model_and_compare(sensor):
+    calls = []
+    sensor.finger_fast_search = lambda: pytest.fail('verify() searched the library')
+    load_model = sensor.load_model
+    sensor.load_model = lambda location, slot=1: calls.append(location) or load_model(location, slot)
+
+    sensor.place_finger('bob')
+    result = fingerprint_capture.verify(sensor, [3, 7], poll_interval=0)
+    assert (result.status, result.finger_id) == (MATCH, 7)
+    assert calls == [3, 7]
+    assert {'load', 'compare'} <= set(result.timings)
+
+
+def test_verify_mismatch(sensor):
+    sensor.place_finger('bob')
+    result = fingerprint_capture.verify(sensor, [3], poll_interval=0)
+    assert (result.status, result.finger_id) == (NO_MATCH, None)
+
+
+def test_verify_skips_slots_that_do_not_load(sensor):
+    sensor.place_finger('alice')
+    result = fingerprint_capture.verify(sensor, [99, 3], poll_interval=0)
+    assert (result.status, result.finger_id) == (MATCH, 3)
+
+
+def test_verify_does_not_fall_back_to_search_by_default(sensor):
+    assert fingerprint_capture.SEARCH_FALLBACK is False
+    searches = []
+    sensor.finger_fast_search = lambda: searches.append(1) or fingerprint_sim.OK
+    sensor.place_finger('bob')  # Enrolled, but not in the expected slots
+    result = fingerprint_capture.verify(sensor, [3], poll_interval=0)
+    assert result.status == NO_MATCH
+    assert searches == []
+
+
+def test_verify_search_fallback_finds_other_slots(sensor):
+    sensor.place_finger('bob')
+    result = fingerprint_capture.verify(sensor, [3], poll_interval=0, search_fallback=True)
+    assert (result.status, result.finger_id) == (MATCH, 7)
@@ -0,0 +1,99 @@
+import asyncio
+import datetime
+import types
+import pytest
+import hal
+import fingerprint_sim
+import http_client
+import local_store
+import server_clock
+import access_journal
+import stub_server
+import api
+
+PIN, FINGER_ID, TEMPLATE = '4321', 5, bytes(range(256)) * 2
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # The lock-status stream thread only notices cancellation at a heartbeat
+    monkeypatch.setattr(stub_server, 'HEARTBEAT_INTERVAL', 0.2)
+    server, state, base_url = stub_server.start()
+    monkeypatch.setattr(http_client, 'API_BASE', base_url)
+    yield state
+    server.shutdown()
+
+
+@pytest.fixture
+def door(server, tmp_path, monkeypatch):
+    server.instructors[PIN] = [{
+        'day': datetime.datetime.now().strftime('%A'), 'start_time': '00:00:00',
+        'end_time': '23:59:59', 'finger_id': FINGER_ID, 'name': 'Sim User', 'username': 'sim'}]
+    server.templates[str(FINGER_ID)] = TEMPLATE
+    for command in fingerprint_sim.LATENCIES:
+        monkeypatch.setitem(hal.SIM_LATENCIES, command, 0)
+    # Welcome screens and lockouts would hold the test for seconds at a time
+    sleep = asyncio.sleep
+    monkeypatch.setattr(api, 'asyncio', types.SimpleNamespace(
+        **dict(vars(asyncio), sleep=lambda delay, *a: sleep(min(delay, 0.01), *a))))
+
+    clock = server_clock.ServerClock()
+    clock.sync()
+    journal = access_journal.AccessJournal(str(tmp_path / 'journal'))
+    config = dict(api.DEFAULT_DOOR, slot_map=str(tmp_path / 'slots.json'))
+    door = api.open_door(config, local_store.LocalStore(':memory:'), clock, journal)
+    yield door
+    door.keypad.stop()
+    door.lcd.stop()
+    journal.stop()
+
+
+def test_open_door_wires_the_simulated_devices(door):
+    assert hal.BACKEND == 'sim'
+    assert isinstance(hal.GPIO, hal.SimulatedGPIO)
+    assert door.fingerprint_sensor is hal.sensors[-1]
+    assert hal.GPIO.outputs[door.relay_pin] == hal.GPIO.HIGH  # Locked at power-up
+
+
+def test_pin_and_finger_unlock_the_door(door):
+    keypad = hal.GPIO.keypad(api.DEFAULT_DOOR['columns'], api.DEFAULT_DOOR['rows'])
+
+    async def attempt():
+        task = asyncio.create_task(door.run())
+        try:
+            loop = asyncio.get_running_loop()
+            door.fingerprint_sensor.place_finger(TEMPLATE)
+            await loop.run_in_executor(None, keypad.type, PIN, 0.04, 0.04)
+            for _ in range(200):
+                if hal.GPIO.outputs[door.relay_pin] == hal.GPIO.LOW:
+                    break
+                await asyncio.sleep(0.025)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(attempt())
+    assert hal.GPIO.outputs[door.relay_pin] == hal.GPIO.LOW
+    assert 'sim' in door.sessions.sessions
+
+
+def test_only_remote_commands_that_move_the_relay_are_journaled(door, monkeypatch):
+    events = []
+    monkeypatch.setattr(door, 'record', lambda event, **fields: events.append(fields['status']))
+    for status in ('lock', 'lock', 'unlock', 'unlock', 'unlock', 'lock'):
+        door.apply_lock_status(status)
+    assert events == ['lock', 'unlock', 'lock']
+    assert hal.GPIO.outputs[door.relay_pin] == hal.GPIO.HIGH
+
+
+def test_key_after_a_pin_prompt_times_out_is_not_lost(door):
+    keypad = hal.GPIO.keypad(api.DEFAULT_DOOR['columns'], api.DEFAULT_DOOR['rows'])
+
+    async def prompt_then_type():
+        door.loop = asyncio.get_running_loop()
+        assert await door.read_pin("Lock: Enter PIN", 0.1) is None
+        # Pressed while an abandoned read_key() would still have been waiting
+        await door.loop.run_in_executor(None, keypad.tap, '5', 0.04)
+        return await door.next_key(1)
+
+    assert asyncio.run(prompt_then_type()) == '5'
@@ -0,0 +1,44 @@
+import types
+import pytest
+import requests
+import http_client
+import tracing
+
+
+class FakeSession:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def request(self, method, url, **kwargs):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return types.SimpleNamespace(status_code=self.outcome)
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = tracing.Tracer()
+    monkeypatch.setattr(tracing, 'api_request', tracer.api_request)
+    return tracer
+
+
+def send(monkeypatch, outcome, path='/api/instructors/1234'):
+    monkeypatch.setattr(http_client, '_session', FakeSession(outcome))
+    return http_client.get(path)
+
+
+def test_not_found_pin_is_not_an_error(monkeypatch, tracer):
+    send(monkeypatch, 404)
+    send(monkeypatch, 404, '/api/admin/pin/1234')
+    send(monkeypatch, 200)
+    assert tracer.api_errors == {}
+    assert tracer.endpoints['/api/instructors/'].count == 2
+
+
+def test_server_errors_and_transport_failures_count(monkeypatch, tracer):
+    send(monkeypatch, 503)
+    with pytest.raises(requests.ConnectionError):
+        send(monkeypatch, requests.ConnectionError('refused'))
+    assert tracer.api_errors == {('/api/instructors/', '503'): 1,
+                                 ('/api/instructors/', 'ConnectionError'): 1}
+    assert 'reason="503"' in tracer.render()
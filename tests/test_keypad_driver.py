@@ -0,0 +1,120 @@
+import time
+import pytest
+import keypad_driver
+from keypad_driver import HELD, IDLE, PRESS, PRESS_PENDING, RELEASE, RELEASE_PENDING, REPEAT
+
+DEBOUNCE = 0.02
+
+
+@pytest.fixture
+def backend():
+    return keypad_driver.SimulatedBackend()
+
+
+@pytest.fixture
+def keypad(backend):
+    return keypad_driver.Keypad(backend, debounce=DEBOUNCE, repeat_delay=0.5, repeat_interval=0.1)
+
+
+def step(keypad, now):
+    """One scan of the matrix at `now`, as the driver thread would run it."""
+    keypad._step(keypad._scan(), now)
+    return keypad.states.get('5', (IDLE,))[0]
+
+
+def drain(keypad):
+    events = []
+    while not keypad.events.empty():
+        event = keypad.events.get_nowait()
+        events.append((event.key, event.kind))
+    return events
+
+
+def test_scan_reads_the_pressed_key(keypad, backend):
+    backend.press('5')
+    backend.press('A')
+    assert keypad._scan() == {'5', 'A'}
+    backend.release('A')
+    assert keypad._scan() == {'5'}
+
+
+def test_press_hold_release(keypad, backend):
+    backend.press('5')
+    assert step(keypad, 0.0) == PRESS_PENDING
+    assert step(keypad, 0.01) == PRESS_PENDING  # Still inside the debounce window
+    assert drain(keypad) == []
+    assert step(keypad, 0.02) == HELD
+    assert drain(keypad) == [('5', PRESS)]
+
+    backend.release('5')
+    assert step(keypad, 0.10) == RELEASE_PENDING
+    assert step(keypad, 0.11) == RELEASE_PENDING
+    assert step(keypad, 0.125) == IDLE
+    assert drain(keypad) == [('5', RELEASE)]
+    assert keypad.states == {}
+
+
+def test_bounce_on_press_is_ignored(keypad, backend):
+    for now in (0.0, 0.004, 0.008):
+        backend.press('5')
+        assert step(keypad, now) == PRESS_PENDING
+        backend.release('5')
+        assert step(keypad, now + 0.002) == IDLE  # Dropped before the debounce elapsed
+    assert drain(keypad) == []
+
+
+def test_bounce_on_release_keeps_the_key_held(keypad, backend):
+    backend.press('5')
+    step(keypad, 0.0)
+    step(keypad, 0.02)
+    backend.release('5')
+    assert step(keypad, 0.10) == RELEASE_PENDING
+    backend.press('5')  # Contact chatter while lifting the finger
+    assert step(keypad, 0.105) == HELD
+    backend.release('5')
+    step(keypad, 0.11)
+    assert step(keypad, 0.135) == IDLE
+    assert drain(keypad) == [('5', PRESS), ('5', RELEASE)]
+
+
+def test_held_key_auto_repeats(keypad, backend):
+    backend.press('5')
+    step(keypad, 0.0)
+    step(keypad, 0.02)  # Press; first repeat due at 0.52
+    for now in (0.3, 0.52, 0.6, 0.62, 0.72):
+        assert step(keypad, now) == HELD
+    assert drain(keypad) == [('5', PRESS), ('5', REPEAT), ('5', REPEAT), ('5', REPEAT)]
+
+
+def test_no_repeat_without_repeat_delay(backend):
+    keypad = keypad_driver.Keypad(backend, debounce=DEBOUNCE)
+    backend.press('5')
+    for now in (0.0, 0.02, 1.0, 5.0):
+        step(keypad, now)
+    assert drain(keypad) == [('5', PRESS)]
+
+
+def test_driver_thread_wakes_on_an_edge(backend):
+    keypad = keypad_driver.Keypad(backend, debounce=DEBOUNCE, scan_interval=0.002)
+    keypad.start()
+    try:
+        assert keypad.get(timeout=0.1) is None  # Idle: nothing until a row rises
+        backend.press('7')
+        time.sleep(0.06)
+        backend.release('7')
+        assert keypad.read_key(timeout=1) == '7'
+        assert keypad.get(timeout=1).kind == RELEASE
+
+        backend.press('9')
+        backend.release('9')  # A tap shorter than the debounce is a bounce
+        assert keypad.read_key(timeout=0.2) is None
+    finally:
+        keypad.stop()
+    assert not keypad.thread.is_alive()
+
+
+def test_flush_drops_queued_keys(keypad):
+    keypad._emit('1', PRESS, 0.0)
+    keypad._emit('1', RELEASE, 0.1)
+    keypad.flush()
+    assert keypad.read_key(timeout=0) is None
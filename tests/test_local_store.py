@@ -0,0 +1,55 @@
+import local_store
+
+
+def test_referenced_finger_ids_needs_a_populated_cache():
+    store = local_store.LocalStore(':memory:')
+    assert store.referenced_finger_ids({1, 2, 3}) is None
+    store.put_instructors('1111', [{'day': 'Monday', 'start_time': '09:00:00',
+                                    'end_time': '10:00:00', 'finger_id': 2}])
+    store.put_admin('9999', {'finger_id': 7})
+    assert store.referenced_finger_ids({1, 2, 3, 7}) == {2, 7}
+
+
+def row(row_id, pin, start, day='Monday', **extra):
+    end = f'{int(start[:2]) + 1:02d}{start[2:]}'
+    return dict(id=row_id, pin=pin, day=day, start_time=start, end_time=end,
+                finger_id=3, username='alice', updated_at='2026-10-01 10:00:00', **extra)
+
+
+def starts(store, pin):
+    return sorted(r['start_time'] for r in store.lookup_instructors(pin))
+
+
+def test_slot_move_replaces_the_row():
+    store = local_store.LocalStore(':memory:')
+    store.apply_instructor_changes([row(41, '1111', '09:00:00'), row(42, '1111', '15:00:00')])
+    store.apply_instructor_changes([row(41, '1111', '13:00:00')])
+    assert starts(store, '1111') == ['13:00:00', '15:00:00']
+
+
+def test_pin_change_moves_the_rows():
+    store = local_store.LocalStore(':memory:')
+    store.apply_instructor_changes([row(41, '1111', '09:00:00'), row(42, '1111', '15:00:00')])
+    assert store.schedule_for('1111') is not None  # Compiled and cached
+    store.apply_instructor_changes([row(41, '2222', '09:00:00'), row(42, '2222', '15:00:00')])
+    assert store.lookup_instructors('1111') == []
+    assert starts(store, '2222') == ['09:00:00', '15:00:00']
+    assert len(store.schedule_for('1111')) == 0  # Old PIN's compiled schedule dropped too
+
+
+def test_revoked_row_stops_granting():
+    store = local_store.LocalStore(':memory:')
+    store.apply_instructor_changes([row(41, '1111', '09:00:00'), row(42, '1111', '15:00:00')])
+    store.apply_instructor_changes([{'id': 41, 'pin': '1111', 'deleted': True}])
+    assert starts(store, '1111') == ['15:00:00']  # Only that row, not the whole PIN
+    store.apply_instructor_changes([{'pin': '1111', 'deleted': True}])
+    assert store.lookup_instructors('1111') == []
+    assert store.referenced_finger_ids({3}) is None
+
+
+def test_admin_pin_change_revokes_the_old_pin():
+    store = local_store.LocalStore(':memory:')
+    store.apply_admin_changes([{'id': 7, 'pin': '9999', 'finger_id': 1}])
+    store.apply_admin_changes([{'id': 7, 'pin': '8888', 'finger_id': 1}])
+    assert store.lookup_admin('9999') is None
+    assert store.lookup_admin('8888')['finger_id'] == 1
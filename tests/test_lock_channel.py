@@ -0,0 +1,58 @@
+import types
+import pytest
+import http_client
+import lock_channel
+
+
+class Upstream:
+    """/api/logs answering in full every time, with or without an ETag."""
+
+    def __init__(self, monkeypatch, etag=None):
+        self.status = 'lock'
+        self.etag = etag
+        monkeypatch.setattr(http_client, 'get', self.get)
+
+    def get(self, path, headers=None, **kwargs):
+        headers = headers or {}
+        if self.etag and headers.get('If-None-Match') == self.etag:
+            return types.SimpleNamespace(status_code=304)
+        return types.SimpleNamespace(
+            status_code=200, headers={'ETag': self.etag} if self.etag else {},
+            json=lambda: {'status': self.status}, raise_for_status=lambda: None)
+
+
+@pytest.fixture
+def delivered():
+    return []
+
+
+def test_poll_without_etag_delivers_only_changes(monkeypatch, delivered):
+    upstream = Upstream(monkeypatch)
+    channel = lock_channel.LockStatusChannel(delivered.append)
+    for status in ('lock', 'lock', 'lock', 'unlock', 'unlock', 'lock'):
+        upstream.status = status
+        channel._poll()
+    assert delivered == ['lock', 'unlock', 'lock']
+
+
+def test_poll_with_etag_delivers_a_repeated_command(monkeypatch, delivered):
+    upstream = Upstream(monkeypatch, etag='"1"')
+    channel = lock_channel.LockStatusChannel(delivered.append)
+    channel._poll()
+    channel._poll()  # 304
+    upstream.etag = '"2"'  # Sent again upstream: a new command with the same status
+    channel._poll()
+    assert delivered == ['lock', 'lock']
+
+
+def test_repeat_while_disabled_is_not_redelivered(monkeypatch, delivered):
+    upstream = Upstream(monkeypatch)
+    enabled = [False]
+    channel = lock_channel.LockStatusChannel(delivered.append, is_enabled=lambda: enabled[0])
+    upstream.status = 'unlock'
+    channel._poll()
+    channel._poll()
+    enabled[0] = True
+    channel._release_held()
+    channel._poll()
+    assert delivered == ['unlock']
@@ -0,0 +1,111 @@
+import sqlite3
+import pytest
+import member_db
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'members.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE members (ID INTEGER PRIMARY KEY, PIN TEXT, updated_at INTEGER)')
+    conn.executemany('INSERT INTO members VALUES (?, ?, ?)',
+                     [(1, '1111', 100), (2, '2222', 100), (3, '3333', 101)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def db(path):
+    db = member_db.MemberDB(member_db.sqlite_connect(path), pool_size=2)
+    db.refresh()
+    yield db
+    db.stop()
+
+
+def execute(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_full_load_builds_the_index(db):
+    assert db.incremental
+    assert db.watermark == 101
+    assert [db.member_for_pin(pin) for pin in ('1111', 2222, '3333', '9999')] == [1, 2, 3, None]
+
+
+def test_pool_reuses_returned_connections(path):
+    opened = []
+
+    def connect():
+        conn = sqlite3.connect(path, check_same_thread=False)
+        opened.append(conn)
+        return conn
+
+    db = member_db.MemberDB(connect, pool_size=2)
+    for _ in range(5):
+        db.query(member_db.ALL_MEMBERS)
+    assert len(opened) == 1  # Checked out and returned each time
+    assert db.pool.qsize() == 1
+
+    held = [db._acquire() for _ in range(3)]  # Pool empty: two more are opened
+    assert len(opened) == 3
+    for conn in held:
+        db._release(conn)
+    assert db.pool.qsize() == 2  # The one over pool_size was closed
+    with pytest.raises(sqlite3.ProgrammingError):
+        held[-1].execute('SELECT 1')
+    db.stop()
+    assert db.pool.empty()
+
+
+def test_refresh_reads_rows_at_or_past_the_watermark(db, path):
+    execute(path, 'INSERT INTO members VALUES (4, ?, 105)', ('4444',))
+    assert db.refresh() == 2  # Member 3 sits on the old watermark (101)
+    assert db.member_for_pin('4444') == 4
+    assert db.watermark == 105
+    assert db.refresh() == 1  # updated_at >= watermark: only the newest row again
+
+
+def test_pin_change_moves_the_index_entry(db, path):
+    execute(path, 'UPDATE members SET PIN = ?, updated_at = 110 WHERE ID = 2', ('2020',))
+    db.refresh()
+    assert db.member_for_pin('2020') == 2
+    assert db.member_for_pin('2222') is None
+    assert db.pins[2] == '2020'
+    assert db.member_for_pin('1111') == 1
+
+
+def test_pin_handed_to_another_member(db, path):
+    execute(path, 'UPDATE members SET PIN = ?, updated_at = 110 WHERE ID = 1', ('5555',))
+    execute(path, 'UPDATE members SET PIN = ?, updated_at = 111 WHERE ID = 3', ('1111',))
+    db.refresh()
+    assert db.member_for_pin('1111') == 3
+    assert db.member_for_pin('5555') == 1
+    assert db.member_for_pin('3333') is None
+
+
+def test_deleted_rows_drop_out_on_the_full_reload(db, path):
+    execute(path, 'DELETE FROM members WHERE ID = 3')
+    db.refresh()
+    assert db.member_for_pin('3333') == 3  # Incremental refreshes can't see deletes
+
+    db.last_full_reload -= member_db.FULL_RELOAD_INTERVAL
+    assert db.refresh() == 2
+    assert db.member_for_pin('3333') is None
+    assert 3 not in db.pins
+
+
+def test_table_without_updated_at_reloads_every_refresh(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    execute(path, 'CREATE TABLE members (ID INTEGER PRIMARY KEY, PIN TEXT)')
+    execute(path, 'INSERT INTO members VALUES (1, ?)', ('1111',))
+    db = member_db.MemberDB(member_db.sqlite_connect(path))
+    db.refresh()
+    assert not db.incremental
+    execute(path, 'DELETE FROM members')
+    db.refresh()
+    assert db.member_for_pin('1111') is None
+    db.stop()
@@ -0,0 +1,19 @@
+import site_gateway
+
+
+class Announcer:
+    def __init__(self):
+        self.sent = []
+
+    def announce(self, status, etag, changed):
+        self.sent.append((status, etag))
+
+
+def test_repeated_status_is_not_republished():
+    gateway = site_gateway.Gateway(lan_key=None)
+    gateway.announcer = Announcer()
+    for status in ('lock', 'lock', 'lock', 'unlock', 'unlock', 'lock'):
+        gateway.set_status(status)
+    assert [status for status, _ in gateway.announcer.sent] == ['lock', 'unlock', 'lock']
+    assert gateway.version == 3
+    assert gateway.etag() == gateway.announcer.sent[-1][1]
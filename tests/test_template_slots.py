@@ -0,0 +1,69 @@
+import json
+import pytest
+import fingerprint_sim
+import template_slots
+
+
+@pytest.fixture
+def sensor():
+    """A sensor enrolled before the slot map existed: finger i in slot i."""
+    sensor = fingerprint_sim.SimulatedFingerprintSensor(
+        latencies={name: 0 for name in fingerprint_sim.LATENCIES})
+    for slot in range(40):
+        sensor.enroll(slot, f'finger-{slot}')
+    return sensor
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'slots.json')
+
+
+def no_fetch(finger_id):
+    return None  # The server has no template to give back
+
+
+def test_first_load_adopts_slots_enrolled_before_the_map(sensor, path):
+    slots = template_slots.SlotManager(sensor, path=path, fetch_template=no_fetch)
+    slots.load()
+    assert len(sensor.templates) == 40
+    assert slots.finger_for_slot(7) == 7
+    assert slots.ensure_resident(7) == 7  # Resident: no fetch needed
+    with open(path) as f:
+        saved = json.load(f)
+    assert len(saved['slots']) == 40
+    assert saved['legacy'] == list(range(40))  # Unverified until the store can tell
+
+
+def test_adoption_is_limited_to_referenced_fingers(sensor, path):
+    slots = template_slots.SlotManager(sensor, path=path, fetch_template=no_fetch,
+                                       is_referenced=lambda ids: ids & set(range(10)))
+    slots.load()
+    assert sorted(sensor.templates) == list(range(10))
+    assert slots.slot_for(3) == 3
+    assert slots.slot_for(12) is None
+    assert slots.legacy == set()
+
+
+def test_unverified_adoptions_are_rechecked_on_a_later_load(sensor, path):
+    template_slots.SlotManager(sensor, path=path).load()  # Store still empty
+    referenced = lambda ids: ids - {5, 6}
+    slots = template_slots.SlotManager(sensor, path=path, is_referenced=referenced)
+    slots.load()
+    assert 5 not in sensor.templates and 6 not in sensor.templates
+    assert len(sensor.templates) == 38
+    assert slots.slot_for(4) == 4
+
+    slots = template_slots.SlotManager(sensor, path=path, is_referenced=lambda ids: set())
+    slots.load()  # Verified entries are ordinary cache entries now
+    assert len(sensor.templates) == 38
+
+
+def test_slots_an_existing_map_does_not_account_for_are_cleared(sensor, path):
+    with open(path, 'w') as f:
+        json.dump({'slots': {'1001': {'slot': 0, 'last_used': 5}}}, f)
+    slots = template_slots.SlotManager(sensor, path=path)
+    slots.load()
+    assert sorted(sensor.templates) == [0]
+    assert slots.finger_for_slot(0) == 1001
+    assert slots.finger_for_slot(1) is None
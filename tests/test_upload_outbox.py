@@ -0,0 +1,38 @@
+import types
+import pytest
+import upload_outbox
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = upload_outbox.UploadOutbox(str(tmp_path / 'outbox.db'))
+    yield outbox
+    outbox.close()
+
+
+def drain_once(outbox, status):
+    results = []
+    drainer = upload_outbox.OutboxDrainer(outbox, on_result=lambda *args: results.append(args[2]))
+    drainer.session.put = lambda url, **kwargs: types.SimpleNamespace(
+        status_code=status, text='', json=lambda: {})
+    drainer._send(*outbox.claim())
+    drainer.session.close()
+    return results[-1]
+
+
+@pytest.mark.parametrize('status', [200, 201, 204])
+def test_any_2xx_is_accepted(outbox, status):
+    outbox.put('http://api/fingerprints/a', {'pin': 1234}, label='a')
+    assert drain_once(outbox, status) == 'done'
+    assert outbox.counts() == {'pending': 0, 'failed': 0}
+
+
+@pytest.mark.parametrize('status, kind, counts', [
+    (400, 'failed', {'pending': 0, 'failed': 1}),
+    (429, 'retry', {'pending': 1, 'failed': 0}),
+    (503, 'retry', {'pending': 1, 'failed': 0}),
+])
+def test_errors_are_parked_or_retried(outbox, status, kind, counts):
+    outbox.put('http://api/fingerprints/a', {'pin': 1234}, label='a')
+    assert drain_once(outbox, status) == kind
+    assert outbox.counts() == counts
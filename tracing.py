@@ -0,0 +1,250 @@
+import bisect
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# LOCKUP_METRICS_PORT serves /metrics (Prometheus text) and /spans (the
+# recent-span ring as JSON) on localhost; LOCKUP_METRICS_FILE rewrites the
+# same text to a file (node_exporter's textfile collector) every interval.
+METRICS_HOST = os.environ.get('LOCKUP_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('LOCKUP_METRICS_PORT') or 0)
+METRICS_FILE = os.environ.get('LOCKUP_METRICS_FILE')
+WRITE_INTERVAL = 15     # Seconds between metrics file rewrites
+
+RING_SIZE = 4096        # Most recent spans kept for after-the-fact inspection
+# Histogram upper bounds in seconds, from an I2C write to a sensor timeout
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+Span = collections.namedtuple('Span', 'stage start_ns duration_ns thread')
+
+# perf_counter_ns() has no epoch; this maps it to wall-clock time for /spans
+_WALL_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+
+class Histogram:
+    """Per-bucket counts, sum and count of durations, Prometheus style."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = [int(bound * 1e9) for bound in buckets]
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.sum_ns = 0
+        self.count = 0
+
+    def observe(self, duration_ns):
+        self.counts[bisect.bisect_left(self.bounds, duration_ns)] += 1
+        self.sum_ns += duration_ns
+        self.count += 1
+
+    def cumulative(self):
+        """(le, count) pairs with cumulative counts, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.bounds + [None], self.counts):
+            total += count
+            yield ('+Inf' if bound is None else f'{bound / 1e9:g}'), total
+
+
+class _Timer:
+    __slots__ = ('tracer', 'stage', 'start')
+
+    def __init__(self, tracer, stage):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.stage, self.start, time.perf_counter_ns())
+
+
+class Tracer:
+    """Stage spans in a fixed ring, folded into per-stage and per-endpoint histograms.
+
+    Recording a span is two perf_counter_ns() reads, one short lock and a
+    bisect; nothing is formatted until the metrics are read.
+    """
+
+    def __init__(self, size=RING_SIZE, buckets=BUCKETS):
+        self.size = size
+        self.buckets = buckets
+        self.spans = [None] * size
+        self.next = 0
+        self.count = 0
+        self.stages = {}
+        self.endpoints = {}
+        self.api_errors = collections.Counter()  # (endpoint, reason) -> count
+        self.lock = threading.Lock()
+
+    def span(self, stage):
+        """Context manager timing the enclosed block (awaits included) as `stage`."""
+        return _Timer(self, stage)
+
+    def record(self, stage, start_ns, end_ns):
+        # A plain tuple and the thread ident; names are looked up when the ring is read
+        span = (stage, start_ns, end_ns - start_ns, threading.get_ident())
+        with self.lock:
+            self.spans[self.next] = span
+            self.next = (self.next + 1) % self.size
+            if self.count < self.size:
+                self.count += 1
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(end_ns - start_ns)
+
+    def api_request(self, endpoint, start_ns, end_ns, error=None):
+        """One API call: its latency by endpoint and, if it failed, why."""
+        with self.lock:
+            histogram = self.endpoints.get(endpoint)
+            if histogram is None:
+                histogram = self.endpoints[endpoint] = Histogram(self.buckets)
+            histogram.observe(end_ns - start_ns)
+            if error is not None:
+                self.api_errors[endpoint, error] += 1
+
+    def recent(self, stage=None):
+        """Spans still in the ring, oldest first, optionally for one stage."""
+        with self.lock:
+            start = (self.next - self.count) % self.size
+            spans = [self.spans[(start + i) % self.size] for i in range(self.count)]
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        return [Span(name, start_ns, duration_ns, names.get(ident, ident))
+                for name, start_ns, duration_ns, ident in spans if stage is None or name == stage]
+
+    def render(self):
+        """All histograms and counters in the Prometheus text exposition format."""
+        with self.lock:
+            stages = {name: _copy(h) for name, h in self.stages.items()}
+            endpoints = {name: _copy(h) for name, h in self.endpoints.items()}
+            errors = dict(self.api_errors)
+        lines = []
+        _histogram_lines(lines, 'lockup_stage_duration_seconds', 'stage', stages,
+                         'Time spent in each stage of the door flow and background work.')
+        _histogram_lines(lines, 'lockup_api_request_duration_seconds', 'endpoint', endpoints,
+                         'API round trips by endpoint, until the response headers.')
+        lines.append('# HELP lockup_api_errors_total Failed API calls by endpoint and '
+                     'reason (exception name or 5xx HTTP status).')
+        lines.append('# TYPE lockup_api_errors_total counter')
+        for (endpoint, reason), count in sorted(errors.items()):
+            lines.append(f'lockup_api_errors_total{{endpoint="{_escape(endpoint)}",'
+                         f'reason="{_escape(reason)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, stage=None):
+        """The ring as JSON-ready dicts, with wall-clock start times."""
+        return [{
+            'stage': span.stage,
+            'start': datetime.datetime.fromtimestamp((span.start_ns + _WALL_OFFSET_NS) / 1e9)
+                     .isoformat(timespec='milliseconds'),
+            'duration_ms': round(span.duration_ns / 1e6, 3),
+            'thread': span.thread,
+        } for span in self.recent(stage)]
+
+
+def _copy(histogram):
+    copy = Histogram.__new__(Histogram)
+    copy.bounds, copy.counts = histogram.bounds, list(histogram.counts)
+    copy.sum_ns, copy.count = histogram.sum_ns, histogram.count
+    return copy
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(lines, metric, label, histograms, help_text):
+    lines.append(f'# HELP {metric} {help_text}')
+    lines.append(f'# TYPE {metric} histogram')
+    for name, histogram in sorted(histograms.items()):
+        labels = f'{label}="{_escape(name)}"'
+        for le, count in histogram.cumulative():
+            lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {count}')
+        lines.append(f'{metric}_sum{{{labels}}} {histogram.sum_ns / 1e9:.9g}')
+        lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+
+
+# The process-wide tracer every module records into
+tracer = Tracer()
+span = tracer.span
+record = tracer.record
+api_request = tracer.api_request
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    tracer = tracer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path == '/metrics':
+            body, content_type = self.tracer.render().encode(), 'text/plain; version=0.0.4'
+        elif path == '/spans':
+            stage = query[len('stage='):] if query.startswith('stage=') else None
+            body, content_type = json.dumps(self.tracer.dump(stage)).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsExporter:
+    """Serves the tracer on a local port and/or rewrites it to a file."""
+
+    def __init__(self, tracer=tracer, port=METRICS_PORT, path=METRICS_FILE,
+                 host=METRICS_HOST, interval=WRITE_INTERVAL):
+        self.tracer = tracer
+        self.port = port
+        self.path = path
+        self.host = host
+        self.interval = interval
+        self.server = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def write(self):
+        """Atomically replace the metrics file, so a scrape never sees half of it."""
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.tracer.render())
+        os.replace(tmp, self.path)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print('Failed to write metrics:', e)
+
+    def start(self):
+        if self.port:
+            handler = type('BoundMetricsHandler', (MetricsHandler,), {'tracer': self.tracer})
+            self.server = ThreadingHTTPServer((self.host, self.port), handler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True).start()
+            print(f'Metrics on http://{self.host}:{self.server.server_address[1]}/metrics')
+        if self.path:
+            self.thread = threading.Thread(target=self._run, name='metrics-file', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.path:
+            try:
+                self.write()  # Keep the final counts
+            except OSError as e:
+                print('Failed to write metrics:', e)
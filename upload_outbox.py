@@ -0,0 +1,172 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+DB_PATH = 'enroll_outbox.db'
+CONCURRENCY = 4          # Uploads in flight at once (also the connection pool size)
+UPLOAD_TIMEOUT = 10      # Seconds for one PUT
+BACKOFF_BASE = 2         # Seconds before the first retry; doubles per attempt
+BACKOFF_MAX = 300        # Upper bound on the retry delay
+IDLE_INTERVAL = 1        # Seconds between outbox checks when nothing is due
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    label TEXT,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (failed, next_attempt);
+"""
+
+
+class UploadOutbox:
+    """Durable queue of enrollment PUTs, kept in SQLite until the API accepts them."""
+
+    def __init__(self, path=DB_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.claimed = set()
+
+    def put(self, url, payload, label=None):
+        """Persist one upload; `label` names it in progress reports. Returns its outbox id."""
+        with self.lock, self.conn:
+            cursor = self.conn.execute('INSERT INTO outbox (url, label, payload) VALUES (?, ?, ?)',
+                                       (url, label, json.dumps(payload)))
+        return cursor.lastrowid
+
+    def claim(self):
+        """Return the oldest due, unclaimed upload as (id, url, label, payload, attempts), or None."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, url, label, payload, attempts FROM outbox '
+                'WHERE failed = 0 AND next_attempt <= ? ORDER BY id', (time.time(),))
+            for row_id, url, label, payload, attempts in rows:
+                if row_id not in self.claimed:
+                    self.claimed.add(row_id)
+                    return row_id, url, label, json.loads(payload), attempts
+        return None
+
+    def done(self, row_id):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM outbox WHERE id = ?', (row_id,))
+            self.claimed.discard(row_id)
+
+    def retry(self, row_id, error, delay):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ? '
+                'WHERE id = ?', (time.time() + delay, error, row_id))
+            self.claimed.discard(row_id)
+
+    def fail(self, row_id, error):
+        """Park an upload the API rejected; it stays on disk for the operator."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                'UPDATE outbox SET attempts = attempts + 1, failed = 1, last_error = ? '
+                'WHERE id = ?', (error, row_id))
+            self.claimed.discard(row_id)
+
+    def counts(self):
+        """Return {'pending': n, 'failed': n}."""
+        with self.lock:
+            rows = self.conn.execute('SELECT failed, COUNT(*) FROM outbox GROUP BY failed').fetchall()
+        counts = dict(rows)
+        return {'pending': counts.get(0, 0), 'failed': counts.get(1, 0)}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def _error_message(response):
+    try:
+        return response.json().get('errors', response.text)
+    except ValueError:
+        return response.text
+
+
+class OutboxDrainer:
+    """Drains an UploadOutbox with a pool of threads over one keep-alive session.
+
+    Network errors, 5xx and 429 responses are retried with jittered
+    exponential backoff; other 4xx responses are parked as failed.
+    on_result(row_id, label, kind, message) is called from the drainer
+    threads with kind 'uploading', 'done', 'retry' or 'failed'.
+    """
+
+    def __init__(self, outbox, on_result=lambda *args: None, concurrency=CONCURRENCY,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.outbox = outbox
+        self.on_result = on_result
+        self.concurrency = concurrency
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._run, name=f'outbox-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def notify(self):
+        """Wake idle drainer threads after put()."""
+        self.wake.set()
+
+    def stop(self, timeout=UPLOAD_TIMEOUT):
+        self.stop_event.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        self.session.close()
+
+    def _backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempts)
+        return delay * random.uniform(0.5, 1)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            item = self.outbox.claim()
+            if item is None:
+                self.wake.wait(IDLE_INTERVAL)
+                self.wake.clear()
+                continue
+            self._send(*item)
+
+    def _send(self, row_id, url, label, payload, attempts):
+        self.on_result(row_id, label, 'uploading', f'Uploading {label or url}')
+        try:
+            response = self.session.put(url, json=payload, timeout=UPLOAD_TIMEOUT)
+        except requests.RequestException as e:
+            error = f'Failed to send data to API: {e}'
+        else:
+            if 200 <= response.status_code < 300:  # 201 Created and 204 No Content too
+                self.outbox.done(row_id)
+                self.on_result(row_id, label, 'done', 'Registered successfully!')
+                return
+            error = f'HTTP {response.status_code}: {_error_message(response)}'
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                self.outbox.fail(row_id, error)
+                self.on_result(row_id, label, 'failed', error)
+                return
+        delay = self._backoff(attempts)
+        self.outbox.retry(row_id, error, delay)
+        self.on_result(row_id, label, 'retry', f'{error} (retrying in {delay:.0f}s)')